@@ -84,6 +84,24 @@ DATABASES = {
     }
 }
 
+# Caches
+# The translations cache is shared by all workers; create its table with
+# `python manage.py createcachetable`
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'translations': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'translation_cache',
+        'TIMEOUT': int(os.getenv('TRANSLATION_CACHE_TTL_SECONDS', str(30 * 24 * 3600))),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('TRANSLATION_CACHE_MAX_ENTRIES', '100000')),
+            'CULL_FREQUENCY': 4,
+        },
+    },
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -108,6 +126,24 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Storage backends
+# Audio goes through STORAGES['audio']; the default shards files by name hash
+# and writes atomically. Any Django storage backend can be swapped in.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+    'audio': {
+        'BACKEND': 'api.storage.ShardedAudioStorage',
+        'OPTIONS': {
+            'shard_depth': 2,
+        },
+    },
+}
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -147,8 +183,139 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Transcription sessions
+# Cap on concurrent upstream transcription sessions per worker
+TRANSCRIPTION_MAX_SESSIONS = int(os.getenv('TRANSCRIPTION_MAX_SESSIONS', '200'))
+# Where sessions are registered. LocalSessionRegistry only sees this process; with several
+# workers use 'api.services.session_registry.DatabaseSessionRegistry' (and a shared channel
+# layer such as Redis) so any worker can find a session and reach its owner
+TRANSCRIPTION_SESSION_REGISTRY = os.getenv(
+    'TRANSCRIPTION_SESSION_REGISTRY', 'api.services.session_registry.LocalSessionRegistry'
+)
+# Owners renew session leases every third of this; sessions of a dead worker expire after it
+TRANSCRIPTION_SESSION_LEASE_SECONDS = int(os.getenv('TRANSCRIPTION_SESSION_LEASE_SECONDS', '30'))
+# Sessions are reaped after this long without audio, after this total duration, or when
+# more than this much audio is waiting to be sent; checked every TRANSCRIPTION_REAP_INTERVAL_SECONDS
+TRANSCRIPTION_IDLE_TIMEOUT_SECONDS = int(os.getenv('TRANSCRIPTION_IDLE_TIMEOUT_SECONDS', '60'))
+TRANSCRIPTION_MAX_DURATION_SECONDS = int(os.getenv('TRANSCRIPTION_MAX_DURATION_SECONDS', str(4 * 3600)))
+TRANSCRIPTION_MAX_BUFFERED_BYTES = int(os.getenv('TRANSCRIPTION_MAX_BUFFERED_BYTES', str(1024 * 1024)))
+TRANSCRIPTION_REAP_INTERVAL_SECONDS = int(os.getenv('TRANSCRIPTION_REAP_INTERVAL_SECONDS', '10'))
+
+# Upstream reconnect
+# A dropped upstream connection is retried this many times with exponential backoff, and the
+# last TRANSCRIPTION_REPLAY_SECONDS of audio (plus anything received meanwhile) is replayed
+TRANSCRIPTION_RECONNECT_ATTEMPTS = int(os.getenv('TRANSCRIPTION_RECONNECT_ATTEMPTS', '5'))
+TRANSCRIPTION_RECONNECT_BASE_DELAY = float(os.getenv('TRANSCRIPTION_RECONNECT_BASE_DELAY', '0.5'))
+TRANSCRIPTION_RECONNECT_MAX_DELAY = float(os.getenv('TRANSCRIPTION_RECONNECT_MAX_DELAY', '8'))
+TRANSCRIPTION_REPLAY_SECONDS = float(os.getenv('TRANSCRIPTION_REPLAY_SECONDS', '5'))
+
+# Pre-connected upstream transcribers
+# Enough connections are kept warm for the session starts expected over the next
+# TRANSCRIPTION_POOL_HORIZON_SECONDS (judged from recent demand), between the min and max
+# size. Warm connections are replaced before TRANSCRIPTION_POOL_MAX_IDLE_SECONDS so they are
+# never handed out after the upstream idle timeout. A connection is only warmed for a fraction
+# of an expected start once it reaches TRANSCRIPTION_POOL_WARM_THRESHOLD (with the defaults,
+# about 15 starts in 5 minutes keep one warm); use the min size to always keep some warm.
+# Set the max size to 0 to disable the pool.
+TRANSCRIPTION_POOL_MIN_SIZE = int(os.getenv('TRANSCRIPTION_POOL_MIN_SIZE', '0'))
+TRANSCRIPTION_POOL_MAX_SIZE = int(os.getenv('TRANSCRIPTION_POOL_MAX_SIZE', '4'))
+TRANSCRIPTION_POOL_MAX_IDLE_SECONDS = int(os.getenv('TRANSCRIPTION_POOL_MAX_IDLE_SECONDS', '30'))
+TRANSCRIPTION_POOL_HORIZON_SECONDS = int(os.getenv('TRANSCRIPTION_POOL_HORIZON_SECONDS', '10'))
+TRANSCRIPTION_POOL_WARM_THRESHOLD = float(os.getenv('TRANSCRIPTION_POOL_WARM_THRESHOLD', '0.5'))
+
+# Transcription audio ingest
+# Client audio is decoded and resampled to this rate (mono PCM16) before it is sent upstream
+TRANSCRIPTION_SAMPLE_RATE = int(os.getenv('TRANSCRIPTION_SAMPLE_RATE', '16000'))
+# Audio is re-framed into fixed frames of this length before it is queued
+TRANSCRIPTION_FRAME_MS = int(os.getenv('TRANSCRIPTION_FRAME_MS', '100'))
+# How far upstream sends may run ahead of real time when the client sends in bursts
+TRANSCRIPTION_PACE_LEAD_MS = int(os.getenv('TRANSCRIPTION_PACE_LEAD_MS', '500'))
+# Frames buffered per session before the overflow policy kicks in (5 s at 100 ms frames)
+TRANSCRIPTION_AUDIO_QUEUE_FRAMES = int(os.getenv('TRANSCRIPTION_AUDIO_QUEUE_FRAMES', '50'))
+# 'drop_oldest' discards stale audio, 'pause' sends a flow_control message to the client
+TRANSCRIPTION_AUDIO_OVERFLOW_POLICY = os.getenv('TRANSCRIPTION_AUDIO_OVERFLOW_POLICY', 'drop_oldest')
+# Threads shared by all webm/ogg decoders; each compressed stream holds one while open
+TRANSCRIPTION_DECODER_WORKERS = int(os.getenv('TRANSCRIPTION_DECODER_WORKERS', '4'))
+
+# Voice activity gate
+# Silence is not sent upstream; speech is kept with this much trailing audio so the
+# transcriber can still detect the end of an utterance, and a short keep-alive frame
+# is sent every TRANSCRIPTION_VAD_KEEPALIVE_MS of skipped silence
+TRANSCRIPTION_VAD_ENABLED = os.getenv('TRANSCRIPTION_VAD_ENABLED', 'True') == 'True'
+TRANSCRIPTION_VAD_THRESHOLD_DB = float(os.getenv('TRANSCRIPTION_VAD_THRESHOLD_DB', '-45'))
+TRANSCRIPTION_VAD_HANGOVER_MS = int(os.getenv('TRANSCRIPTION_VAD_HANGOVER_MS', '800'))
+TRANSCRIPTION_VAD_KEEPALIVE_MS = int(os.getenv('TRANSCRIPTION_VAD_KEEPALIVE_MS', '1000'))
+
+# OpenAI translation
+OPENAI_TRANSLATION_MODEL = os.getenv('OPENAI_TRANSLATION_MODEL', 'gpt-4-turbo')
+# Pooled keep-alive HTTP client shared by all translation calls in a process
+OPENAI_HTTP_MAX_CONNECTIONS = int(os.getenv('OPENAI_HTTP_MAX_CONNECTIONS', '20'))
+OPENAI_HTTP_KEEPALIVE_SECONDS = float(os.getenv('OPENAI_HTTP_KEEPALIVE_SECONDS', '60'))
+OPENAI_HTTP_TIMEOUT_SECONDS = float(os.getenv('OPENAI_HTTP_TIMEOUT_SECONDS', '30'))
+
+# Batch translation
+# Source characters and segments packed into one model request
+TRANSLATION_BATCH_MAX_CHARS = int(os.getenv('TRANSLATION_BATCH_MAX_CHARS', '6000'))
+TRANSLATION_BATCH_MAX_SEGMENTS = int(os.getenv('TRANSLATION_BATCH_MAX_SEGMENTS', '50'))
+# Batches sent to the model at the same time for one request
+TRANSLATION_BATCH_CONCURRENCY = int(os.getenv('TRANSLATION_BATCH_CONCURRENCY', '4'))
+# Segments accepted by /api/translate/batch/
+TRANSLATION_BATCH_MAX_INPUT_SEGMENTS = int(os.getenv('TRANSLATION_BATCH_MAX_INPUT_SEGMENTS', '1000'))
+
+# Multi-language fan-out
+# Target languages accepted for one utterance, and how many translate at once
+TRANSLATION_MAX_TARGET_LANGUAGES = int(os.getenv('TRANSLATION_MAX_TARGET_LANGUAGES', '8'))
+TRANSLATION_FANOUT_CONCURRENCY = int(os.getenv('TRANSLATION_FANOUT_CONCURRENCY', '8'))
+
+# Translation cache
+# Entries kept in each worker's in-process LRU in front of the shared 'translations' cache
+TRANSLATION_CACHE_MEMORY_ENTRIES = int(os.getenv('TRANSLATION_CACHE_MEMORY_ENTRIES', '2048'))
+
+# Text to speech
+# Pooled keep-alive HTTP client shared by all ElevenLabs calls in a process
+ELEVENLABS_HTTP_MAX_CONNECTIONS = int(os.getenv('ELEVENLABS_HTTP_MAX_CONNECTIONS', '20'))
+ELEVENLABS_HTTP_TIMEOUT_SECONDS = float(os.getenv('ELEVENLABS_HTTP_TIMEOUT_SECONDS', '60'))
+# Voice used when a request asks for the "default" voice
+ELEVENLABS_DEFAULT_VOICE_ID = os.getenv('ELEVENLABS_DEFAULT_VOICE_ID', 'EXAVITQu4vr4xnSDxMaL')
+# Texts at least this long are split at sentence boundaries and synthesized in parallel
+TTS_PARALLEL_MIN_CHARS = int(os.getenv('TTS_PARALLEL_MIN_CHARS', '400'))
+TTS_SENTENCE_MAX_CHARS = int(os.getenv('TTS_SENTENCE_MAX_CHARS', '300'))
+TTS_PARALLEL_WORKERS = int(os.getenv('TTS_PARALLEL_WORKERS', '4'))
+# Save streamed speech under MEDIA_ROOT/generated_audio/ once the stream completes
+TTS_PERSIST_STREAMED_AUDIO = os.getenv('TTS_PERSIST_STREAMED_AUDIO', 'False') == 'True'
+# Lifetime of signed GET links to the speech stream endpoint
+TTS_STREAM_LINK_SECONDS = int(os.getenv('TTS_STREAM_LINK_SECONDS', '60'))
+# Speech cache eviction, applied by `python manage.py prune_speech_cache`
+TTS_CACHE_MAX_AGE_DAYS = int(os.getenv('TTS_CACHE_MAX_AGE_DAYS', '90'))
+TTS_CACHE_MAX_BYTES = int(os.getenv('TTS_CACHE_MAX_BYTES', str(5 * 1024 ** 3)))
+
+# Server-side translation pipeline
+# Utterances translating at once, and concurrent speech calls, per WebSocket session; each
+# utterance fans out to its languages up to TRANSLATION_FANOUT_CONCURRENCY
+TRANSLATION_PIPELINE_MAX_IN_FLIGHT = int(os.getenv('TRANSLATION_PIPELINE_MAX_IN_FLIGHT', '4'))
+
 SITE_ID = 1
 ACCOUNT_EMAIL_REQUIRED = True
 ACCOUNT_USERNAME_REQUIRED = False
 ACCOUNT_LOGIN_METHODS = {'email'}
 ACCOUNT_EMAIL_VERIFICATION = 'mandatory'
+
+# Usage recording
+# UsageRecord rows are buffered and written in bulk when this many are waiting, or after
+# USAGE_FLUSH_INTERVAL_SECONDS, off the request path
+USAGE_FLUSH_MAX_BATCH = int(os.getenv('USAGE_FLUSH_MAX_BATCH', '200'))
+USAGE_FLUSH_INTERVAL_SECONDS = float(os.getenv('USAGE_FLUSH_INTERVAL_SECONDS', '5'))
+# Rows kept in memory while the database is unavailable; newer records are dropped beyond this
+USAGE_MAX_BUFFERED_RECORDS = int(os.getenv('USAGE_MAX_BUFFERED_RECORDS', '10000'))
+# Speech minutes per month for users without a Subscription
+USAGE_DEFAULT_MONTHLY_MINUTES = int(os.getenv('USAGE_DEFAULT_MONTHLY_MINUTES', '60'))
+# Streamed transcription audio is metered in memory and recorded every this many seconds
+TRANSCRIPTION_QUOTA_CHECKPOINT_SECONDS = float(os.getenv('TRANSCRIPTION_QUOTA_CHECKPOINT_SECONDS', '10'))
+# Clients are warned once this many seconds of their monthly quota remain
+TRANSCRIPTION_QUOTA_WARN_SECONDS = float(os.getenv('TRANSCRIPTION_QUOTA_WARN_SECONDS', '60'))
+# Example pricing used to fill UsageRecord.cost
+USAGE_PRICING = {
+    'translation': {'per_character': 0.000001},
+    'text_to_speech': {'per_character': 0.000015},
+    'speech_to_text': {'per_audio_second': 0.0001},
+}
@@ -2,11 +2,30 @@ import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth import get_user_model
-from asgiref.sync import sync_to_async
+from django.conf import settings
+import asyncio
 import base64
 import uuid
+from urllib.parse import parse_qs
 
-from .services.assemblyai_service import create_transcription_session
+from .services.assemblyai_service import (
+    create_transcription_session, process_audio_chunk, close_transcription_session
+)
+from .services.audio_ingest import AudioFramer, AudioIngestQueue
+from .services.audio_processing import RAW_ENCODINGS, AudioIngestStage
+from .services.voice_activity import VoiceActivityGate
+from .services.transcript_bridge import TranscriptBridge
+from .services.speech_pipeline import TranslationPipeline
+from .services.openai_service import (
+    SUPPORTED_LANGUAGES, translate_text, astream_translation, validate_languages
+)
+from .services.rooms import (
+    RoomSubscriptions, can_join_room, claim_room, language_group, listeners_group,
+    speakers_group, validate_room
+)
+from .services.speech_cache import get_or_create_speech_bytes
+from .services.quota_meter import quota_meters
+from .services.usage import record_usage
 
 User = get_user_model()
 
@@ -31,6 +50,18 @@ class TranscriptionConsumer(AsyncWebsocketConsumer):
         # Initialize session data
         self.session_id = None
         self.transcriber = None
+        self.audio_queue = None
+        self.audio_stage = None
+        self.vad = None
+        self.framer = None
+        self.transcript_bridge = None
+        self.pipeline = None
+        self.room = None
+        self.room_subscriptions = None
+        self.quota_meter = None
+        self.quota_cutoff = None
+        # Client speech received but not yet metered against the quota
+        self.unmetered_bytes = 0
 
     async def disconnect(self, close_code):
         # Clean up transcription session if active
@@ -44,7 +75,7 @@ class TranscriptionConsumer(AsyncWebsocketConsumer):
             command = data.get('command')
             
             if command == 'start_transcription':
-                await self.start_transcription()
+                await self.start_transcription(data)
             elif command == 'stop_transcription':
                 await self.stop_transcription()
         
@@ -53,63 +84,383 @@ class TranscriptionConsumer(AsyncWebsocketConsumer):
             if self.session_id:
                 await self.process_audio(bytes_data)
 
-    async def start_transcription(self):
+    async def start_transcription(self, data=None):
         """Start a new transcription session"""
+        data = data or {}
+        if self.session_id:
+            # Starting over would orphan the queue, pipeline, meter and
+            # upstream session of the active one
+            await self.send(json.dumps({
+                'type': 'error',
+                'message': "A transcription session is already active; stop it first"
+            }))
+            return
+        
         try:
-            # Define callback function for transcription events
-            def transcription_callback(data):
-                # Send data to WebSocket
-                self.send_transcription_data(data)
+            # Meter streamed audio against the monthly speech quota
+            self.quota_meter = await quota_meters.acquire(self.user.pk)
+            if self.quota_meter.remaining <= 0:
+                raise ValueError("Monthly speech minutes used up")
+            
+            # Translate and voice final transcripts server-side when the
+            # client asks for one or more target languages
+            languages = data.get('languages')
+            if languages is None and data.get('language'):
+                languages = [data['language']]
+            if data.get('room'):
+                # Speak into a room: translate once per language listeners
+                # have subscribed to, and broadcast over the channel layer
+                room = validate_room(data['room'])
+                if not await database_sync_to_async(claim_room)(room, self.user.pk):
+                    raise ValueError("You have not been invited to this room")
+                await self.join_room(
+                    room,
+                    voice_id=data.get('voiceId'),
+                    speak=data.get('speak', True),
+                    streaming=data.get('streamTranslation', False),
+                )
+            elif languages:
+                self.start_pipeline(
+                    validate_languages(languages),
+                    voice_id=data.get('voiceId'),
+                    speak=data.get('speak', True),
+                    streaming=data.get('streamTranslation', False),
+                )
+            
+            # Decode and resample client audio to what the transcriber expects;
+            # undeclared audio is taken to be PCM16 at the upstream rate
+            audio_format = data.get('audioFormat') or {}
+            encoding = audio_format.get('encoding', 'pcm16')
+            self.audio_stage = AudioIngestStage(
+                encoding=encoding,
+                sample_rate=audio_format.get(
+                    'sampleRate',
+                    settings.TRANSCRIPTION_SAMPLE_RATE if encoding in RAW_ENCODINGS else None,
+                ),
+                channels=audio_format.get('channels', 1),
+                target_rate=settings.TRANSCRIPTION_SAMPLE_RATE,
+            )
+            
+            # Skip silence instead of streaming it upstream
+            if settings.TRANSCRIPTION_VAD_ENABLED and data.get('vad', True):
+                self.vad = VoiceActivityGate(
+                    sample_rate=settings.TRANSCRIPTION_SAMPLE_RATE,
+                    threshold_db=settings.TRANSCRIPTION_VAD_THRESHOLD_DB,
+                    hangover_ms=settings.TRANSCRIPTION_VAD_HANGOVER_MS,
+                    keepalive_ms=settings.TRANSCRIPTION_VAD_KEEPALIVE_MS,
+                )
+            
+            # Re-frame irregular client chunks into fixed-size upstream frames
+            frame_seconds = settings.TRANSCRIPTION_FRAME_MS / 1000
+            self.framer = AudioFramer(
+                frame_bytes=int(settings.TRANSCRIPTION_SAMPLE_RATE * frame_seconds) * 2,
+                max_hold=2 * frame_seconds,
+            )
+            
+            # Transcription events arrive on SDK threads; the bridge hands
+            # them to this consumer's event loop
+            self.transcript_bridge = TranscriptBridge(
+                loop=asyncio.get_running_loop(),
+                deliver=self.handle_transcription_data,
+            )
             
             # Create transcription session
-            session_id = await sync_to_async(create_transcription_session)(
-                callback=transcription_callback
+            session_id = await create_transcription_session(
+                callback=self.transcript_bridge.push,
+                route=self.channel_name,
+                user_id=self.user.pk,
+                attached=self.owns_session,
+                buffered=self.buffered_audio_bytes,
+                on_reaped=self.session_reaped,
             )
             
             self.session_id = session_id
             
+            # Buffer incoming audio and forward it from a single sender task
+            self.audio_queue = AudioIngestQueue(
+                sender=self.forward_audio,
+                max_frames=settings.TRANSCRIPTION_AUDIO_QUEUE_FRAMES,
+                policy=settings.TRANSCRIPTION_AUDIO_OVERFLOW_POLICY,
+                on_flow_control=self.send_flow_control,
+                on_error=self.send_error,
+                frame_seconds=frame_seconds,
+                max_lead=settings.TRANSCRIPTION_PACE_LEAD_MS / 1000,
+            )
+            
             # Send confirmation to client
             await self.send(json.dumps({
                 'type': 'session_started',
-                'session_id': session_id
+                'session_id': session_id,
+                'audioFormat': self.audio_stage.describe()
             }))
             
         except Exception as e:
+            # Undo whatever was started, including the upstream session
+            session_id, self.session_id = self.session_id, None
+            await self.close_session_helpers()
+            if session_id:
+                try:
+                    await close_transcription_session(session_id)
+                except ValueError:
+                    pass
+            
             await self.send(json.dumps({
                 'type': 'error',
                 'message': str(e)
             }))
 
-    async def stop_transcription(self):
+    async def stop_transcription(self, reason=None):
         """Stop the active transcription session"""
         if self.session_id:
-            # Close the transcription session
-            # Implementation depends on how you've set up your service
+            session_id = self.session_id
+            stats = self.session_stats()
+            
+            # Stop forwarding audio and delivering results
+            await self.close_session_helpers()
             self.session_id = None
             
-            await self.send(json.dumps({
-                'type': 'session_stopped'
-            }))
+            # Close the upstream transcription session
+            try:
+                await close_transcription_session(session_id)
+            except ValueError:
+                # Already reaped
+                pass
+            
+            message = {'type': 'session_stopped', 'stats': stats}
+            if reason:
+                message['reason'] = reason
+            await self.send(json.dumps(message))
+
+    async def session_reaped(self, session_id, reason):
+        """Tear down after the session manager reaped this session"""
+        if session_id != self.session_id:
+            return
+        
+        stats = self.session_stats()
+        await self.close_session_helpers()
+        self.session_id = None
+        
+        await self.send(json.dumps({
+            'type': 'session_stopped',
+            'reason': reason,
+            'stats': stats
+        }))
+
+    def owns_session(self, session_id):
+        """Whether this consumer still holds the session"""
+        return self.session_id == session_id
+
+    def buffered_audio_bytes(self):
+        """Audio received for this session but not yet sent upstream"""
+        buffered = self.audio_queue.buffered_bytes if self.audio_queue else 0
+        if self.framer:
+            buffered += self.framer.fill
+        return buffered
+
+    async def transcription_close(self, event):
+        """Stop the session when another worker asks to close it"""
+        if event['session_id'] == self.session_id:
+            await self.stop_transcription()
+
+    def session_stats(self):
+        """Summarize how much audio this session sent and skipped"""
+        stats = {}
+        if self.framer:
+            stats['frames'] = dict(self.framer.stats)
+        if self.audio_queue:
+            stats['queue'] = dict(self.audio_queue.stats)
+        if self.vad:
+            stats['vad'] = self.vad.summary()
+        return stats
+
+    async def close_session_helpers(self):
+        """Stop the per-session audio stages, event bridge and pipeline"""
+        if self.audio_queue:
+            await self.audio_queue.close()
+            self.audio_queue = None
+        
+        if self.audio_stage:
+            self.audio_stage.close()
+            self.audio_stage = None
+        
+        self.vad = None
+        self.framer = None
+        
+        if self.quota_meter:
+            quota_meters.release(self.quota_meter)
+            self.quota_meter = None
+        self.quota_cutoff = None
+        self.unmetered_bytes = 0
+        
+        if self.transcript_bridge:
+            await self.transcript_bridge.close()
+            self.transcript_bridge = None
+        
+        if self.pipeline:
+            await self.pipeline.close()
+            self.pipeline = None
+        
+        if self.room:
+            await self.channel_layer.group_discard(speakers_group(self.room), self.channel_name)
+            self.room = None
+            self.room_subscriptions = None
+
+    def start_pipeline(self, languages, voice_id=None, speak=True, streaming=False, deliver=None):
+        """Set up the translation and speech pipeline for this session"""
+        async def translate(text, language):
+            translation = await database_sync_to_async(translate_text, thread_sensitive=False)(
+                text, language
+            )
+            record_usage(self.user.pk, 'translation', character_count=len(text))
+            return translation
+        
+        async def stream_translate(text, language):
+            async for chunk in astream_translation(text, language):
+                yield chunk
+            record_usage(self.user.pk, 'translation', character_count=len(text))
+        
+        async def synthesize(text):
+            audio_bytes = await database_sync_to_async(get_or_create_speech_bytes, thread_sensitive=False)(
+                text, voice_id
+            )
+            record_usage(self.user.pk, 'text_to_speech', character_count=len(text))
+            return audio_bytes
+        
+        self.pipeline = TranslationPipeline(
+            translate=stream_translate if streaming else translate,
+            synthesize=synthesize if speak else None,
+            deliver=deliver or self.send_json_message,
+            languages=languages,
+            max_in_flight=settings.TRANSLATION_PIPELINE_MAX_IN_FLIGHT,
+            fanout_concurrency=settings.TRANSLATION_FANOUT_CONCURRENCY,
+            streaming=streaming,
+        )
+
+    async def join_room(self, room, voice_id=None, speak=True, streaming=False):
+        """Become a speaker in a room and ask its listeners for their languages"""
+        self.room = room
+        self.room_subscriptions = RoomSubscriptions()
+        self.start_pipeline([], voice_id=voice_id, speak=speak, streaming=streaming,
+                            deliver=self.send_to_room)
+        
+        await self.channel_layer.group_add(speakers_group(room), self.channel_name)
+        await self.channel_layer.group_send(listeners_group(room), {'type': 'room.hello'})
+
+    async def send_to_room(self, message):
+        """Deliver a pipeline result to the listeners of its language"""
+        await self.channel_layer.group_send(language_group(self.room, message['language']), {
+            'type': 'room.message',
+            'message': {**message, 'speaker': self.session_id},
+        })
+
+    async def room_subscribe(self, event):
+        """A listener wants this speaker's utterances in a language"""
+        if not self.room_subscriptions:
+            return
+        added, dropped = self.room_subscriptions.subscribe(event['channel'], event['language'])
+        if added:
+            self.pipeline.add_language(added)
+        if dropped:
+            self.pipeline.remove_language(dropped)
+
+    async def room_unsubscribe(self, event):
+        """A listener left or cleared its language"""
+        if not self.room_subscriptions:
+            return
+        dropped = self.room_subscriptions.unsubscribe(event['channel'])
+        if dropped:
+            self.pipeline.remove_language(dropped)
 
     async def process_audio(self, audio_data):
         """Process incoming audio data"""
-        if not self.session_id:
+        if not self.session_id or not self.audio_queue:
             return
         
         try:
-            # Process the audio data
-            # Implementation depends on how you've set up your service
-            pass
+            # Convert to mono PCM16 at the upstream rate
+            pcm = self.audio_stage.process(audio_data)
+            speech_bytes = len(pcm)
+            if self.vad:
+                keepalives = self.vad.stats['keepalives']
+                pcm = self.vad.process(pcm)
+                # Keep-alive frames are synthetic silence, not client speech
+                keepalives = self.vad.stats['keepalives'] - keepalives
+                speech_bytes = len(pcm) - keepalives * len(self.vad.keepalive_frame)
+            if not pcm:
+                return
+            self.unmetered_bytes += speech_bytes
+            
+            # Queue whole frames; the sender task forwards them upstream
+            await self.audio_queue.put(self.framer.write(pcm))
             
         except Exception as e:
+            await self.send_error(e)
+
+    async def forward_audio(self, audio_data):
+        """Send one queued audio frame to the upstream transcriber"""
+        meter = self.quota_meter
+        if meter.remaining <= 0:
+            self.end_for_quota()
+            return
+        
+        process_audio_chunk(self.session_id, audio_data)
+        
+        # Only client speech is charged: VAD keep-alives and the silence
+        # padding partial frames never added to unmetered_bytes
+        metered = min(len(audio_data), self.unmetered_bytes)
+        self.unmetered_bytes -= metered
+        # Frames are PCM16 at the transcription rate
+        state = meter.add(metered / (settings.TRANSCRIPTION_SAMPLE_RATE * 2))
+        if state == 'warn':
             await self.send(json.dumps({
-                'type': 'error',
-                'message': str(e)
+                'type': 'quota_warning',
+                'remainingSeconds': max(0, round(meter.remaining))
             }))
+        elif state == 'exhausted':
+            self.end_for_quota()
+
+    def end_for_quota(self):
+        """End the session once the monthly speech quota is used up"""
+        # Runs as its own task: stopping closes the queue whose sender called us
+        if not self.quota_cutoff:
+            self.quota_cutoff = asyncio.ensure_future(
+                self.stop_transcription(reason='quota_exhausted')
+            )
+
+    async def send_flow_control(self, action):
+        """Ask the client to pause or resume sending audio"""
+        await self.send(json.dumps({
+            'type': 'flow_control',
+            'action': action
+        }))
+
+    async def send_error(self, error):
+        """Send an error message to the client"""
+        await self.send(json.dumps({
+            'type': 'error',
+            'message': str(error)
+        }))
+
+    async def handle_transcription_data(self, data):
+        """Forward a transcription event and feed finals to the pipeline"""
+        await self.send_transcription_data(data)
+        
+        if self.room:
+            await self.channel_layer.group_send(listeners_group(self.room), {
+                'type': 'room.message',
+                'message': {'type': 'transcription_data', 'speaker': self.session_id, 'data': data},
+            })
+        
+        if self.pipeline and data.get('event') == 'transcript' and data.get('isFinal'):
+            self.pipeline.submit(data['text'])
 
-    def send_transcription_data(self, data):
+    async def send_json_message(self, message):
+        """Send a JSON message to WebSocket client"""
+        await self.send(json.dumps(message))
+
+    async def send_transcription_data(self, data):
         """Send transcription data to WebSocket client"""
-        self.send(json.dumps({
+        await self.send(json.dumps({
             'type': 'transcription_data',
             'data': data
         }))
@@ -119,4 +470,109 @@ class TranscriptionConsumer(AsyncWebsocketConsumer):
         """Check if user's subscription is active"""
         if not hasattr(self.user, 'subscription'):
             return False
-        return self.user.subscription.is_active()
\ No newline at end of file
+        return self.user.subscription.is_active()
+
+
+class RoomConsumer(AsyncWebsocketConsumer):
+    """
+    Listener in a conversation room
+
+    Receives every speaker's transcript, plus translations and speech in the
+    one language it subscribes to. Speakers translate each utterance once per
+    subscribed language, so listeners sharing a language share the work.
+    Only the room's owner and the members they invited can connect.
+    """
+
+    async def connect(self):
+        self.user = self.scope['user']
+        if self.user.is_anonymous:
+            await self.close()
+            return
+        
+        try:
+            room = validate_room(self.scope['url_route']['kwargs']['room'])
+        except ValueError:
+            await self.close()
+            return
+        
+        # Only the owner and invited members hear the room
+        if not await database_sync_to_async(can_join_room)(room, self.user.pk):
+            await self.close()
+            return
+        self.room = room
+        
+        await self.accept()
+        self.language = None
+        await self.channel_layer.group_add(listeners_group(self.room), self.channel_name)
+        
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        if query.get('language'):
+            await self.subscribe(query['language'][0])
+
+    async def disconnect(self, close_code):
+        if not getattr(self, 'room', None):
+            return
+        await self.unsubscribe()
+        await self.channel_layer.group_discard(listeners_group(self.room), self.channel_name)
+
+    async def receive(self, text_data=None, bytes_data=None):
+        """Handle subscribe / unsubscribe commands"""
+        if not text_data:
+            return
+        data = json.loads(text_data)
+        command = data.get('command')
+        
+        if command == 'subscribe':
+            await self.subscribe(data.get('language'))
+        elif command == 'unsubscribe':
+            await self.unsubscribe()
+            await self.send(json.dumps({'type': 'unsubscribed'}))
+
+    async def subscribe(self, language):
+        """Switch this listener to a target language"""
+        if language not in SUPPORTED_LANGUAGES:
+            await self.send(json.dumps({
+                'type': 'error',
+                'message': f"Unsupported language: {language}"
+            }))
+            return
+        
+        if self.language:
+            await self.channel_layer.group_discard(
+                language_group(self.room, self.language), self.channel_name
+            )
+        self.language = language
+        await self.channel_layer.group_add(language_group(self.room, language), self.channel_name)
+        await self.announce()
+        
+        await self.send(json.dumps({'type': 'subscribed', 'language': language}))
+
+    async def unsubscribe(self):
+        """Stop receiving translations"""
+        if not self.language:
+            return
+        await self.channel_layer.group_discard(
+            language_group(self.room, self.language), self.channel_name
+        )
+        self.language = None
+        await self.channel_layer.group_send(speakers_group(self.room), {
+            'type': 'room.unsubscribe',
+            'channel': self.channel_name,
+        })
+
+    async def announce(self):
+        """Tell the room's speakers which language this listener wants"""
+        await self.channel_layer.group_send(speakers_group(self.room), {
+            'type': 'room.subscribe',
+            'channel': self.channel_name,
+            'language': self.language,
+        })
+
+    async def room_hello(self, event):
+        """A speaker joined; repeat the subscription for it"""
+        if self.language:
+            await self.announce()
+
+    async def room_message(self, event):
+        """Forward a room broadcast to the client"""
+        await self.send(json.dumps(event['message']))
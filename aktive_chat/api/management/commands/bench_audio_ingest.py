@@ -0,0 +1,43 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from api.services.audio_processing import AudioIngestStage, to_pcm16_bytes
+
+
+class Command(BaseCommand):
+    help = "Measure single-core throughput of the audio ingest stage in frames/sec"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--input-rate', type=int, default=48000)
+        parser.add_argument('--target-rate', type=int, default=16000)
+        parser.add_argument('--frame-ms', type=int, default=20)
+        parser.add_argument('--seconds', type=float, default=60.0)
+
+    def handle(self, *args, **options):
+        input_rate = options['input_rate']
+        frame_samples = input_rate * options['frame_ms'] // 1000
+        frame_count = int(options['seconds'] * 1000 / options['frame_ms'])
+
+        rng = np.random.default_rng(0)
+        frames = [
+            to_pcm16_bytes(rng.uniform(-0.5, 0.5, frame_samples).astype(np.float32))
+            for _ in range(min(frame_count, 500))
+        ]
+
+        stage = AudioIngestStage('pcm16', sample_rate=input_rate, target_rate=options['target_rate'])
+        bytes_in = bytes_out = 0
+        start = time.perf_counter()
+        for i in range(frame_count):
+            frame = frames[i % len(frames)]
+            bytes_in += len(frame)
+            bytes_out += len(stage.process(frame))
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(
+            f"{frame_count} x {options['frame_ms']} ms frames, {input_rate} -> {options['target_rate']} Hz: "
+            f"{frame_count / elapsed:,.0f} frames/sec/core, "
+            f"{options['seconds'] / elapsed:,.0f}x realtime, "
+            f"{bytes_in / max(bytes_out, 1):.2f}x fewer bytes upstream"
+        )
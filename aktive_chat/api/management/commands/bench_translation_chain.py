@@ -0,0 +1,37 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.services.openai_service import build_translation_chain, get_translation_chain
+
+
+class Command(BaseCommand):
+    help = "Measure per-call translation chain overhead, rebuilt vs. process-wide (no API calls are made)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+
+        # Chains are only constructed, never invoked, so any key will do
+        os.environ.setdefault('OPENAI_API_KEY', 'sk-benchmark')
+
+        def per_call_rebuilt():
+            # What translate_text used to do on every call
+            build_translation_chain()
+
+        def per_call_shared():
+            get_translation_chain()
+
+        get_translation_chain()  # warm the process-wide chain
+
+        for label, fn in (('rebuilt', per_call_rebuilt), ('shared', per_call_shared)):
+            start = time.perf_counter()
+            for _ in range(iterations):
+                fn()
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f"{label:>8}: {elapsed / iterations * 1e6:10.1f} us/call over {iterations} calls"
+            )
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from api.services.speech_cache import prune_speech_cache
+
+
+class Command(BaseCommand):
+    help = "Evict cached speech by age and total size, keeping files referenced by translation history"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age-days', type=int, default=None)
+        parser.add_argument('--max-bytes', type=int, default=None)
+
+    def handle(self, *args, **options):
+        result = prune_speech_cache(
+            max_age_days=options['max_age_days'],
+            max_bytes=options['max_bytes'],
+        )
+        self.stdout.write(
+            f"Evicted {result['evicted']} entries ({result['evicted_bytes']} bytes), "
+            f"kept {result['referenced']} referenced by history"
+        )
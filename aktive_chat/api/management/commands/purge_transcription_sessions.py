@@ -0,0 +1,12 @@
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand
+
+from api.services.session_registry import build_session_registry
+
+
+class Command(BaseCommand):
+    help = "Remove registered transcription sessions whose owner stopped renewing their lease"
+
+    def handle(self, *args, **options):
+        purged = async_to_sync(build_session_registry().purge_expired)()
+        self.stdout.write(f"Purged {purged} expired sessions")
@@ -0,0 +1,26 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.services.usage import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily and monthly usage rollups from UsageRecord"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            help="Only rebuild months from the one containing this date (YYYY-MM-DD)",
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError("--since must be a date in YYYY-MM-DD format")
+
+        written = rebuild_rollups(since)
+        self.stdout.write(f"Wrote {written} usage rollups")
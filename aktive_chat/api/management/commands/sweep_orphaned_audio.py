@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.services.audio_storage import sweep_orphaned_audio
+
+
+class Command(BaseCommand):
+    help = "Delete stored audio files that no translation history row or speech cache entry references"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age-minutes', type=int, default=60)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        result = sweep_orphaned_audio(
+            min_age_minutes=options['min_age_minutes'],
+            dry_run=options['dry_run'],
+        )
+        action = "found" if options['dry_run'] else "deleted"
+        self.stdout.write(f"Scanned {result['scanned']} files, {action} {result['orphaned']} orphans")
@@ -3,4 +3,5 @@ from . import consumers
 
 websocket_urlpatterns = [
     re_path(r'ws/transcription/$', consumers.TranscriptionConsumer.as_asgi()),
+    re_path(r'ws/rooms/(?P<room>[\w-]+)/$', consumers.RoomConsumer.as_asgi()),
 ]
\ No newline at end of file
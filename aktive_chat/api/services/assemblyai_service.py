@@ -1,27 +1,45 @@
 import os
+import asyncio
+import time
 import assemblyai as aai
 import uuid
-from threading import Thread
+from channels.layers import get_channel_layer
+from django.conf import settings
 
-# Active transcription sessions
-active_sessions = {}
+from .session_recovery import AudioReplayBuffer, TranscriptOverlapFilter, backoff_delays
+from .session_registry import build_session_registry
+from .transcriber_pool import CallbackSlot, TranscriberPool
 
-def create_transcription_session(callback=None):
+# Session states reported by the session manager
+SESSION_STATES = ('initialized', 'connecting', 'connected', 'reconnecting', 'error')
+
+# Reasons the reaper closes a session
+REAP_IDLE = 'idle'
+REAP_DURATION = 'max_duration'
+REAP_BUFFER = 'max_buffered_bytes'
+REAP_LEAKED = 'leaked'
+# Reason reported through on_reaped when a dropped session cannot be reconnected
+RECONNECT_FAILED = 'reconnect_failed'
+
+def build_transcriber(callback=None):
     """
-    Create a new transcription session with AssemblyAI
-    
+    Build an AssemblyAI realtime transcriber wired to a callback
+
+    Uses the realtime API of the 0.x SDK (connect, stream, close); the 1.x
+    releases no longer ship RealtimeTranscriber.
+
     Args:
         callback (callable): Function to call with transcription data
-        
+
     Returns:
-        str: Session ID
+        aai.RealtimeTranscriber: Unconnected transcriber
     """
     api_key = os.environ.get('ASSEMBLYAI_API_KEY')
     if not api_key:
         raise ValueError("AssemblyAI API key not found in environment variables")
-    
+
     aai.settings.api_key = api_key
-    
+
     def on_open(session_opened):
         """Handler for when connection is established"""
         if callback:
@@ -29,19 +47,19 @@ def create_transcription_session(callback=None):
                 'event': 'connected',
                 'sessionId': session_opened.session_id
             })
-    
+
     def on_data(transcript):
         """Handler for when transcript data is received"""
         if not transcript.text:
             return
-            
+
         if callback:
             callback({
                 'event': 'transcript',
                 'text': transcript.text,
                 'isFinal': isinstance(transcript, aai.RealtimeFinalTranscript)
             })
-    
+
     def on_error(error):
         """Handler for errors"""
         if callback:
@@ -49,83 +67,574 @@ def create_transcription_session(callback=None):
                 'event': 'error',
                 'error': str(error)
             })
-    
+
     def on_close():
         """Handler for when connection is closed"""
         if callback:
             callback({
                 'event': 'disconnected'
             })
-    
-    # Create transcriber
-    transcriber = aai.RealtimeTranscriber(
+
+    return aai.RealtimeTranscriber(
         on_data=on_data,
         on_error=on_error,
-        sample_rate=44_100,
+        sample_rate=settings.TRANSCRIPTION_SAMPLE_RATE,
         on_open=on_open,
         on_close=on_close
     )
-    
-    # Generate session ID
-    session_id = str(uuid.uuid4())
-    
-    # Store transcriber
-    active_sessions[session_id] = {
-        'transcriber': transcriber,
-        'status': 'initialized'
-    }
-    
-    # Connect in background thread
-    def connect_transcriber():
+
+class TranscriptionSessionManager:
+    """
+    Owns upstream transcription sessions on the ASGI event loop
+
+    Each session's upstream handshake runs as a task on the loop instead of a
+    dedicated thread, and the number of concurrent sessions is capped.
+    Transcribers live in this process; every session is also recorded in the
+    session registry, so other workers can find it and reach its owner.
+
+    New sessions take a pre-connected transcriber from the pool when one is
+    warm, so they start without waiting for the upstream handshake.
+
+    When an upstream connection drops, the session reconnects with
+    exponential backoff and replays the last few seconds of audio into the
+    new connection; text transcribed twice because of the replay is removed.
+
+    A maintenance task renews registry leases and reaps sessions that went
+    idle, ran past their maximum duration, buffered too much audio, or were
+    abandoned by their consumer without being closed.
+    """
+
+    def __init__(self, registry, pool=None, max_sessions=200, idle_timeout=60,
+                 max_duration=4 * 3600, max_buffered_bytes=1024 * 1024, reap_interval=10,
+                 replay_bytes=160000, reconnect_delays=(0.5, 1, 2, 4, 8)):
+        """
+        Args:
+            registry: Session registry (see session_registry)
+            pool (TranscriberPool, optional): Pre-connected transcribers
+            max_sessions (int): Cap on concurrent sessions in this worker
+            idle_timeout (float): Seconds without audio before a session is reaped
+            max_duration (float): Seconds a session may stay open
+            max_buffered_bytes (int): Audio a session may have waiting to be sent
+            reap_interval (float): Seconds between maintenance passes
+            replay_bytes (int): Recent audio kept for replay after a reconnect
+            reconnect_delays (sequence): Delay before each reconnect attempt
+        """
+        self.registry = registry
+        self.pool = pool
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_duration = max_duration
+        self.max_buffered_bytes = max_buffered_bytes
+        self.reap_interval = reap_interval
+        self.replay_bytes = replay_bytes
+        self.reconnect_delays = list(reconnect_delays)
+        self.sessions = {}
+        self.maintenance_task = None
+        self.stats = {
+            'opened': 0,
+            'closed': 0,
+            'reaped': dict.fromkeys((REAP_IDLE, REAP_DURATION, REAP_BUFFER), 0),
+            'leaked': 0,
+            'reconnects': 0,
+            'reconnect_failures': 0,
+        }
+
+    async def create_session(self, callback=None, route='', user_id=None,
+                             attached=None, buffered=None, on_reaped=None, wait=True):
+        """
+        Create a session connected upstream
+
+        Args:
+            callback (callable): Function to call with transcription data
+            route (str): Channel name of the consumer that owns the session
+            user_id (int, optional): Owning user
+            attached (callable, optional): Called with the session ID;
+                returns False once the owner has let go of the session
+            buffered (callable, optional): Returns the bytes of audio the
+                owner has queued for the session
+            on_reaped (coroutine function, optional): Called with the
+                session ID and reason after the reaper closes the session,
+                or with RECONNECT_FAILED once a dropped session is given up
+            wait (bool): Return only once the session is connected; if
+                False the handshake continues in the background
+
+        Returns:
+            str: Session ID
+        """
+        if len(self.sessions) >= self.max_sessions:
+            raise ValueError("Too many active transcription sessions, try again later")
+
+        session_id = str(uuid.uuid4())
+        now = time.monotonic()
+        session = {
+            'status': 'initialized',
+            'created': now,
+            'last_audio': now,
+            'attached': attached,
+            'buffered': buffered,
+            'on_reaped': on_reaped,
+            'callback': callback,
+            'loop': asyncio.get_running_loop(),
+            'generation': 0,
+            'replay': AudioReplayBuffer(self.replay_bytes),
+            'overlap': TranscriptOverlapFilter(),
+            # The owner only learns the ID when this returns; until then it
+            # cannot be asked whether it still holds the session
+            'starting': True,
+        }
+        self.sessions[session_id] = session
+
+        transcriber, pooled = self._open_transcriber(session_id, session)
+        session['transcriber'] = transcriber
+        status = session['status'] = 'connected' if pooled else 'initialized'
+        try:
+            await self.registry.register(session_id, status=status, route=route, user_id=user_id)
+        except Exception:
+            del self.sessions[session_id]
+            # A pooled transcriber is already connected upstream
+            asyncio.get_running_loop().run_in_executor(None, _close_quietly, transcriber)
+            raise
+        self.stats['opened'] += 1
+
+        if self.maintenance_task is None or self.maintenance_task.done():
+            self.maintenance_task = asyncio.ensure_future(self._maintain())
+
+        if pooled:
+            session['starting'] = False
+            return session_id
+
+        task = asyncio.ensure_future(self._connect(session_id))
+        self.sessions[session_id]['task'] = task
+        if wait:
+            await task
+            session = self.sessions.get(session_id)
+            if session is None or session['status'] != 'connected':
+                error = session.get('error', 'session closed') if session else 'session closed'
+                if session is not None:
+                    try:
+                        await self._close_local(session_id)
+                    except Exception:
+                        pass
+                raise ValueError(f"Could not connect to the transcription service: {error}")
+
+        session['starting'] = False
+        return session_id
+
+    async def _connect(self, session_id):
+        session = self.sessions[session_id]
+        await self._set_status(session_id, 'connecting')
         try:
-            active_sessions[session_id]['status'] = 'connecting'
-            transcriber.connect()
-            active_sessions[session_id]['status'] = 'connected'
+            # The SDK handshake is blocking, so it borrows an executor thread
+            # only for the duration of the connect call
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, session['transcriber'].connect)
+            await self._set_status(session_id, 'connected')
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
-            active_sessions[session_id]['status'] = 'error'
-            active_sessions[session_id]['error'] = str(e)
-    
-    thread = Thread(target=connect_transcriber)
-    thread.daemon = True
-    thread.start()
-    
-    return session_id
+            session['error'] = str(e)
+            await self._set_status(session_id, 'error')
+
+    def _open_transcriber(self, session_id, session):
+        # Events from a transcriber are tagged with the generation it was
+        # opened for, so a replaced connection cannot trigger anything
+        handler = self._event_handler(session_id, session, session['generation'])
+        transcriber = self.pool.claim(handler) if self.pool else None
+        if transcriber is not None:
+            return transcriber, True
+        return build_transcriber(handler), False
+
+    def _event_handler(self, session_id, session, generation):
+        def handle(data):
+            # Runs on SDK threads
+            if session.get('closing') or session['generation'] != generation:
+                return
+
+            event = data.get('event')
+            if event in ('error', 'disconnected') and session['status'] == 'reconnecting':
+                # Already recovering; failed attempts are retried quietly
+                return
+            if event in ('error', 'disconnected') and session['status'] == 'connected':
+                session['status'] = 'reconnecting'
+                session['loop'].call_soon_threadsafe(self._start_reconnect, session_id)
+                data = {'event': 'reconnecting', 'reason': data.get('error', event)}
+            elif event == 'connected' and generation:
+                data = {**data, 'event': 'reconnected'}
+            elif event == 'transcript':
+                data = session['overlap'].process(data)
+                if data is None:
+                    return
+
+            if session['callback']:
+                session['callback'](data)
+
+        return handle
+
+    def _start_reconnect(self, session_id):
+        session = self.sessions.get(session_id)
+        if session and not session.get('reconnect_task'):
+            session['reconnect_task'] = asyncio.ensure_future(self._reconnect(session_id))
+
+    async def _reconnect(self, session_id):
+        session = self.sessions[session_id]
+        loop = asyncio.get_running_loop()
+        await self.registry.set_status(session_id, 'reconnecting')
+
+        old = session['transcriber']
+        try:
+            for delay in self.reconnect_delays:
+                await asyncio.sleep(delay)
+                if session.get('closing'):
+                    return
+
+                session['generation'] += 1
+                transcriber, pooled = self._open_transcriber(session_id, session)
+                try:
+                    if not pooled:
+                        await self._connect_transcriber(transcriber)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    loop.run_in_executor(None, _close_quietly, transcriber)
+                    continue
+
+                session['transcriber'] = transcriber
+                loop.run_in_executor(None, _close_quietly, old)
+
+                # Replay recent audio; the overlap filter trims what was
+                # already transcribed before the drop
+                session['overlap'].arm()
+                replay = session['replay'].snapshot()
+                if replay:
+                    transcriber.stream(replay)
+
+                self.stats['reconnects'] += 1
+                await self._set_status(session_id, 'connected')
+                return
+
+            self.stats['reconnect_failures'] += 1
+            session['error'] = 'Lost connection to the transcription service'
+            await self._set_status(session_id, 'error')
+        finally:
+            session['reconnect_task'] = None
+
+        # Give up: release the slot and let the owner tear down its side
+        try:
+            await self._close_local(session_id)
+        except Exception:
+            pass
+        self.stats['closed'] += 1
+        if session['on_reaped']:
+            try:
+                await session['on_reaped'](session_id, RECONNECT_FAILED)
+            except Exception:
+                pass
+        elif session['callback']:
+            session['callback']({'event': 'error', 'error': session['error']})
+            session['callback']({'event': 'disconnected'})
+
+    async def _connect_transcriber(self, transcriber):
+        # Cancelling the caller cannot stop the handshake in its thread, so a
+        # transcriber abandoned mid-connect is closed once the handshake ends
+        loop = asyncio.get_running_loop()
+        connecting = loop.run_in_executor(None, transcriber.connect)
+        try:
+            await asyncio.shield(connecting)
+        except asyncio.CancelledError:
+            def close_when_connected(future):
+                if not future.cancelled():
+                    # Retrieved, so a failed handshake is not logged as unhandled
+                    future.exception()
+                loop.run_in_executor(None, _close_quietly, transcriber)
+
+            connecting.add_done_callback(close_when_connected)
+            raise
+
+    async def _set_status(self, session_id, status):
+        if session_id in self.sessions:
+            self.sessions[session_id]['status'] = status
+            await self.registry.set_status(session_id, status)
+
+    async def _maintain(self):
+        # Renew this worker's leases and reap sessions until none are left
+        interval = min(self.reap_interval, self.registry.lease_seconds / 3)
+        while self.sessions:
+            try:
+                await self.reap()
+                await self.registry.heartbeat(list(self.sessions))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # A missed pass is retried; the lease covers a few of them
+                pass
+            await asyncio.sleep(interval)
+
+    def reap_reason(self, session_id, now=None):
+        """
+        Decide whether a session should be reaped
+
+        Args:
+            session_id (str): Session ID
+            now (float, optional): time.monotonic() value to judge against
+
+        Returns:
+            str: One of the REAP_* reasons, or None to keep the session
+        """
+        session = self.sessions[session_id]
+        now = time.monotonic() if now is None else now
+
+        if session['attached'] and not session.get('starting') and not session['attached'](session_id):
+            return REAP_LEAKED
+        if now - session['created'] > self.max_duration:
+            return REAP_DURATION
+        if now - session['last_audio'] > self.idle_timeout:
+            return REAP_IDLE
+        if session['buffered'] and session['buffered']() > self.max_buffered_bytes:
+            return REAP_BUFFER
+        return None
+
+    async def reap(self):
+        """
+        Close every session that should be reaped
+
+        Returns:
+            dict: Session ID to reason for each reaped session
+        """
+        reaped = {}
+        now = time.monotonic()
+        for session_id in list(self.sessions):
+            reason = self.reap_reason(session_id, now)
+            if reason is None:
+                continue
+
+            on_reaped = self.sessions[session_id]['on_reaped']
+            try:
+                await self._close_local(session_id)
+            except Exception:
+                # The slot is released even if the upstream close fails
+                pass
+            if reason == REAP_LEAKED:
+                self.stats['leaked'] += 1
+            else:
+                self.stats['reaped'][reason] += 1
+            reaped[session_id] = reason
+
+            if on_reaped and reason != REAP_LEAKED:
+                try:
+                    await on_reaped(session_id, reason)
+                except Exception:
+                    pass
+        return reaped
+
+    def send_audio(self, session_id, audio_data):
+        """
+        Send audio to a connected session owned by this worker
+
+        Args:
+            session_id (str): Session ID
+            audio_data (bytes): Raw audio data
+        """
+        if session_id not in self.sessions:
+            raise ValueError(f"Invalid session ID: {session_id}")
+
+        session = self.sessions[session_id]
+        if session['status'] == 'reconnecting':
+            # Kept for replay once the new connection is up
+            session['replay'].write(audio_data)
+            session['last_audio'] = time.monotonic()
+            return
+        if session['status'] != 'connected':
+            raise ValueError(f"Session not connected. Status: {session['status']}")
+
+        # The transcriber buffers writes internally, so this does not block the loop
+        # Audio arrives as mono PCM16 at TRANSCRIPTION_SAMPLE_RATE (see AudioIngestStage)
+        session['transcriber'].stream(audio_data)
+        session['replay'].write(audio_data)
+        session['last_audio'] = time.monotonic()
+
+    async def find_session(self, session_id):
+        """
+        Look a session up in the registry, whichever worker owns it
+
+        Args:
+            session_id (str): Session ID
+
+        Returns:
+            dict: Registry record (owner, route, status, user_id), or None
+        """
+        return await self.registry.get(session_id)
+
+    async def close_session(self, session_id):
+        """
+        Close a session and release its slot
+
+        Sessions owned by another worker are closed by asking their consumer
+        to stop, through the channel layer.
+
+        Args:
+            session_id (str): Session ID
+        """
+        if session_id not in self.sessions:
+            record = await self.registry.get(session_id)
+            if record is None or not record['route']:
+                raise ValueError(f"Invalid session ID: {session_id}")
+            await get_channel_layer().send(record['route'], {
+                'type': 'transcription.close',
+                'session_id': session_id,
+            })
+            return
+
+        await self._close_local(session_id)
+        self.stats['closed'] += 1
+
+    async def _close_local(self, session_id):
+        session = self.sessions.pop(session_id)
+        session['closing'] = True
+
+        for name in ('task', 'reconnect_task'):
+            task = session.get(name)
+            if task and not task.done():
+                task.cancel()
+
+        try:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, session['transcriber'].close)
+        finally:
+            await self.registry.release(session_id)
+
+    async def state_counts(self):
+        """
+        Count sessions in each state across all workers sharing the registry
+
+        Returns:
+            dict: Number of sessions per state in SESSION_STATES
+        """
+        counts = dict.fromkeys(SESSION_STATES, 0)
+        counts.update(await self.registry.state_counts())
+        return counts
+
+    def lifecycle_stats(self):
+        """
+        Report this worker's session lifecycle counters
+
+        Returns:
+            dict: Sessions opened, closed normally, reaped per reason,
+                found leaked, and currently live in this worker
+        """
+        return {
+            **self.stats,
+            'reaped': dict(self.stats['reaped']),
+            'live': len(self.sessions),
+            'pool': self.pool.summary() if self.pool else None,
+        }
+
+def _close_quietly(transcriber):
+    try:
+        transcriber.close()
+    except Exception:
+        pass
+
+def build_pooled_transcriber():
+    """Build an unconnected transcriber whose callback is attached when it is claimed"""
+    slot = CallbackSlot()
+    return build_transcriber(slot), slot
+
+session_manager = TranscriptionSessionManager(
+    build_session_registry(),
+    pool=TranscriberPool(
+        build_pooled_transcriber,
+        min_size=settings.TRANSCRIPTION_POOL_MIN_SIZE,
+        max_size=settings.TRANSCRIPTION_POOL_MAX_SIZE,
+        max_idle=settings.TRANSCRIPTION_POOL_MAX_IDLE_SECONDS,
+        horizon=settings.TRANSCRIPTION_POOL_HORIZON_SECONDS,
+        warm_threshold=settings.TRANSCRIPTION_POOL_WARM_THRESHOLD,
+    ),
+    max_sessions=settings.TRANSCRIPTION_MAX_SESSIONS,
+    idle_timeout=settings.TRANSCRIPTION_IDLE_TIMEOUT_SECONDS,
+    max_duration=settings.TRANSCRIPTION_MAX_DURATION_SECONDS,
+    max_buffered_bytes=settings.TRANSCRIPTION_MAX_BUFFERED_BYTES,
+    reap_interval=settings.TRANSCRIPTION_REAP_INTERVAL_SECONDS,
+    replay_bytes=int(settings.TRANSCRIPTION_REPLAY_SECONDS * settings.TRANSCRIPTION_SAMPLE_RATE * 2),
+    reconnect_delays=backoff_delays(
+        settings.TRANSCRIPTION_RECONNECT_ATTEMPTS,
+        base=settings.TRANSCRIPTION_RECONNECT_BASE_DELAY,
+        maximum=settings.TRANSCRIPTION_RECONNECT_MAX_DELAY,
+    ),
+)
+
+async def create_transcription_session(callback=None, route='', user_id=None,
+                                       attached=None, buffered=None, on_reaped=None):
+    """
+    Create a new transcription session with AssemblyAI
+
+    Args:
+        callback (callable): Function to call with transcription data
+        route (str): Channel name of the consumer that owns the session
+        user_id (int, optional): Owning user
+        attached (callable, optional): Called with the session ID;
+            returns False once the owner has let go of the session
+        buffered (callable, optional): Returns the bytes of audio the
+            owner has queued for the session
+        on_reaped (coroutine function, optional): Called with the session
+            ID and reason after the session is closed for the owner
+
+    Returns:
+        str: Session ID
+    """
+    return await session_manager.create_session(
+        callback,
+        route=route,
+        user_id=user_id,
+        attached=attached,
+        buffered=buffered,
+        on_reaped=on_reaped,
+    )
 
 def process_audio_chunk(session_id, audio_data):
     """
     Process audio chunk for transcription
-    
+
     Args:
         session_id (str): Session ID
         audio_data (bytes): Raw audio data
     """
-    if session_id not in active_sessions:
-        raise ValueError(f"Invalid session ID: {session_id}")
-    
-    session = active_sessions[session_id]
-    if session['status'] != 'connected':
-        raise ValueError(f"Session not connected. Status: {session['status']}")
-    
-    transcriber = session['transcriber']
-    # Process the audio data (implementation depends on AssemblyAI)
-    # This is a simplified version - in production you'd need to format the audio correctly
-    transcriber.process_audio(audio_data)
-
-def close_transcription_session(session_id):
-    """
-    Close an active transcription session
-    
+    session_manager.send_audio(session_id, audio_data)
+
+async def close_transcription_session(session_id):
+    """
+    Close an active transcription session, on whichever worker owns it
+
+    Args:
+        session_id (str): Session ID
+    """
+    await session_manager.close_session(session_id)
+
+async def find_transcription_session(session_id):
+    """
+    Find an active transcription session on any worker
+
     Args:
         session_id (str): Session ID
+
+    Returns:
+        dict: Owner, route, status and user_id, or None
+    """
+    return await session_manager.find_session(session_id)
+
+async def get_session_state_counts():
+    """
+    Count active transcription sessions per state
+
+    Returns:
+        dict: Number of sessions per state
+    """
+    return await session_manager.state_counts()
+
+def get_session_lifecycle_stats():
+    """
+    Report opened, closed, reaped and leaked session counts for this worker
+
+    Returns:
+        dict: Lifecycle counters
     """
-    if session_id not in active_sessions:
-        raise ValueError(f"Invalid session ID: {session_id}")
-    
-    session = active_sessions[session_id]
-    transcriber = session['transcriber']
-    
-    # Close the transcriber
-    transcriber.close()
-    
-    # Remove from active sessions
-    del active_sessions[session_id]
\ No newline at end of file
+    return session_manager.lifecycle_stats()
@@ -0,0 +1,217 @@
+import asyncio
+import time
+
+# Overflow policies for a full ingest queue
+DROP_OLDEST = 'drop_oldest'
+PAUSE = 'pause'
+OVERFLOW_POLICIES = (DROP_OLDEST, PAUSE)
+
+
+class AudioFramer:
+    """
+    Re-frames an irregular byte stream into fixed-size frames
+
+    Incoming audio is copied straight into a preallocated frame buffer;
+    large chunks that start on a frame boundary are sliced without staging.
+    A partial frame that has waited longer than ``max_hold`` seconds is
+    padded with silence and released on the next write, so sparse audio
+    (such as VAD keep-alives) is not held back indefinitely.
+    """
+
+    def __init__(self, frame_bytes, max_hold=0.2, clock=time.monotonic):
+        """
+        Args:
+            frame_bytes (int): Size of every emitted frame
+            max_hold (float): Longest a partial frame is buffered, in seconds
+            clock (callable): Monotonic time source
+        """
+        self.frame_bytes = frame_bytes
+        self.max_hold = max_hold
+        self.clock = clock
+        self.buffer = bytearray(frame_bytes)
+        self.fill = 0
+        self.started_at = None
+        self.stats = {'frames': 0, 'padded': 0}
+
+    def write(self, data):
+        """
+        Add audio and return the frames it completes
+
+        Args:
+            data (bytes): Audio bytes of any length
+
+        Returns:
+            list: Complete frames, each exactly ``frame_bytes`` long
+        """
+        frames = []
+        stale = 0
+        if self.fill and self.clock() - self.started_at > self.max_hold:
+            frames.append(self.flush())
+            stale = 1
+
+        view = memoryview(data)
+        position = 0
+        size = self.frame_bytes
+        while position < len(view):
+            if not self.fill and len(view) - position >= size:
+                frames.append(bytes(view[position:position + size]))
+                position += size
+                continue
+
+            n = min(size - self.fill, len(view) - position)
+            if not self.fill:
+                self.started_at = self.clock()
+            self.buffer[self.fill:self.fill + n] = view[position:position + n]
+            self.fill += n
+            position += n
+            if self.fill == size:
+                frames.append(bytes(self.buffer))
+                self.fill = 0
+
+        self.stats['frames'] += len(frames) - stale
+        return frames
+
+    def flush(self):
+        """
+        Release the partial frame, padded with silence
+
+        Returns:
+            bytes: One frame, or empty when nothing is buffered
+        """
+        if not self.fill:
+            return b''
+        self.buffer[self.fill:] = bytes(self.frame_bytes - self.fill)
+        self.fill = 0
+        self.stats['frames'] += 1
+        self.stats['padded'] += 1
+        return bytes(self.buffer)
+
+
+class AudioIngestQueue:
+    """
+    Bounded per-session audio queue drained by a single sender task
+
+    Frames are queued one client message at a time. When a message arrives
+    at a full queue the configured policy decides what happens:
+    ``drop_oldest`` discards the oldest buffered frames to make room,
+    ``pause`` asks the client to stop sending (via ``on_flow_control``) and
+    drops new messages until the queue has drained below the resume mark.
+    Audio from an accepted message is never dropped: when it is longer than
+    the free space, ``put`` waits for the sender, which stops reading from
+    the client until the message is queued.
+
+    With ``frame_seconds`` set, frames are sent at the pace of the audio they
+    carry: sends may run at most ``max_lead`` seconds ahead of real time, so
+    a burst from the client is spread out instead of hitting upstream at once.
+    """
+
+    def __init__(self, sender, max_frames=50, policy=DROP_OLDEST,
+                 on_flow_control=None, on_error=None, frame_seconds=None, max_lead=0.5):
+        """
+        Args:
+            sender (coroutine function): Called with each frame, in order
+            max_frames (int): Maximum number of buffered frames
+            policy (str): One of OVERFLOW_POLICIES
+            on_flow_control (coroutine function, optional): Called with
+                'pause' or 'resume' when the client should change pace
+            on_error (coroutine function, optional): Called with the
+                exception when the sender fails for a frame
+            frame_seconds (float, optional): Audio duration of one frame;
+                enables pacing
+            max_lead (float): How far sends may run ahead of real time
+        """
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {policy}")
+
+        self.sender = sender
+        self.max_frames = max(1, max_frames)
+        self.resume_at = self.max_frames // 2
+        self.policy = policy
+        self.on_flow_control = on_flow_control
+        self.on_error = on_error
+        self.frame_seconds = frame_seconds
+        self.max_lead = max_lead
+
+        self.queue = asyncio.Queue(maxsize=self.max_frames)
+        self.paused = False
+        self.closed = False
+        self.stats = {'enqueued': 0, 'sent': 0, 'dropped': 0}
+        # Bytes waiting in the queue, for per-session buffer limits
+        self.buffered_bytes = 0
+        self.task = asyncio.ensure_future(self._drain())
+
+    async def put(self, frames):
+        """
+        Buffer the frames of one client message for the upstream sender
+
+        Args:
+            frames (list): Frames cut from one client message, in order
+        """
+        if not frames or self.closed:
+            return
+
+        if self.queue.full():
+            if self.policy == DROP_OLDEST:
+                # Make room for the message from older audio only
+                for _ in range(min(self.queue.qsize(), len(frames))):
+                    self.buffered_bytes -= len(self.queue.get_nowait())
+                    self.queue.task_done()
+                    self.stats['dropped'] += 1
+            else:
+                self.stats['dropped'] += len(frames)
+                await self._set_paused(True)
+                return
+
+        for frame in frames:
+            await self.queue.put(frame)
+            if self.closed:
+                return
+            self.buffered_bytes += len(frame)
+            self.stats['enqueued'] += 1
+
+    async def close(self):
+        """Stop the sender task and discard any buffered frames"""
+        self.closed = True
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+
+        while not self.queue.empty():
+            self.queue.get_nowait()
+            self.queue.task_done()
+        self.buffered_bytes = 0
+
+    async def _drain(self):
+        loop = asyncio.get_running_loop()
+        # Real time by which everything sent so far would have been spoken
+        sent_until = loop.time()
+        while True:
+            frame = await self.queue.get()
+            self.buffered_bytes -= len(frame)
+            if self.frame_seconds:
+                now = loop.time()
+                sent_until = max(sent_until, now) + self.frame_seconds
+                if sent_until - now > self.max_lead:
+                    await asyncio.sleep(sent_until - now - self.max_lead)
+            try:
+                await self.sender(frame)
+                self.stats['sent'] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self.on_error:
+                    await self.on_error(e)
+            finally:
+                self.queue.task_done()
+
+            if self.paused and self.queue.qsize() <= self.resume_at:
+                await self._set_paused(False)
+
+    async def _set_paused(self, paused):
+        if self.paused == paused:
+            return
+        self.paused = paused
+        if self.on_flow_control:
+            await self.on_flow_control('pause' if paused else 'resume')
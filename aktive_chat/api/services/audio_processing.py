@@ -0,0 +1,374 @@
+import io
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+
+try:
+    import av
+except ImportError:  # Only needed to decode compressed browser audio (webm/ogg)
+    av = None
+
+# Encodings a client can declare for its audio frames
+PCM16 = 'pcm16'
+FLOAT32 = 'float32'
+WEBM = 'webm'
+OGG = 'ogg'
+RAW_ENCODINGS = {PCM16: '<i2', FLOAT32: '<f4'}
+CONTAINER_ENCODINGS = (WEBM, OGG)
+
+
+def lowpass_filter(cutoff, taps=64, beta=8.0):
+    """
+    Kaiser-windowed sinc low-pass filter
+
+    Args:
+        cutoff (float): Cutoff as a fraction of the input Nyquist frequency
+        taps (int): Filter length
+        beta (float): Kaiser window shape
+
+    Returns:
+        np.ndarray: Filter coefficients with unity DC gain
+    """
+    n = np.arange(taps) - (taps - 1) / 2
+    h = np.sinc(cutoff * n) * np.kaiser(taps, beta)
+    return (h / h.sum()).astype(np.float32)
+
+
+class StreamingResampler:
+    """
+    Vectorized sample-rate converter for a continuous mono stream
+
+    Frames of any size can be fed in; the output is the same as resampling
+    the concatenated stream in one go. Downsampling applies an anti-aliasing
+    low-pass filter before linear interpolation.
+    """
+
+    def __init__(self, in_rate, out_rate, taps=64):
+        """
+        Args:
+            in_rate (int): Input sample rate in Hz
+            out_rate (int): Output sample rate in Hz
+            taps (int): Anti-aliasing filter length
+        """
+        self.in_rate = in_rate
+        self.out_rate = out_rate
+        self.step = in_rate / out_rate
+
+        self.filter = None
+        if out_rate < in_rate:
+            self.filter = lowpass_filter(0.9 * out_rate / in_rate, taps)
+            self.history = np.zeros(taps - 1, dtype=np.float32)
+
+        # Last filtered sample of the previous frame, and the position of the
+        # next output sample relative to it
+        self.carry = np.zeros(1, dtype=np.float32)
+        self.position = 0.0
+        self.started = False
+
+    def process(self, samples):
+        """
+        Resample the next frame of the stream
+
+        Args:
+            samples (np.ndarray): Mono float32 samples at ``in_rate``
+
+        Returns:
+            np.ndarray: Mono float32 samples at ``out_rate``
+        """
+        samples = np.asarray(samples, dtype=np.float32)
+        if self.in_rate == self.out_rate or not len(samples):
+            return samples
+
+        if self.filter is not None:
+            padded = np.concatenate((self.history, samples))
+            self.history = padded[-(len(self.filter) - 1):]
+            samples = np.convolve(padded, self.filter, mode='valid')
+
+        if self.started:
+            buffer = np.concatenate((self.carry, samples))
+        else:
+            buffer = samples
+            self.started = True
+
+        last = len(buffer) - 1
+        count = int(np.floor((last - self.position) / self.step)) + 1 if last >= self.position else 0
+        if count <= 0:
+            self.carry = buffer[-1:]
+            self.position -= last
+            return np.zeros(0, dtype=np.float32)
+
+        t = self.position + np.arange(count) * self.step
+        index = np.minimum(t.astype(np.int64), last - 1 if last > 0 else 0)
+        fraction = (t - index).astype(np.float32)
+        upper = np.minimum(index + 1, last)
+        out = buffer[index] * (1 - fraction) + buffer[upper] * fraction
+
+        self.position = self.position + count * self.step - last
+        self.carry = buffer[-1:]
+        return out.astype(np.float32)
+
+
+def to_pcm16_bytes(samples):
+    """Convert float samples in [-1, 1] to little-endian PCM16 bytes"""
+    return (np.clip(samples, -1.0, 1.0) * 32767.0).round().astype('<i2').tobytes()
+
+
+def raw_frame_bytes(encoding, channels=1):
+    """Bytes in one interleaved sample frame (one sample for every channel)"""
+    return np.dtype(RAW_ENCODINGS[encoding]).itemsize * channels
+
+
+def decode_raw(data, encoding, channels=1):
+    """
+    Decode raw PCM frame bytes to mono float32 samples
+
+    Args:
+        data (bytes): Interleaved PCM16 or float32 samples; a length that is
+            not a whole number of sample frames is an error, callers carry
+            the remainder into the next call
+        encoding (str): PCM16 or FLOAT32
+        channels (int): Interleaved channel count
+
+    Returns:
+        np.ndarray: Mono float32 samples in [-1, 1]
+    """
+    dtype = RAW_ENCODINGS[encoding]
+    if len(data) % raw_frame_bytes(encoding, channels):
+        raise ValueError("Raw audio must be whole sample frames")
+    samples = np.frombuffer(data, dtype=dtype).astype(np.float32)
+    if encoding == PCM16:
+        samples /= 32768.0
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples
+
+
+class _ChunkReader(io.RawIOBase):
+    """Blocking file-like object fed with container bytes from another thread"""
+
+    def __init__(self):
+        self.chunks = queue.Queue()
+        self.buffer = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, target):
+        while not self.buffer:
+            chunk = self.chunks.get()
+            if chunk is None:
+                return 0
+            self.buffer = chunk
+        size = min(len(target), len(self.buffer))
+        target[:size] = self.buffer[:size]
+        self.buffer = self.buffer[size:]
+        return size
+
+
+class DecoderPool:
+    """
+    Bounded set of threads shared by every container decoder in the process
+
+    A container demuxer blocks while it waits for the next fragment, so each
+    open webm/ogg stream holds one pool thread until it is closed. Streams
+    beyond ``max_workers`` are refused instead of adding threads; raw PCM
+    streams never use the pool.
+    """
+
+    def __init__(self, max_workers=4):
+        """
+        Args:
+            max_workers (int): Container streams decoded at once
+        """
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='audio-decoder')
+        self.slots = threading.BoundedSemaphore(max_workers)
+
+    def start(self, job):
+        """
+        Run a decoder loop on a pool thread
+
+        Raises:
+            ValueError: If every pool thread is taken
+        """
+        if not self.slots.acquire(blocking=False):
+            raise ValueError("Too many compressed audio streams; send pcm16 audio")
+
+        def run():
+            try:
+                job()
+            finally:
+                self.slots.release()
+
+        self.executor.submit(run)
+
+
+decoder_pool = DecoderPool(max_workers=settings.TRANSCRIPTION_DECODER_WORKERS)
+
+
+class ContainerDecoder:
+    """
+    Incremental decoder for MediaRecorder webm/ogg streams
+
+    MediaRecorder chunks are fragments of a single container, so they cannot
+    be decoded one by one. Bytes are piped into a PyAV demuxer running on a
+    shared DecoderPool thread, and decoded mono samples are collected as they
+    appear.
+    """
+
+    def __init__(self, pool=None):
+        """
+        Args:
+            pool (DecoderPool, optional): Defaults to the process-wide pool
+        """
+        if av is None:
+            raise ValueError("Decoding webm/ogg audio requires the 'av' package; "
+                             "send pcm16 audio or install PyAV")
+        self.reader = _ChunkReader()
+        self.decoded = queue.Queue()
+        self.sample_rate = None
+        self.error = None
+        (pool or decoder_pool).start(self._run)
+
+    def feed(self, data):
+        """
+        Add container bytes and collect whatever has been decoded so far
+
+        Args:
+            data (bytes): Next fragment of the container
+
+        Returns:
+            np.ndarray: Mono float32 samples at ``sample_rate``
+        """
+        if self.error:
+            raise ValueError(f"Audio decoding failed: {self.error}")
+        self.reader.chunks.put(data)
+
+        parts = []
+        while True:
+            try:
+                parts.append(self.decoded.get_nowait())
+            except queue.Empty:
+                break
+        if not parts:
+            return np.zeros(0, dtype=np.float32)
+        return np.concatenate(parts)
+
+    def close(self):
+        """Stop decoding and hand the pool thread back"""
+        self.reader.chunks.put(None)
+
+    def _run(self):
+        try:
+            container = av.open(io.BufferedReader(self.reader), mode='r')
+            for frame in container.decode(audio=0):
+                self.sample_rate = frame.sample_rate
+                samples = frame.to_ndarray().astype(np.float32)
+                if samples.ndim > 1:
+                    # Planar frames are (channels, n); packed frames are (1, n * channels)
+                    channels = len(frame.layout.channels)
+                    if samples.shape[0] == channels:
+                        samples = samples.mean(axis=0)
+                    else:
+                        samples = samples.reshape(-1, channels).mean(axis=1)
+                if frame.format.name.startswith('s16'):
+                    samples /= 32768.0
+                self.decoded.put(samples)
+        except Exception as e:
+            self.error = str(e)
+
+
+class AudioIngestStage:
+    """
+    Turns client audio frames into mono PCM16 at the upstream sample rate
+
+    Raw PCM is decoded with NumPy, carrying a partial sample frame over to
+    the next client frame; webm/ogg goes through ContainerDecoder.
+    Audio is then resampled to ``target_rate`` with StreamingResampler, so a
+    44.1 kHz stream sent upstream at 16 kHz is about 2.75x smaller.
+    """
+
+    def __init__(self, encoding=PCM16, sample_rate=None, channels=1, target_rate=16000):
+        """
+        Args:
+            encoding (str): Declared frame encoding
+            sample_rate (int, optional): Input rate; required for raw PCM,
+                taken from the stream for containers
+            channels (int): Interleaved channel count for raw PCM
+            target_rate (int): Upstream sample rate
+        """
+        if encoding not in RAW_ENCODINGS and encoding not in CONTAINER_ENCODINGS:
+            raise ValueError(f"Unsupported audio encoding: {encoding}")
+        if encoding in RAW_ENCODINGS and not sample_rate:
+            raise ValueError("sampleRate is required for raw PCM audio")
+        if sample_rate is not None and not (isinstance(sample_rate, int) and 8000 <= sample_rate <= 192000):
+            raise ValueError(f"Unsupported sample rate: {sample_rate}")
+        if not (isinstance(channels, int) and 1 <= channels <= 8):
+            raise ValueError(f"Unsupported channel count: {channels}")
+
+        self.encoding = encoding
+        self.channels = channels
+        self.target_rate = target_rate
+        self.decoder = ContainerDecoder() if encoding in CONTAINER_ENCODINGS else None
+        # Bytes of a sample frame split across client frames
+        self.remainder = b''
+        self.resampler = StreamingResampler(sample_rate, target_rate) if sample_rate else None
+
+    @property
+    def passthrough(self):
+        """True when frames are already mono PCM16 at the upstream rate"""
+        return (self.encoding == PCM16 and self.channels == 1
+                and self.resampler is not None and self.resampler.in_rate == self.target_rate)
+
+    def describe(self):
+        """
+        Describe the negotiated format for the session_started handshake
+
+        Returns:
+            dict: Declared encoding, input and output rates, and whether
+                frames are forwarded without conversion
+        """
+        return {
+            'encoding': self.encoding,
+            'sampleRate': self.resampler.in_rate if self.resampler else None,
+            'channels': self.channels,
+            'targetSampleRate': self.target_rate,
+            'passthrough': self.passthrough,
+        }
+
+    def process(self, data):
+        """
+        Convert one client frame
+
+        Args:
+            data (bytes): Frame as sent by the client
+
+        Returns:
+            bytes: Mono PCM16 at ``target_rate``; may be empty while a
+                container decoder is still buffering
+        """
+        if not self.decoder:
+            data = self.remainder + data if self.remainder else data
+            usable = len(data) - len(data) % raw_frame_bytes(self.encoding, self.channels)
+            self.remainder = data[usable:]
+            data = data[:usable]
+            if self.passthrough:
+                return data
+
+        if self.decoder:
+            samples = self.decoder.feed(data)
+            if self.resampler is None and self.decoder.sample_rate:
+                self.resampler = StreamingResampler(self.decoder.sample_rate, self.target_rate)
+        else:
+            samples = decode_raw(data, self.encoding, self.channels)
+
+        if not len(samples) or self.resampler is None:
+            return b''
+        return to_pcm16_bytes(self.resampler.process(samples))
+
+    def close(self):
+        """Release the container decoder, if any"""
+        if self.decoder:
+            self.decoder.close()
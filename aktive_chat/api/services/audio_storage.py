@@ -0,0 +1,136 @@
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.db import connections
+from django.utils import timezone
+
+# Directory in the audio store for synthesized speech
+GENERATED_AUDIO_DIR = 'generated_audio'
+
+# Directory in the audio store for TranslationHistory uploads
+TRANSLATION_AUDIO_DIR = 'translation_audio'
+
+# Disk writes happen here, off the request path
+writer = ThreadPoolExecutor(max_workers=2, thread_name_prefix='audio-writer')
+
+def get_audio_storage():
+    """Return the configured audio store (STORAGES['audio'])"""
+    return storages['audio']
+
+def stored_name(name):
+    """
+    Return the name a file will have in the audio store
+
+    Sharding backends move files into shard directories; other backends
+    keep the name as is.
+
+    Args:
+        name (str): Logical name, e.g. "generated_audio/abcd.mp3"
+
+    Returns:
+        str: Storage-relative name
+    """
+    storage = get_audio_storage()
+    if hasattr(storage, 'shard_name'):
+        return storage.shard_name(name)
+    return name
+
+def save_audio(name, audio_bytes, reuse_existing=False):
+    """
+    Write audio to the store, blocking until it is in place
+
+    Args:
+        name (str): Logical name
+        audio_bytes (bytes): Audio data
+        reuse_existing (bool): Keep an existing file with this name instead of
+            picking a new name (for content-addressed files)
+
+    Returns:
+        str: Storage-relative name the file was saved under
+    """
+    storage = get_audio_storage()
+    name = stored_name(name)
+    if reuse_existing and storage.exists(name):
+        return name
+    return storage.save(name, ContentFile(audio_bytes))
+
+def save_audio_later(name, audio_bytes, reuse_existing=False, on_saved=None):
+    """
+    Write audio to the store on a background thread
+
+    Args:
+        name (str): Logical name
+        audio_bytes (bytes): Audio data
+        reuse_existing (bool): See save_audio
+        on_saved (callable, optional): Called with the stored name once the
+            file is in place; may use the database
+
+    Returns:
+        concurrent.futures.Future: Resolves to the stored name
+    """
+    def write():
+        try:
+            saved_name = save_audio(name, audio_bytes, reuse_existing=reuse_existing)
+            if on_saved:
+                on_saved(saved_name)
+            return saved_name
+        finally:
+            connections.close_all()
+
+    return writer.submit(write)
+
+def iter_stored_files(storage, directory):
+    """Yield storage-relative names of every file under a directory"""
+    try:
+        subdirectories, files = storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for file_name in files:
+        yield posixpath.join(directory, file_name)
+    for subdirectory in subdirectories:
+        yield from iter_stored_files(storage, posixpath.join(directory, subdirectory))
+
+def sweep_orphaned_audio(min_age_minutes=60, dry_run=False):
+    """
+    Delete stored audio that nothing references
+
+    A file in translation_audio/ is an orphan when no TranslationHistory row
+    points at it; a file in generated_audio/ when neither the speech cache
+    nor a history row does. Files younger than ``min_age_minutes`` are left
+    alone so in-flight writes are never swept.
+
+    Args:
+        min_age_minutes (int): Minimum file age before it can be deleted
+        dry_run (bool): Only count orphans
+
+    Returns:
+        dict: Files scanned and orphans deleted (or found, in a dry run)
+    """
+    from core.models import SpeechCacheEntry, TranslationHistory
+
+    storage = get_audio_storage()
+    referenced = set()
+    for field in ('original_audio_file', 'translated_audio_file'):
+        referenced.update(
+            TranslationHistory.objects.exclude(**{field: ''})
+            .exclude(**{f'{field}__isnull': True})
+            .values_list(field, flat=True)
+        )
+    referenced.update(SpeechCacheEntry.objects.values_list('file_name', flat=True))
+
+    cutoff = timezone.now() - timedelta(minutes=min_age_minutes)
+    result = {'scanned': 0, 'orphaned': 0}
+    for directory in (GENERATED_AUDIO_DIR, TRANSLATION_AUDIO_DIR):
+        for name in iter_stored_files(storage, directory):
+            result['scanned'] += 1
+            if name in referenced:
+                continue
+            if storage.get_modified_time(name) > cutoff:
+                continue
+            result['orphaned'] += 1
+            if not dry_run:
+                storage.delete(name)
+
+    return result
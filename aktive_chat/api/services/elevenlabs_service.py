@@ -1,10 +1,61 @@
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import httpx
+from django.conf import settings
 from elevenlabs.client import ElevenLabs
 
+# Model used for all synthesis; part of the speech cache key
+TTS_MODEL = "eleven_multilingual_v2"
+
+# Sentence boundaries, including CJK full-width punctuation
+SENTENCE_END = re.compile(r'(?<=[.!?。！？])\s+|(?<=[。！？])')
+# A period after a title or an initial does not end the sentence
+ABBREVIATION = re.compile(r'(?:\b(?:Mr|Mrs|Ms|Dr|Prof|St|Jr|Sr|vs|etc|e\.g|i\.e)|(?<![\w.])[A-Z])\.$')
+
+# Shared by every request so parallel synthesis stays bounded process-wide
+speech_workers = ThreadPoolExecutor(max_workers=settings.TTS_PARALLEL_WORKERS, thread_name_prefix='tts-piece')
+
+@lru_cache(maxsize=1)
+def get_client():
+    """
+    Return the process-wide ElevenLabs client
+    
+    The client is built once and keeps a pool of keep-alive connections, so
+    calls do not pay connection setup. It is safe to share across threads.
+    
+    Returns:
+        ElevenLabs: API client
+    """
+    api_key = os.environ.get('ELEVENLABS_API_KEY')
+    if not api_key:
+        raise ValueError("ElevenLabs API key not found in environment variables")
+    
+    http_client = httpx.Client(
+        limits=httpx.Limits(
+            max_connections=settings.ELEVENLABS_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.ELEVENLABS_HTTP_MAX_CONNECTIONS,
+        ),
+        timeout=httpx.Timeout(settings.ELEVENLABS_HTTP_TIMEOUT_SECONDS),
+    )
+    return ElevenLabs(api_key=api_key, httpx_client=http_client)
+
+def resolve_voice(voice_id):
+    """Map an empty or "default" voice ID to the provider default"""
+    return voice_id if voice_id and voice_id != "default" else None
+
+def request_voice(voice_id):
+    """Voice ID to send to the API, which always needs one"""
+    return resolve_voice(voice_id) or settings.ELEVENLABS_DEFAULT_VOICE_ID
+
 def generate_speech(text, voice_id=None):
     """
     Generate speech audio from text using ElevenLabs
     
+    Long texts are split at sentence boundaries and synthesized in parallel
+    (see iter_speech_pieces); the MP3 pieces are concatenated in order.
+    
     Args:
         text (str): Text to convert to speech
         voice_id (str, optional): Voice ID to use
@@ -12,25 +63,124 @@ def generate_speech(text, voice_id=None):
     Returns:
         bytes: Audio data in MP3 format
     """
-    api_key = os.environ.get('ELEVENLABS_API_KEY')
-    if not api_key:
-        raise ValueError("ElevenLabs API key not found in environment variables")
+    if len(text) < settings.TTS_PARALLEL_MIN_CHARS:
+        return generate_speech_single(text, voice_id)
+    
+    return b''.join(iter_speech_pieces(text, voice_id))
+
+def generate_speech_single(text, voice_id=None):
+    """
+    Generate speech audio for the whole text in one provider request
+    
+    Args:
+        text (str): Text to convert to speech
+        voice_id (str, optional): Voice ID to use
+        
+    Returns:
+        bytes: Audio data in MP3 format
+    """
+    client = get_client()
+    
+    audio = client.text_to_speech.convert(
+        voice_id=request_voice(voice_id),
+        text=text,
+        model_id=TTS_MODEL
+    )
+    
+    # The response body arrives as an iterator of byte chunks
+    return b''.join(audio)
+
+def stream_speech(text, voice_id=None):
+    """
+    Generate speech, yielding MP3 chunks as the provider produces them
+    
+    Args:
+        text (str): Text to convert to speech
+        voice_id (str, optional): Voice ID to use
+        
+    Yields:
+        bytes: MP3 audio chunks, in order
+    """
+    if len(text) >= settings.TTS_PARALLEL_MIN_CHARS:
+        # Pieces render in parallel; the first is sent while the rest finish
+        yield from iter_speech_pieces(text, voice_id)
+        return
     
-    client = ElevenLabs(api_key=api_key)
+    client = get_client()
     
-    audio = client.generate(
+    audio_stream = client.text_to_speech.stream(
+        voice_id=request_voice(voice_id),
         text=text,
-        voice=voice_id if voice_id and voice_id != "default" else None,
-        model="eleven_multilingual_v2"
+        model_id=TTS_MODEL
     )
     
-    # Convert audio to bytes
-    if hasattr(audio, 'content'):
-        # If audio is a response object
-        return audio.content
-    elif hasattr(audio, 'read'):
-        # If audio is a file-like object
-        return audio.read()
-    else:
-        # If audio is already bytes
-        return audio
\ No newline at end of file
+    for chunk in audio_stream:
+        if chunk:
+            yield chunk
+
+
+def split_sentences(text, max_chars=300):
+    """
+    Split text into pieces at sentence boundaries
+    
+    Consecutive short sentences are grouped up to ``max_chars`` so that a
+    paragraph does not turn into dozens of tiny requests. A single sentence
+    longer than ``max_chars`` is kept whole, and a period after a common
+    abbreviation or an initial is not treated as a boundary.
+    
+    Args:
+        text (str): Text to split
+        max_chars (int): Target maximum piece length
+        
+    Returns:
+        list: Non-empty pieces, in order
+    """
+    sentences = []
+    for sentence in SENTENCE_END.split(text.strip()):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if sentences and ABBREVIATION.search(sentences[-1]):
+            sentences[-1] = f"{sentences[-1]} {sentence}"
+        else:
+            sentences.append(sentence)
+
+    pieces = []
+    current = ''
+    for sentence in sentences:
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    
+    if current:
+        pieces.append(current)
+    return pieces
+
+def iter_speech_pieces(text, voice_id=None):
+    """
+    Synthesize sentence pieces concurrently, yielding them in order
+    
+    Pieces render on the shared speech_workers pool, so at most
+    settings.TTS_PARALLEL_WORKERS render at once across all requests. Each piece
+    is yielded as soon as it and every piece before it are ready, so the
+    first piece can be streamed while the rest are still rendering.
+    
+    Args:
+        text (str): Text to convert to speech
+        voice_id (str, optional): Voice ID to use
+        
+    Yields:
+        bytes: MP3 audio for each piece, in order
+    """
+    pieces = split_sentences(text, settings.TTS_SENTENCE_MAX_CHARS)
+    
+    futures = [speech_workers.submit(generate_speech_single, piece, voice_id) for piece in pieces]
+    try:
+        for future in futures:
+            yield future.result()
+    finally:
+        # Abandoned streams drop the pieces that have not started rendering
+        for future in futures:
+            future.cancel()
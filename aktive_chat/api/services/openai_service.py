@@ -1,43 +1,405 @@
 import os
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import httpx
+from django.conf import settings
+from django.db import connections
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough
 
-def translate_text(text, target_language):
+from .translation_cache import translation_cache
+
+# Target languages offered to users
+SUPPORTED_LANGUAGES = [
+    "Chinese", "Korean", "Dutch", "Turkish", "Swedish", "Indonesian",
+    "Filipino", "Japanese", "Ukrainian", "Greek", "Czech", "Finnish",
+    "Romanian", "Russian", "Danish", "Bulgarian", "Malay", "Slovak",
+    "Croatian", "Arabic", "Tamil", "English", "Polish", "German",
+    "Spanish", "French", "Italian", "Hindi", "Portuguese"
+]
+
+translation_template = """
+    Translate the following sentence into {language}, return ONLY the translation, nothing else.
+
+    Sentence: {sentence}
     """
-    Translate text using OpenAI's GPT model
-    
+
+batch_translation_template = """
+    Translate each string in the following JSON array into {language}.
+    Return ONLY a JSON array of the translations, with exactly the same number of items in the same order, nothing else.
+
+    Sentences: {sentences}
+    """
+
+@lru_cache(maxsize=1)
+def get_http_clients():
+    """
+    Process-wide keep-alive HTTP clients shared by every OpenAI model
+
+    Returns:
+        tuple: (httpx.Client, httpx.AsyncClient)
+    """
+    limits = httpx.Limits(
+        max_connections=settings.OPENAI_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.OPENAI_HTTP_MAX_CONNECTIONS,
+        keepalive_expiry=settings.OPENAI_HTTP_KEEPALIVE_SECONDS,
+    )
+    timeout = httpx.Timeout(settings.OPENAI_HTTP_TIMEOUT_SECONDS)
+    return (
+        httpx.Client(limits=limits, timeout=timeout),
+        httpx.AsyncClient(limits=limits, timeout=timeout),
+    )
+
+def build_chat_model(model="gpt-4-turbo", temperature=0.0, http_clients=None):
+    """
+    Build the OpenAI chat model used by the translation chains
+
     Args:
-        text (str): Text to translate
-        target_language (str): Target language for translation
-        
+        model (str): OpenAI chat model name
+        temperature (float): Sampling temperature
+        http_clients (tuple, optional): (sync, async) httpx clients to reuse
+
     Returns:
-        str: Translated text
+        ChatOpenAI: Chat model
     """
     # OpenAI API key should be set in environment
     api_key = os.environ.get('OPENAI_API_KEY')
     if not api_key:
         raise ValueError("OpenAI API key not found in environment variables")
-    
-    translation_template = """
-    Translate the following sentence into {language}, return ONLY the translation, nothing else.
 
-    Sentence: {sentence}
+    http_client, http_async_client = http_clients or (None, None)
+
+    return ChatOpenAI(
+        temperature=temperature,
+        model=model,
+        api_key=api_key,
+        http_client=http_client,
+        http_async_client=http_async_client,
+    )
+
+def build_translation_chain(model="gpt-4-turbo", temperature=0.0, http_clients=None):
+    """
+    Build the prompt → model → parser chain used for translation
+
+    Args:
+        model (str): OpenAI chat model name
+        temperature (float): Sampling temperature
+        http_clients (tuple, optional): (sync, async) httpx clients to reuse
+
+    Returns:
+        Runnable: Chain taking {"language", "sentence"} and producing text
     """
-    
     output_parser = StrOutputParser()
-    llm = ChatOpenAI(temperature=0.0, model="gpt-4-turbo")
+    llm = build_chat_model(model, temperature, http_clients)
     translation_prompt = ChatPromptTemplate.from_template(translation_template)
 
-    translation_chain = (
-        {"language": RunnablePassthrough(), "sentence": RunnablePassthrough()} 
+    return (
+        {"language": RunnablePassthrough(), "sentence": RunnablePassthrough()}
         | translation_prompt
         | llm
         | output_parser
     )
-    
+
+@lru_cache(maxsize=16)
+def get_translation_chain(model=None, temperature=0.0):
+    """
+    Return the process-wide translation chain for a model/temperature
+
+    The chain is built once and shares pooled keep-alive HTTP clients, so
+    repeated calls pay neither object construction nor connection setup.
+    Chains are stateless and safe to invoke from several threads.
+
+    Args:
+        model (str, optional): OpenAI chat model name, defaults to
+            settings.OPENAI_TRANSLATION_MODEL
+        temperature (float): Sampling temperature
+
+    Returns:
+        Runnable: Chain taking {"language", "sentence"} and producing text
+    """
+    return build_translation_chain(
+        model=model or settings.OPENAI_TRANSLATION_MODEL,
+        temperature=temperature,
+        http_clients=get_http_clients(),
+    )
+
+@lru_cache(maxsize=16)
+def get_batch_translation_chain(model=None, temperature=0.0):
+    """
+    Return the process-wide batch translation chain for a model/temperature
+
+    Args:
+        model (str, optional): OpenAI chat model name, defaults to
+            settings.OPENAI_TRANSLATION_MODEL
+        temperature (float): Sampling temperature
+
+    Returns:
+        Runnable: Chain taking {"language", "sentences"} (a JSON array) and
+            producing the model's raw text reply
+    """
+    llm = build_chat_model(
+        model=model or settings.OPENAI_TRANSLATION_MODEL,
+        temperature=temperature,
+        http_clients=get_http_clients(),
+    )
+    return (
+        ChatPromptTemplate.from_template(batch_translation_template)
+        | llm
+        | StrOutputParser()
+    )
+
+def translate_text(text, target_language):
+    """
+    Translate text using OpenAI's GPT model
+
+    Args:
+        text (str): Text to translate
+        target_language (str): Target language for translation
+
+    Returns:
+        str: Translated text
+    """
+    model = settings.OPENAI_TRANSLATION_MODEL
+    cached = translation_cache.get(text, target_language, model)
+    if cached is not None:
+        return cached
+
+    translation_chain = get_translation_chain()
+
     data_input = {"language": target_language, "sentence": text}
     translation = translation_chain.invoke(data_input)
-    
-    return translation
\ No newline at end of file
+
+    translation_cache.set(text, target_language, model, translation)
+    return translation
+
+async def astream_translation(text, target_language):
+    """
+    Translate text on the event loop, yielding tokens as the model produces them
+
+    Args:
+        text (str): Text to translate
+        target_language (str): Target language for translation
+
+    Yields:
+        str: Translation chunks, in order
+    """
+    model = settings.OPENAI_TRANSLATION_MODEL
+    cached = await translation_cache.aget(text, target_language, model)
+    if cached is not None:
+        yield cached
+        return
+
+    translation_chain = get_translation_chain()
+
+    chunks = []
+    data_input = {"language": target_language, "sentence": text}
+    async for chunk in translation_chain.astream(data_input):
+        if chunk:
+            chunks.append(chunk)
+            yield chunk
+
+    await translation_cache.aset(text, target_language, model, ''.join(chunks))
+
+
+def pack_batches(segments, max_chars, max_segments):
+    """
+    Group segments into batches that fit the per-request budget
+
+    A segment larger than the budget gets a batch of its own.
+
+    Args:
+        segments (list): (index, text) pairs
+        max_chars (int): Maximum source characters per batch
+        max_segments (int): Maximum segments per batch
+
+    Returns:
+        list: Batches of (index, text) pairs, in input order
+    """
+    batches = []
+    current = []
+    size = 0
+    for index, text in segments:
+        if current and (size + len(text) > max_chars or len(current) >= max_segments):
+            batches.append(current)
+            current = []
+            size = 0
+        current.append((index, text))
+        size += len(text)
+
+    if current:
+        batches.append(current)
+    return batches
+
+def parse_json_array(reply):
+    """
+    Read the JSON array in a model reply
+
+    Models often wrap JSON in a Markdown code fence or put a sentence around
+    it, so the first JSON array in the reply is used.
+
+    Args:
+        reply (str): Raw model output
+
+    Returns:
+        list: The array, or None if the reply holds none
+    """
+    text = reply.strip()
+    fenced = re.match(r'^```[\w-]*\s*(.*?)\s*```$', text, re.S)
+    if fenced:
+        text = fenced.group(1)
+
+    try:
+        value = json.loads(text)
+    except ValueError:
+        start = text.find('[')
+        if start < 0:
+            return None
+        try:
+            value, _ = json.JSONDecoder().raw_decode(text, start)
+        except ValueError:
+            return None
+    return value if isinstance(value, list) else None
+
+def translate_segments(texts, target_language):
+    """
+    Translate a list of texts in a single model request
+
+    If the reply is not a JSON array aligned with the input, the batch is
+    split in half and each half retried, down to single-sentence requests.
+
+    Args:
+        texts (list): Texts to translate
+        target_language (str): Target language for translation
+
+    Returns:
+        list: Translations aligned with ``texts``
+    """
+    if len(texts) == 1:
+        translation_chain = get_translation_chain()
+        return [translation_chain.invoke({"language": target_language, "sentence": texts[0]})]
+
+    batch_chain = get_batch_translation_chain()
+    reply = batch_chain.invoke({
+        "language": target_language,
+        "sentences": json.dumps(texts, ensure_ascii=False),
+    })
+
+    translations = parse_json_array(reply)
+    if (isinstance(translations, list) and len(translations) == len(texts)
+            and all(isinstance(t, str) for t in translations)):
+        return translations
+
+    middle = len(texts) // 2
+    return (translate_segments(texts[:middle], target_language)
+            + translate_segments(texts[middle:], target_language))
+
+def translate_batch(texts, target_language):
+    """
+    Translate many texts with as few model requests as the budget allows
+
+    Cached texts are answered by a single cache lookup without a model call;
+    the rest are packed into batches of at most
+    settings.TRANSLATION_BATCH_MAX_CHARS source characters and
+    settings.TRANSLATION_BATCH_MAX_SEGMENTS segments, which are sent
+    concurrently and cached with a single write.
+
+    Args:
+        texts (list): Texts to translate
+        target_language (str): Target language for translation
+
+    Returns:
+        list: Translations aligned with ``texts``
+    """
+    model = settings.OPENAI_TRANSLATION_MODEL
+    results = [None] * len(texts)
+
+    cached = translation_cache.get_many(
+        [text for text in texts if text.strip()], target_language, model
+    )
+    pending = []
+    for index, text in enumerate(texts):
+        if not text.strip():
+            results[index] = text
+        elif text in cached:
+            results[index] = cached[text]
+        else:
+            pending.append((index, text))
+
+    batches = pack_batches(
+        pending,
+        max_chars=settings.TRANSLATION_BATCH_MAX_CHARS,
+        max_segments=settings.TRANSLATION_BATCH_MAX_SEGMENTS,
+    )
+
+    def run(batch):
+        return translate_segments([text for _, text in batch], target_language)
+
+    if batches:
+        fresh = {}
+        with ThreadPoolExecutor(max_workers=settings.TRANSLATION_BATCH_CONCURRENCY) as executor:
+            for batch, translations in zip(batches, executor.map(run, batches)):
+                for (index, text), translation in zip(batch, translations):
+                    results[index] = translation
+                    fresh[text] = translation
+        translation_cache.set_many(fresh, target_language, model)
+
+    return results
+
+
+def validate_languages(languages):
+    """
+    Check a list of target languages for a fan-out request
+
+    Args:
+        languages (list): Requested target languages
+
+    Returns:
+        list: The languages, de-duplicated in request order
+
+    Raises:
+        ValueError: If the list is empty, too long or has unsupported entries
+    """
+    if not isinstance(languages, list) or not languages:
+        raise ValueError("languages must be a non-empty list")
+
+    unsupported = [l for l in languages if l not in SUPPORTED_LANGUAGES]
+    if unsupported:
+        raise ValueError(f"Unsupported languages: {', '.join(map(str, unsupported))}")
+
+    languages = list(dict.fromkeys(languages))
+    if len(languages) > settings.TRANSLATION_MAX_TARGET_LANGUAGES:
+        raise ValueError(
+            f"At most {settings.TRANSLATION_MAX_TARGET_LANGUAGES} target languages per request"
+        )
+    return languages
+
+def translate_multi(text, languages):
+    """
+    Translate one text into several languages concurrently
+
+    Wall-clock time is close to the slowest single language rather than the
+    sum. At most settings.TRANSLATION_FANOUT_CONCURRENCY languages are in
+    flight at once.
+
+    Args:
+        text (str): Text to translate
+        languages (list): Target languages
+
+    Returns:
+        dict: {language: {'translation': str} or {'error': str}}
+    """
+    def run(language):
+        try:
+            return {'translation': translate_text(text, language)}
+        except Exception as e:
+            return {'error': str(e)}
+        finally:
+            # The shared cache tier may have opened a connection on this thread
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=settings.TRANSLATION_FANOUT_CONCURRENCY) as executor:
+        return dict(zip(languages, executor.map(run, languages)))
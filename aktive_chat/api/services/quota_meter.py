@@ -0,0 +1,116 @@
+from channels.db import database_sync_to_async
+from django.conf import settings
+
+from .usage import record_usage, remaining_minutes
+
+
+class QuotaMeter:
+    """
+    Live count of one user's streamed speech seconds against their monthly quota
+
+    Audio is metered in memory as frames are sent upstream; nothing touches
+    the database per frame. Every ``checkpoint_seconds`` of metered audio the
+    new seconds are handed to the usage recorder, which writes them and
+    their rollups in its next batch. The remaining quota is read once, when
+    the meter is created.
+    """
+
+    def __init__(self, user_id, remaining_seconds, checkpoint_seconds=10, warn_seconds=60):
+        """
+        Args:
+            user_id (int): User the audio is billed to
+            remaining_seconds (float): Quota left this month
+            checkpoint_seconds (float): Metered seconds between usage records
+            warn_seconds (float): Remaining seconds at which to warn the client
+        """
+        self.user_id = user_id
+        self.remaining = remaining_seconds
+        self.checkpoint_seconds = checkpoint_seconds
+        self.warn_seconds = warn_seconds
+
+        self.unrecorded = 0.0
+        self.warned = False
+        self.sessions = 0
+
+    def add(self, seconds):
+        """
+        Meter streamed audio
+
+        Args:
+            seconds (float): Duration of the audio sent upstream
+
+        Returns:
+            str: 'exhausted' once the quota is used up, 'warn' the first time
+                less than ``warn_seconds`` remain, otherwise 'ok'
+        """
+        self.remaining -= seconds
+        self.unrecorded += seconds
+        if self.unrecorded >= self.checkpoint_seconds:
+            self.checkpoint()
+
+        if self.remaining <= 0:
+            return 'exhausted'
+        if not self.warned and self.remaining <= self.warn_seconds:
+            self.warned = True
+            return 'warn'
+        return 'ok'
+
+    def checkpoint(self):
+        """Record the seconds metered since the last checkpoint"""
+        if self.unrecorded:
+            record_usage(
+                self.user_id, 'speech_to_text',
+                audio_duration_seconds=round(self.unrecorded, 3),
+            )
+            self.unrecorded = 0.0
+
+
+class QuotaMeters:
+    """
+    One QuotaMeter per user, shared by that user's sessions on this worker
+
+    A user streaming from two tabs draws on one meter, so the quota cannot be
+    spent twice. Meters are only touched from the event loop.
+    """
+
+    def __init__(self, checkpoint_seconds=10, warn_seconds=60):
+        self.checkpoint_seconds = checkpoint_seconds
+        self.warn_seconds = warn_seconds
+        self.meters = {}
+
+    async def acquire(self, user_id):
+        """
+        Get the user's meter, reading their quota when it is new
+
+        Returns:
+            QuotaMeter: The meter; pass it to ``release`` when the session ends
+        """
+        meter = self.meters.get(user_id)
+        if meter is None:
+            remaining = await database_sync_to_async(self._read_quota)(user_id)
+            # Another session may have created it while the quota was read
+            meter = self.meters.setdefault(user_id, QuotaMeter(
+                user_id, remaining,
+                checkpoint_seconds=self.checkpoint_seconds,
+                warn_seconds=self.warn_seconds,
+            ))
+        meter.sessions += 1
+        return meter
+
+    def release(self, meter):
+        """Record the meter's outstanding seconds and drop it after its last session"""
+        meter.checkpoint()
+        meter.sessions -= 1
+        if meter.sessions <= 0 and self.meters.get(meter.user_id) is meter:
+            del self.meters[meter.user_id]
+
+    @staticmethod
+    def _read_quota(user_id):
+        # One rollup row and one subscription row
+        return remaining_minutes(user_id) * 60
+
+
+quota_meters = QuotaMeters(
+    checkpoint_seconds=settings.TRANSCRIPTION_QUOTA_CHECKPOINT_SECONDS,
+    warn_seconds=settings.TRANSCRIPTION_QUOTA_WARN_SECONDS,
+)
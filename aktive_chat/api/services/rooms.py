@@ -0,0 +1,124 @@
+import re
+
+from django.db.models import Q
+
+from core.models import ConversationRoom
+
+# Room names go into channel layer group names, which allow a limited alphabet
+ROOM_NAME = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+def validate_room(room):
+    """
+    Check a conversation room name
+
+    Args:
+        room (str): Room name
+
+    Returns:
+        str: The room name
+
+    Raises:
+        ValueError: If the name is not 1-64 letters, digits, '-' or '_'
+    """
+    if not isinstance(room, str) or not ROOM_NAME.match(room):
+        raise ValueError("Room names are 1-64 letters, digits, '-' or '_'")
+    return room
+
+
+def claim_room(room, user_id):
+    """
+    Get a room for a speaker, creating it owned by them if it is new
+
+    Args:
+        room (str): Room name
+        user_id (int): Speaking user
+
+    Returns:
+        bool: Whether the user may speak in the room
+    """
+    conversation, created = ConversationRoom.objects.get_or_create(
+        name=room, defaults={'owner_id': user_id}
+    )
+    return created or can_join_room(room, user_id)
+
+
+def can_join_room(room, user_id):
+    """
+    Check that a user owns or was invited to an existing room
+
+    Args:
+        room (str): Room name
+        user_id (int): User asking to join
+
+    Returns:
+        bool: Whether the user may speak or listen in the room
+    """
+    return ConversationRoom.objects.filter(
+        Q(owner_id=user_id) | Q(members__id=user_id), name=room
+    ).exists()
+
+
+def speakers_group(room):
+    """Group of speaker consumers in a room; listeners announce subscriptions here"""
+    return f"room.{room}.speakers"
+
+
+def listeners_group(room):
+    """Group of every listener in a room; receives the source transcript"""
+    return f"room.{room}.listeners"
+
+
+def language_group(room, language):
+    """Group of listeners in a room subscribed to one target language"""
+    return f"room.{room}.lang.{re.sub(r'[^a-z0-9]', '_', language.lower())}"
+
+
+class RoomSubscriptions:
+    """
+    Listeners per target language, as seen by a speaker
+
+    The speaker's pipeline translates into a language while at least one
+    listener wants it, however many listeners that is.
+    """
+
+    def __init__(self):
+        self.listeners = {}
+
+    def subscribe(self, channel, language):
+        """
+        Record a listener's language, replacing any previous one
+
+        Returns:
+            tuple: (language now wanted for the first time or None,
+                language no longer wanted by anyone or None)
+        """
+        dropped = self.unsubscribe(channel)
+        added = None
+        if language not in self.listeners:
+            self.listeners[language] = set()
+            added = language
+        self.listeners[language].add(channel)
+        if dropped == added:
+            dropped = added = None
+        return added, dropped
+
+    def unsubscribe(self, channel):
+        """
+        Forget a listener
+
+        Returns:
+            str: Language no longer wanted by anyone, or None
+        """
+        for language, channels in list(self.listeners.items()):
+            if channel in channels:
+                channels.discard(channel)
+                if not channels:
+                    del self.listeners[language]
+                    return language
+                return None
+        return None
+
+    def counts(self):
+        """Listeners per language"""
+        return {language: len(channels) for language, channels in self.listeners.items()}
@@ -0,0 +1,133 @@
+import re
+import threading
+from collections import deque
+
+
+def backoff_delays(attempts, base=0.5, maximum=8.0):
+    """
+    Exponential backoff schedule for reconnect attempts
+
+    Args:
+        attempts (int): Number of attempts
+        base (float): Delay before the first attempt, in seconds
+        maximum (float): Upper bound on any delay
+
+    Returns:
+        list: Delay before each attempt
+    """
+    return [min(maximum, base * 2 ** attempt) for attempt in range(attempts)]
+
+
+class AudioReplayBuffer:
+    """
+    Ring buffer holding the most recent audio sent upstream
+
+    Backed by one preallocated bytearray; writing never allocates, and the
+    oldest audio is overwritten once the buffer is full.
+    """
+
+    def __init__(self, capacity):
+        """
+        Args:
+            capacity (int): Bytes of audio kept
+        """
+        self.buffer = bytearray(capacity)
+        self.capacity = capacity
+        self.end = 0
+        self.size = 0
+
+    def write(self, data):
+        """Append audio, overwriting the oldest bytes when full"""
+        if not self.capacity:
+            return
+        view = memoryview(data)[-self.capacity:]
+        n = len(view)
+        first = min(n, self.capacity - self.end)
+        self.buffer[self.end:self.end + first] = view[:first]
+        self.buffer[:n - first] = view[first:]
+        self.end = (self.end + n) % self.capacity
+        self.size = min(self.capacity, self.size + n)
+
+    def snapshot(self):
+        """
+        Return the buffered audio, oldest first
+
+        Returns:
+            bytes: Up to ``capacity`` bytes
+        """
+        start = (self.end - self.size) % self.capacity if self.capacity else 0
+        if start + self.size <= self.capacity:
+            return bytes(self.buffer[start:start + self.size])
+        return bytes(self.buffer[start:]) + bytes(self.buffer[:self.end])
+
+
+def _words(text):
+    return [re.sub(r'[^\w]', '', word).lower() for word in text.split()]
+
+
+class TranscriptOverlapFilter:
+    """
+    Removes text a reconnected session transcribes a second time
+
+    Replayed audio overlaps speech that was already transcribed before the
+    connection dropped. After a reconnect, the leading words of each new
+    transcript that repeat the end of what was already delivered are cut,
+    and transcripts with nothing new are dropped. The check stays active
+    until the first final transcript with new text.
+    """
+
+    def __init__(self, history_words=50):
+        """
+        Args:
+            history_words (int): Words of delivered final text remembered
+        """
+        self.lock = threading.Lock()
+        self.history = deque(maxlen=history_words)
+        self.active = False
+
+    def arm(self):
+        """Start filtering; called when a reconnected session is replaying audio"""
+        with self.lock:
+            self.active = True
+
+    def process(self, data):
+        """
+        Filter one transcript event
+
+        Args:
+            data (dict): Transcript event with 'text' and 'isFinal'
+
+        Returns:
+            dict: The event, possibly with its text trimmed, or None to drop it
+        """
+        with self.lock:
+            words = data['text'].split()
+            if self.active:
+                overlap = self._overlap(_words(data['text']))
+                if overlap == len(words):
+                    return None
+                if overlap:
+                    words = words[overlap:]
+                    data = {**data, 'text': ' '.join(words)}
+                if data.get('isFinal'):
+                    # New speech follows the replayed part; stop filtering
+                    self.active = False
+
+            if data.get('isFinal'):
+                self.history.extend(_words(data['text']))
+            return data
+
+    def _overlap(self, new):
+        # Longest run at the start of the new text that repeats the end of
+        # the history, or that lies anywhere in the history when the whole
+        # new text is a repeat
+        history = list(self.history)
+        if not new or not history:
+            return 0
+        for k in range(min(len(new), len(history)), 0, -1):
+            if history[-k:] == new[:k]:
+                return k
+        joined = ' ' + ' '.join(history) + ' '
+        if ' ' + ' '.join(new) + ' ' in joined:
+            return len(new)
+        return 0
@@ -0,0 +1,182 @@
+import os
+import socket
+import time
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Count
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from core.models import TranscriptionSession
+
+# Identifies this worker process in the registry
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class LocalSessionRegistry:
+    """
+    In-process session registry
+
+    Only sees sessions owned by this worker, which is enough for a single
+    ASGI process. Leases still expire, so the behaviour matches the shared
+    registry.
+    """
+
+    def __init__(self, owner=WORKER_ID, lease_seconds=30):
+        """
+        Args:
+            owner (str): ID of this worker
+            lease_seconds (int): How long a session stays registered
+                without a heartbeat
+        """
+        self.owner = owner
+        self.lease_seconds = lease_seconds
+        self.records = {}
+
+    async def register(self, session_id, status='initialized', route='', user_id=None):
+        """
+        Record a new session owned by this worker
+
+        Args:
+            session_id (str): Session ID
+            status (str): Initial status
+            route (str): Channel name that reaches the session's consumer
+            user_id (int, optional): Owning user
+        """
+        self.records[session_id] = {
+            'session_id': session_id,
+            'owner': self.owner,
+            'route': route,
+            'user_id': user_id,
+            'status': status,
+            'lease_expires': time.monotonic() + self.lease_seconds,
+        }
+
+    async def set_status(self, session_id, status):
+        """Update the status of a session owned by this worker"""
+        record = self.records.get(session_id)
+        if record:
+            record['status'] = status
+
+    async def get(self, session_id):
+        """
+        Look up a live session
+
+        Returns:
+            dict: Session record with owner, route, status and user_id, or
+                None if unknown or its lease has expired
+        """
+        record = self.records.get(session_id)
+        if record is None or record['lease_expires'] < time.monotonic():
+            return None
+        return {key: value for key, value in record.items() if key != 'lease_expires'}
+
+    async def heartbeat(self, session_ids):
+        """Renew the leases of sessions owned by this worker"""
+        expires = time.monotonic() + self.lease_seconds
+        for session_id in session_ids:
+            if session_id in self.records:
+                self.records[session_id]['lease_expires'] = expires
+
+    async def release(self, session_id):
+        """Remove a session"""
+        self.records.pop(session_id, None)
+
+    async def state_counts(self):
+        """
+        Count live sessions per status
+
+        Returns:
+            dict: Number of sessions per status
+        """
+        now = time.monotonic()
+        counts = {}
+        for record in self.records.values():
+            if record['lease_expires'] >= now:
+                counts[record['status']] = counts.get(record['status'], 0) + 1
+        return counts
+
+    async def purge_expired(self):
+        """
+        Remove sessions whose lease has expired
+
+        Returns:
+            int: Number of sessions removed
+        """
+        now = time.monotonic()
+        expired = [key for key, record in self.records.items() if record['lease_expires'] < now]
+        for session_id in expired:
+            del self.records[session_id]
+        return len(expired)
+
+
+class DatabaseSessionRegistry:
+    """
+    Session registry shared by all workers through the TranscriptionSession table
+
+    Any worker can find a session, see which worker owns it and reach its
+    consumer through the recorded channel name. Owners renew their leases
+    with one batched heartbeat query; sessions of a worker that died stop
+    being reported once their lease runs out.
+    """
+
+    def __init__(self, owner=WORKER_ID, lease_seconds=30):
+        """
+        Args:
+            owner (str): ID of this worker
+            lease_seconds (int): How long a session stays registered
+                without a heartbeat
+        """
+        self.owner = owner
+        self.lease_seconds = lease_seconds
+
+    def lease_expiry(self):
+        return timezone.now() + timedelta(seconds=self.lease_seconds)
+
+    async def register(self, session_id, status='initialized', route='', user_id=None):
+        await TranscriptionSession.objects.acreate(
+            session_id=session_id,
+            owner=self.owner,
+            route=route,
+            user_id=user_id,
+            status=status,
+            lease_expires=self.lease_expiry(),
+        )
+
+    async def set_status(self, session_id, status):
+        await TranscriptionSession.objects.filter(
+            session_id=session_id, owner=self.owner
+        ).aupdate(status=status)
+
+    async def get(self, session_id):
+        return await TranscriptionSession.objects.filter(
+            session_id=session_id, lease_expires__gte=timezone.now()
+        ).values('session_id', 'owner', 'route', 'user_id', 'status').afirst()
+
+    async def heartbeat(self, session_ids):
+        await TranscriptionSession.objects.filter(
+            session_id__in=list(session_ids), owner=self.owner
+        ).aupdate(heartbeat_at=timezone.now(), lease_expires=self.lease_expiry())
+
+    async def release(self, session_id):
+        await TranscriptionSession.objects.filter(session_id=session_id).adelete()
+
+    async def state_counts(self):
+        rows = (
+            TranscriptionSession.objects.filter(lease_expires__gte=timezone.now())
+            .values('status').annotate(count=Count('pk'))
+        )
+        return {row['status']: row['count'] async for row in rows}
+
+    async def purge_expired(self):
+        deleted, _ = await TranscriptionSession.objects.filter(
+            lease_expires__lt=timezone.now()
+        ).adelete()
+        return deleted
+
+
+def build_session_registry():
+    """Create the registry configured by TRANSCRIPTION_SESSION_REGISTRY"""
+    registry_class = import_string(settings.TRANSCRIPTION_SESSION_REGISTRY)
+    return registry_class(lease_seconds=settings.TRANSCRIPTION_SESSION_LEASE_SECONDS)
@@ -0,0 +1,236 @@
+import hashlib
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from core.models import SpeechCacheEntry, TranslationHistory
+from .audio_storage import (
+    GENERATED_AUDIO_DIR, get_audio_storage, save_audio, save_audio_later, stored_name
+)
+from .elevenlabs_service import TTS_MODEL, generate_speech, resolve_voice
+from .translation_cache import normalize_text
+
+def speech_cache_key(text, voice_id, model=TTS_MODEL):
+    """
+    Build the content address for synthesized speech
+
+    Args:
+        text (str): Text to convert to speech
+        voice_id (str): Voice ID
+        model (str): TTS model
+
+    Returns:
+        str: SHA-256 hex digest
+    """
+    raw = '\x1f'.join((normalize_text(text), resolve_voice(voice_id) or '', model))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+def speech_file_name(key):
+    """Return the audio store name for a cache key"""
+    return stored_name(f"{GENERATED_AUDIO_DIR}/{key}.mp3")
+
+def open_speech(file_name):
+    """Open cached speech for reading"""
+    return get_audio_storage().open(file_name, 'rb')
+
+def speech_url(file_name):
+    """Return the public URL of cached speech"""
+    return get_audio_storage().url(file_name)
+
+def lookup_speech(text, voice_id):
+    """
+    Find cached speech and mark it used
+
+    Args:
+        text (str): Text to convert to speech
+        voice_id (str): Voice ID
+
+    Returns:
+        str: Audio store name, or None on a miss
+    """
+    key = speech_cache_key(text, voice_id)
+    entry = SpeechCacheEntry.objects.filter(key=key).only('pk', 'file_name').first()
+    if entry is None:
+        return None
+
+    if not get_audio_storage().exists(entry.file_name):
+        # File was removed behind our back; treat as a miss
+        entry.delete()
+        return None
+
+    SpeechCacheEntry.objects.filter(pk=entry.pk).update(
+        hit_count=F('hit_count') + 1,
+        last_used=timezone.now()
+    )
+    return entry.file_name
+
+def register_speech(text, voice_id, file_name, size_bytes):
+    """Record stored speech in the cache index"""
+    SpeechCacheEntry.objects.update_or_create(
+        key=speech_cache_key(text, voice_id),
+        defaults={
+            'voice_id': resolve_voice(voice_id) or '',
+            'model': TTS_MODEL,
+            'file_name': file_name,
+            'size_bytes': size_bytes,
+            'last_used': timezone.now(),
+        }
+    )
+
+def store_speech(text, voice_id, audio_bytes):
+    """
+    Save synthesized speech under its content address, blocking until stored
+
+    Args:
+        text (str): Text that was synthesized
+        voice_id (str): Voice ID
+        audio_bytes (bytes): MP3 audio
+
+    Returns:
+        str: Audio store name
+    """
+    file_name = save_audio(
+        speech_file_name(speech_cache_key(text, voice_id)), audio_bytes, reuse_existing=True
+    )
+    register_speech(text, voice_id, file_name, len(audio_bytes))
+    return file_name
+
+def store_speech_later(text, voice_id, audio_bytes):
+    """
+    Save synthesized speech on a background thread
+
+    The cache entry is only recorded once the file is in place.
+
+    Args:
+        text (str): Text that was synthesized
+        voice_id (str): Voice ID
+        audio_bytes (bytes): MP3 audio
+    """
+    save_audio_later(
+        speech_file_name(speech_cache_key(text, voice_id)),
+        audio_bytes,
+        reuse_existing=True,
+        on_saved=lambda file_name: register_speech(text, voice_id, file_name, len(audio_bytes)),
+    )
+
+def get_or_create_speech(text, voice_id):
+    """
+    Return cached speech, synthesizing it only on a miss
+
+    The file is stored before returning, so its URL can be handed out
+    straight away.
+
+    Args:
+        text (str): Text to convert to speech
+        voice_id (str): Voice ID
+
+    Returns:
+        str: Audio store name
+    """
+    file_name = lookup_speech(text, voice_id)
+    if file_name:
+        return file_name
+
+    return store_speech(text, voice_id, generate_speech(text, voice_id))
+
+def get_or_create_speech_bytes(text, voice_id):
+    """
+    Like get_or_create_speech, but return the MP3 bytes
+
+    On a miss the bytes are returned immediately and stored in the
+    background.
+
+    Args:
+        text (str): Text to convert to speech
+        voice_id (str): Voice ID
+
+    Returns:
+        bytes: MP3 audio
+    """
+    file_name = lookup_speech(text, voice_id)
+    if file_name:
+        with open_speech(file_name) as f:
+            return f.read()
+
+    audio_bytes = generate_speech(text, voice_id)
+    store_speech_later(text, voice_id, audio_bytes)
+    return audio_bytes
+
+def store_speech_when_complete(chunks, text, voice_id):
+    """
+    Pass audio chunks through and cache the whole clip once they are done
+
+    The write happens on a background thread; nothing is cached if the
+    stream is abandoned part-way.
+
+    Args:
+        chunks (iterable): Audio chunks
+        text (str): Text being synthesized
+        voice_id (str): Voice ID
+
+    Yields:
+        bytes: The chunks, unchanged
+    """
+    buffered = []
+    for chunk in chunks:
+        buffered.append(chunk)
+        yield chunk
+
+    store_speech_later(text, voice_id, b''.join(buffered))
+
+def prune_speech_cache(max_age_days=None, max_bytes=None):
+    """
+    Evict cached speech by age and total size
+
+    Entries unused for longer than ``max_age_days`` are removed first, then
+    the least recently used entries until the cache fits in ``max_bytes``.
+    Files still referenced by TranslationHistory.translated_audio_file are
+    never evicted.
+
+    Args:
+        max_age_days (int, optional): Defaults to settings.TTS_CACHE_MAX_AGE_DAYS
+        max_bytes (int, optional): Defaults to settings.TTS_CACHE_MAX_BYTES
+
+    Returns:
+        dict: Number of entries and bytes evicted, and entries kept because
+            they are referenced
+    """
+    if max_age_days is None:
+        max_age_days = settings.TTS_CACHE_MAX_AGE_DAYS
+    if max_bytes is None:
+        max_bytes = settings.TTS_CACHE_MAX_BYTES
+
+    storage = get_audio_storage()
+    referenced = set(
+        TranslationHistory.objects
+        .filter(translated_audio_file__startswith=f"{GENERATED_AUDIO_DIR}/")
+        .values_list('translated_audio_file', flat=True)
+    )
+
+    result = {'evicted': 0, 'evicted_bytes': 0}
+    kept = set()
+
+    def evict(entry):
+        if entry.file_name in referenced:
+            kept.add(entry.pk)
+            return 0
+        storage.delete(entry.file_name)
+        entry.delete()
+        result['evicted'] += 1
+        result['evicted_bytes'] += entry.size_bytes
+        return entry.size_bytes
+
+    cutoff = timezone.now() - timedelta(days=max_age_days)
+    for entry in SpeechCacheEntry.objects.filter(last_used__lt=cutoff).iterator():
+        evict(entry)
+
+    total = SpeechCacheEntry.objects.aggregate(total=Sum('size_bytes'))['total'] or 0
+    if total > max_bytes:
+        for entry in SpeechCacheEntry.objects.order_by('last_used').iterator():
+            total -= evict(entry)
+            if total <= max_bytes:
+                break
+
+    result['referenced'] = len(kept)
+    return result
@@ -0,0 +1,239 @@
+import asyncio
+import base64
+
+
+class TranslationPipeline:
+    """
+    Translates and voices final transcripts inside a WebSocket session
+
+    Each submitted utterance runs through a translation stage and then a
+    speech stage for every target language. Stages run concurrently across
+    utterances and languages (utterance 2 can be translating while utterance
+    1 is being synthesized, and all languages of one utterance translate at
+    once), but results are delivered in submission order per language: every
+    translation in order, and every audio clip in order. A language is
+    delivered as soon as it is ready, without waiting for slower languages.
+
+    Up to ``max_in_flight`` utterances translate at once, and each of them
+    translates into all of its languages at once (or ``fanout_concurrency``
+    of them), so an utterance takes about as long as its slowest language.
+
+    In streaming mode translation chunks are also pushed as
+    ``translation_delta`` messages the moment the model produces them, so
+    time-to-first-token becomes the user-visible latency.
+
+    Target languages can be added and removed while the pipeline runs;
+    changes apply from the next submitted utterance.
+    """
+
+    def __init__(self, translate, synthesize, deliver, languages,
+                 max_in_flight=4, fanout_concurrency=None, streaming=False):
+        """
+        Args:
+            translate (coroutine function): Called with source text and target
+                language, returns the translated text. In streaming mode, an
+                async generator function yielding translation chunks instead
+            synthesize (coroutine function, optional): Called with translated
+                text, returns MP3 bytes; speech is skipped when None
+            deliver (coroutine function): Called with each outgoing message dict
+            languages (list): Target languages
+            max_in_flight (int): Utterances translating at once, and
+                concurrent speech calls
+            fanout_concurrency (int, optional): Languages of one utterance
+                translating at once; all of them when None
+            streaming (bool): Whether ``translate`` streams chunks
+        """
+        self.translate = translate
+        self.streaming = streaming
+        self.synthesize = synthesize
+        self.deliver = deliver
+        self.languages = list(languages)
+
+        self.utterance_slots = asyncio.Semaphore(max_in_flight)
+        self.fanout_concurrency = fanout_concurrency
+        self.synthesize_slots = asyncio.Semaphore(max_in_flight)
+
+        self.utterance = 0
+        self.stages = set()
+        self.translations = {}
+        self.audio = {}
+        self.emitters = {}
+        self.language_stages = {}
+        for language in self.languages:
+            self._start_language(language)
+
+    def add_language(self, language):
+        """Start translating into another language"""
+        if language not in self.emitters:
+            self.languages.append(language)
+            self._start_language(language)
+
+    def remove_language(self, language):
+        """Stop translating into a language; its in-flight stages are cancelled"""
+        if language not in self.emitters:
+            return
+        self.languages.remove(language)
+        for task in self.emitters.pop(language) + list(self.language_stages.pop(language)):
+            task.cancel()
+        del self.translations[language]
+        del self.audio[language]
+
+    def _start_language(self, language):
+        self.language_stages[language] = set()
+        self.translations[language] = asyncio.Queue()
+        self.audio[language] = asyncio.Queue()
+        self.emitters[language] = [
+            asyncio.ensure_future(self._emit_translations(language)),
+            asyncio.ensure_future(self._emit_audio(language)),
+        ]
+
+    def submit(self, text):
+        """
+        Queue a final transcript for translation and speech
+
+        Args:
+            text (str): Source text
+
+        Returns:
+            int: Utterance number used in the delivered messages
+        """
+        self.utterance += 1
+        utterance = self.utterance
+        if not self.languages:
+            return utterance
+
+        admitted, fanout, finished = self._admit(len(self.languages))
+        for language in self.languages:
+            translation = self._track(
+                self._translate(utterance, text, language, admitted, fanout), language
+            )
+            translation.add_done_callback(finished)
+            self.translations[language].put_nowait((utterance, text, translation))
+
+            if self.synthesize:
+                audio = self._track(self._synthesize(translation), language)
+                self.audio[language].put_nowait((utterance, audio))
+
+        return utterance
+
+    async def close(self):
+        """Cancel in-flight stages and stop delivering results"""
+        tasks = list(self.stages) + [task for pair in self.emitters.values() for task in pair]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.stages.clear()
+
+    def _track(self, coro, language):
+        task = asyncio.ensure_future(coro)
+        stages = self.language_stages[language]
+        self.stages.add(task)
+        stages.add(task)
+        task.add_done_callback(self.stages.discard)
+        task.add_done_callback(stages.discard)
+        return task
+
+    def _admit(self, languages):
+        # One utterance slot, shared by the utterance's translations and
+        # released when the last of them ends, plus its language fan-out limit
+        admitted = asyncio.ensure_future(self.utterance_slots.acquire())
+        fanout = asyncio.Semaphore(self.fanout_concurrency or languages)
+        pending = [languages]
+
+        def finished(task):
+            pending[0] -= 1
+            if pending[0]:
+                return
+            if admitted.done() and not admitted.cancelled():
+                self.utterance_slots.release()
+            else:
+                admitted.cancel()
+
+        return admitted, fanout, finished
+
+    async def _translate(self, utterance, text, language, admitted, fanout):
+        await asyncio.shield(admitted)
+        async with fanout:
+            if not self.streaming:
+                return await self.translate(text, language)
+
+            chunks = []
+            async for chunk in self.translate(text, language):
+                chunks.append(chunk)
+                await self._deliver({
+                    'type': 'translation_delta',
+                    'utterance': utterance,
+                    'language': language,
+                    'delta': chunk
+                })
+            return ''.join(chunks)
+
+    async def _synthesize(self, translation):
+        try:
+            text = await translation
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Already reported by the translation emitter
+            return None
+
+        async with self.synthesize_slots:
+            return await self.synthesize(text)
+
+    async def _emit_translations(self, language):
+        queue = self.translations[language]
+        while True:
+            utterance, text, task = await queue.get()
+            try:
+                translation = await task
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await self._deliver_error(utterance, language, e)
+                continue
+
+            await self._deliver({
+                'type': 'translation',
+                'utterance': utterance,
+                'language': language,
+                'text': text,
+                'translation': translation
+            })
+
+    async def _emit_audio(self, language):
+        queue = self.audio[language]
+        while True:
+            utterance, task = await queue.get()
+            try:
+                audio_bytes = await task
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await self._deliver_error(utterance, language, e)
+                continue
+
+            if audio_bytes is None:
+                continue
+
+            await self._deliver({
+                'type': 'translation_audio',
+                'utterance': utterance,
+                'language': language,
+                'format': 'mp3',
+                'audio': base64.b64encode(audio_bytes).decode('ascii')
+            })
+
+    async def _deliver_error(self, utterance, language, error):
+        await self._deliver({
+            'type': 'error',
+            'utterance': utterance,
+            'language': language,
+            'message': str(error)
+        })
+
+    async def _deliver(self, message):
+        try:
+            await self.deliver(message)
+        except Exception:
+            # A failed send must not stop delivery of later results
+            pass
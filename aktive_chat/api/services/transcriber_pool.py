@@ -0,0 +1,221 @@
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+
+
+class CallbackSlot:
+    """
+    Transcriber callback that can be pointed at its real target later
+
+    Pooled transcribers are connected before anyone has claimed them. Events
+    are held here until a claimer attaches; the 'connected' event is replayed
+    to the claimer so it sees the usual session start.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.target = None
+        self.opened = None
+        self.closed = False
+
+    def __call__(self, data):
+        with self.lock:
+            if data.get('event') == 'connected':
+                self.opened = data
+            elif data.get('event') in ('disconnected', 'error'):
+                self.closed = True
+            target = self.target
+        if target:
+            target(data)
+
+    def attach(self, target):
+        """Start delivering events to ``target``"""
+        with self.lock:
+            self.target = target
+            opened = self.opened
+        if opened and target:
+            target(opened)
+
+
+class TranscriberPool:
+    """
+    Pre-connected upstream transcribers, ready to be claimed by a new session
+
+    The pool tracks how often sessions start and keeps enough connections
+    warm for the starts expected over the next ``horizon`` seconds, between
+    ``min_size`` and ``max_size``. A fraction of an expected start only earns
+    a connection once it reaches ``warm_threshold``, so a trickle of starts
+    does not keep a connection open that is recycled unused. Idle connections are closed and replaced
+    before they reach ``max_idle`` seconds, so a claimed connection has not
+    been timed out upstream.
+    """
+
+    def __init__(self, factory, min_size=0, max_size=4, max_idle=30,
+                 horizon=10, demand_window=300, refill_interval=2, warm_threshold=0.5):
+        """
+        Args:
+            factory (callable): Returns an unconnected (transcriber, CallbackSlot)
+            min_size (int): Connections kept warm regardless of demand
+            max_size (int): Upper bound on warm connections; 0 disables the pool
+            max_idle (float): Seconds a warm connection is kept before it is recycled
+            horizon (float): Seconds of expected session starts to keep warm
+            demand_window (float): Seconds of history used to estimate demand
+            refill_interval (float): Seconds between maintenance passes
+            warm_threshold (float): Expected starts over the horizon, beyond
+                the last whole one, needed to warm one more connection
+        """
+        self.factory = factory
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.horizon = horizon
+        self.demand_window = demand_window
+        self.refill_interval = refill_interval
+        self.warm_threshold = warm_threshold
+
+        self.idle = deque()
+        self.connecting = 0
+        self.starts = deque()
+        self.task = None
+        # Serializes refills so maintenance and explicit passes do not both connect
+        self.refill_lock = asyncio.Lock()
+        self.stats = {'claimed': 0, 'missed': 0, 'connected': 0, 'recycled': 0, 'failed': 0}
+
+    def target_size(self, now=None):
+        """
+        Number of warm connections wanted for the current demand
+
+        Returns:
+            int: Target pool size
+        """
+        now = time.monotonic() if now is None else now
+        while self.starts and self.starts[0] < now - self.demand_window:
+            self.starts.popleft()
+        expected = len(self.starts) * self.horizon / self.demand_window
+        expected = math.floor(expected + 1 - self.warm_threshold)
+        return max(self.min_size, min(self.max_size, expected))
+
+    def claim(self, callback):
+        """
+        Take a warm connection and route its events to ``callback``
+
+        Records the session start for demand tracking whether or not a
+        connection was available.
+
+        Args:
+            callback (callable): Function to call with transcription data
+
+        Returns:
+            Transcriber, or None if no warm connection is available
+        """
+        now = time.monotonic()
+        self.starts.append(now)
+        self.ensure_running()
+
+        while self.idle:
+            transcriber, slot, connected_at = self.idle.popleft()
+            if slot.closed or now - connected_at > self.max_idle:
+                self._discard(transcriber)
+                self.stats['recycled'] += 1
+                continue
+            slot.attach(callback)
+            self.stats['claimed'] += 1
+            return transcriber
+
+        self.stats['missed'] += 1
+        return None
+
+    def ensure_running(self):
+        """Start the maintenance task if it is not running"""
+        if self.max_size and (self.task is None or self.task.done()):
+            self.task = asyncio.ensure_future(self._maintain())
+
+    async def close(self):
+        """Stop maintenance and close every warm connection"""
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        while self.idle:
+            self._discard(self.idle.popleft()[0])
+
+    async def refill(self):
+        """Recycle stale connections and connect new ones up to the target size"""
+        async with self.refill_lock:
+            await self._refill()
+
+    async def _refill(self):
+        now = time.monotonic()
+        # Anything that would pass max_idle before the next pass goes now
+        recycle_after = self.max_idle - self.refill_interval
+        fresh = deque()
+        for entry in self.idle:
+            transcriber, slot, connected_at = entry
+            if slot.closed or now - connected_at > recycle_after:
+                self._discard(transcriber)
+                self.stats['recycled'] += 1
+            else:
+                fresh.append(entry)
+        self.idle = fresh
+
+        target = self.target_size(now)
+        while len(self.idle) > target:
+            self._discard(self.idle.pop()[0])
+
+        missing = target - len(self.idle) - self.connecting
+        if missing > 0:
+            await asyncio.gather(*(self._connect_one() for _ in range(missing)))
+
+    async def _maintain(self):
+        # Runs until there is no demand and nothing left to look after
+        while True:
+            await self.refill()
+            if not self.idle and not self.connecting and self.target_size() == 0:
+                return
+            await asyncio.sleep(self.refill_interval)
+
+    async def _connect_one(self):
+        self.connecting += 1
+        try:
+            transcriber, slot = self.factory()
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, transcriber.connect)
+            self.idle.append((transcriber, slot, time.monotonic()))
+            self.stats['connected'] += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.stats['failed'] += 1
+        finally:
+            self.connecting -= 1
+
+    def _discard(self, transcriber):
+        def close():
+            try:
+                transcriber.close()
+            except Exception:
+                pass
+
+        # Closing blocks on the SDK, so it happens off the loop
+        try:
+            asyncio.get_running_loop().run_in_executor(None, close)
+        except RuntimeError:
+            close()
+
+    def summary(self):
+        """
+        Report pool size and counters
+
+        Returns:
+            dict: Warm and connecting connections, target size and counters
+        """
+        return {
+            'warm': len(self.idle),
+            'connecting': self.connecting,
+            'target': self.target_size(),
+            **self.stats,
+        }
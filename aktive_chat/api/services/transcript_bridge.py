@@ -0,0 +1,99 @@
+import asyncio
+import threading
+from collections import deque
+
+
+def is_partial(data):
+    """Check if an event is a non-final transcript"""
+    return data.get('event') == 'transcript' and not data.get('isFinal')
+
+
+class TranscriptBridge:
+    """
+    Delivers transcriber callback events from SDK threads to an event loop
+
+    ``push`` may be called from any thread. Events are handed to ``deliver``
+    on the loop one at a time and in order. While a delivery is in flight,
+    newer partial transcripts replace older ones, so a slow client only ever
+    receives the latest partial; final transcripts and other events are never
+    dropped.
+    """
+
+    def __init__(self, loop, deliver):
+        """
+        Args:
+            loop (asyncio.AbstractEventLoop): Loop that owns ``deliver``
+            deliver (coroutine function): Called with each event dict
+        """
+        self.loop = loop
+        self.deliver = deliver
+
+        self.lock = threading.Lock()
+        self.pending = deque()
+        self.latest_partial = None
+        self.closed = False
+        self.stats = {'delivered': 0, 'coalesced': 0}
+
+        self.wakeup = asyncio.Event()
+        self.task = asyncio.ensure_future(self._run())
+
+    def push(self, data):
+        """Queue an event for delivery; safe to call from any thread"""
+        with self.lock:
+            if self.closed:
+                return
+
+            if is_partial(data):
+                if self.latest_partial is not None:
+                    self.stats['coalesced'] += 1
+                self.latest_partial = data
+            else:
+                if self.latest_partial is not None:
+                    if data.get('event') == 'transcript':
+                        # The final supersedes the partial for the same utterance
+                        self.stats['coalesced'] += 1
+                    else:
+                        self.pending.append(self.latest_partial)
+                    self.latest_partial = None
+                self.pending.append(data)
+
+        try:
+            self.loop.call_soon_threadsafe(self.wakeup.set)
+        except RuntimeError:
+            # Loop already closed
+            pass
+
+    async def close(self):
+        """Stop delivering events and drop anything still queued"""
+        with self.lock:
+            self.closed = True
+            self.pending.clear()
+            self.latest_partial = None
+
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+
+    def _next(self):
+        with self.lock:
+            if self.pending:
+                return self.pending.popleft()
+            data, self.latest_partial = self.latest_partial, None
+            return data
+
+    async def _run(self):
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+
+            data = self._next()
+            while data is not None:
+                try:
+                    await self.deliver(data)
+                    self.stats['delivered'] += 1
+                except Exception:
+                    # A failed send must not stop delivery of later events
+                    pass
+                data = self._next()
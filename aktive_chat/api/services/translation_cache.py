@@ -0,0 +1,193 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+def normalize_text(text):
+    """Collapse whitespace so trivially different inputs share an entry"""
+    return ' '.join(text.split())
+
+
+def cache_key(text, target_language, model):
+    """
+    Build the cache key for a translation
+
+    Args:
+        text (str): Source text
+        target_language (str): Target language
+        model (str): Model used for the translation
+
+    Returns:
+        str: Key safe for any Django cache backend
+    """
+    raw = '\x1f'.join((normalize_text(text), target_language.strip().lower(), model))
+    return 'translation:' + hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class TranslationCache:
+    """
+    Two-tier translation cache
+
+    A bounded in-process LRU sits in front of a shared Django cache (the
+    ``translations`` alias, database-backed by default) which handles TTL
+    and size-based culling across workers. Errors from the shared tier
+    (a missing cache table, a database hiccup) count as misses, so callers
+    fall back to the in-process tier or the model.
+    """
+
+    def __init__(self, max_entries=2048, cache_alias='translations'):
+        """
+        Args:
+            max_entries (int): Capacity of the in-process LRU
+            cache_alias (str): Django cache alias used as the shared tier
+        """
+        self.max_entries = max_entries
+        self.cache_alias = cache_alias
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = {
+            'memory_hits': 0,
+            'shared_hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'shared_errors': 0,
+        }
+
+    @property
+    def shared(self):
+        return caches[self.cache_alias]
+
+    def get(self, text, target_language, model):
+        """Return the cached translation, or None"""
+        key = cache_key(text, target_language, model)
+        translation = self._get_local(key)
+        if translation is not None:
+            return translation
+
+        try:
+            translation = self.shared.get(key)
+        except Exception:
+            translation = self._shared_error()
+        return self._record_shared(key, translation)
+
+    def set(self, text, target_language, model, translation):
+        """Store a translation in both tiers"""
+        key = cache_key(text, target_language, model)
+        self._set_local(key, translation)
+        try:
+            self.shared.set(key, translation)
+        except Exception:
+            self._shared_error()
+
+    def get_many(self, texts, target_language, model):
+        """
+        Look up many texts with a single shared-tier round trip
+
+        Returns:
+            dict: Cached translations keyed by source text; misses are left out
+        """
+        keys = {text: cache_key(text, target_language, model) for text in texts}
+        found, remote = {}, []
+        for key in dict.fromkeys(keys.values()):
+            translation = self._get_local(key)
+            if translation is not None:
+                found[key] = translation
+            else:
+                remote.append(key)
+
+        if remote:
+            try:
+                shared = self.shared.get_many(remote)
+            except Exception:
+                self._shared_error()
+                shared = {}
+            for key in remote:
+                translation = self._record_shared(key, shared.get(key))
+                if translation is not None:
+                    found[key] = translation
+        return {text: found[key] for text, key in keys.items() if key in found}
+
+    def set_many(self, translations, target_language, model):
+        """Store translations, keyed by source text, in both tiers at once"""
+        entries = {
+            cache_key(text, target_language, model): translation
+            for text, translation in translations.items()
+        }
+        for key, translation in entries.items():
+            self._set_local(key, translation)
+        try:
+            self.shared.set_many(entries)
+        except Exception:
+            self._shared_error()
+
+    async def aget(self, text, target_language, model):
+        """Async variant of get for use on the event loop"""
+        key = cache_key(text, target_language, model)
+        translation = self._get_local(key)
+        if translation is not None:
+            return translation
+
+        try:
+            translation = await self.shared.aget(key)
+        except Exception:
+            translation = self._shared_error()
+        return self._record_shared(key, translation)
+
+    async def aset(self, text, target_language, model, translation):
+        """Async variant of set for use on the event loop"""
+        key = cache_key(text, target_language, model)
+        self._set_local(key, translation)
+        try:
+            await self.shared.aset(key, translation)
+        except Exception:
+            self._shared_error()
+
+    def stats(self):
+        """
+        Hit/miss/eviction counters
+
+        Returns:
+            dict: Counters plus the current in-process entry count
+        """
+        with self.lock:
+            return dict(self.counters, memory_entries=len(self.entries))
+
+    def _get_local(self, key):
+        with self.lock:
+            translation = self.entries.get(key)
+            if translation is not None:
+                self.entries.move_to_end(key)
+                self.counters['memory_hits'] += 1
+            return translation
+
+    def _shared_error(self):
+        with self.lock:
+            self.counters['shared_errors'] += 1
+        return None
+
+    def _record_shared(self, key, translation):
+        if translation is None:
+            with self.lock:
+                self.counters['misses'] += 1
+            return None
+
+        with self.lock:
+            self.counters['shared_hits'] += 1
+        self._set_local(key, translation)
+        return translation
+
+    def _set_local(self, key, translation):
+        with self.lock:
+            self.entries[key] = translation
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.counters['evictions'] += 1
+
+
+translation_cache = TranslationCache(
+    max_entries=settings.TRANSLATION_CACHE_MEMORY_ENTRIES
+)
@@ -0,0 +1,403 @@
+import atexit
+import threading
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from django.conf import settings
+from django.db import DataError, IntegrityError, connections, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDay, TruncMonth
+from django.utils import timezone
+
+from accounts.models import Subscription
+from core.models import UsageRecord, UsageRollup
+
+
+def usage_cost(service_type, character_count=0, audio_duration_seconds=0):
+    """
+    Price one usage record with settings.USAGE_PRICING
+
+    Args:
+        service_type (str): One of UsageRecord.SERVICE_TYPES
+        character_count (int): Characters processed
+        audio_duration_seconds (float): Seconds of audio processed
+
+    Returns:
+        Decimal: Cost, rounded to the UsageRecord.cost precision
+    """
+    pricing = settings.USAGE_PRICING.get(service_type, {})
+    cost = (
+        Decimal(str(pricing.get('per_character', 0))) * character_count
+        + Decimal(str(pricing.get('per_audio_second', 0))) * Decimal(str(audio_duration_seconds))
+    )
+    return cost.quantize(Decimal('0.000001'))
+
+
+def period_starts(timestamp):
+    """
+    First day of the day and calendar month a usage timestamp falls in
+
+    Returns:
+        dict: Rollup period -> period start date, in the current time zone
+    """
+    day = timezone.localdate(timestamp)
+    return {'day': day, 'month': day.replace(day=1)}
+
+
+def apply_to_rollups(rows):
+    """
+    Add usage records to the rollup totals of their day and month
+
+    Call inside the transaction that writes the records, so the totals
+    never drift from the records they summarize. Each rollup row is touched
+    once per call, however many records it covers.
+
+    Args:
+        rows (list): UsageRecord instances
+    """
+    deltas = defaultdict(lambda: [0, 0.0, 0, Decimal(0)])
+    for row in rows:
+        for period, start in period_starts(row.timestamp).items():
+            totals = deltas[(row.user_id, row.service_type, period, start)]
+            totals[0] += 1
+            totals[1] += row.audio_duration_seconds
+            totals[2] += row.character_count
+            totals[3] += Decimal(row.cost)
+
+    for (user_id, service_type, period, start), totals in deltas.items():
+        key = {
+            'user_id': user_id,
+            'service_type': service_type,
+            'period': period,
+            'period_start': start,
+        }
+        if _increment_rollup(key, totals):
+            continue
+        try:
+            with transaction.atomic():
+                UsageRollup.objects.create(
+                    **key,
+                    records=totals[0],
+                    audio_duration_seconds=totals[1],
+                    character_count=totals[2],
+                    cost=totals[3],
+                )
+        except IntegrityError:
+            # Another worker created the row since the update
+            _increment_rollup(key, totals)
+
+
+def _increment_rollup(key, totals):
+    return UsageRollup.objects.filter(**key).update(
+        records=F('records') + totals[0],
+        audio_duration_seconds=F('audio_duration_seconds') + totals[1],
+        character_count=F('character_count') + totals[2],
+        cost=F('cost') + totals[3],
+    )
+
+
+def rebuild_rollups(since=None):
+    """
+    Recompute rollup totals from UsageRecord
+
+    Args:
+        since (date, optional): Only rebuild months from the one containing
+            this date onwards; everything when None
+
+    Returns:
+        int: Number of rollup rows written
+    """
+    records = UsageRecord.objects.all()
+    rollups = UsageRollup.objects.all()
+    if since:
+        month = since.replace(day=1)
+        records = records.filter(timestamp__gte=timezone.make_aware(
+            datetime(month.year, month.month, 1)
+        ))
+        rollups = rollups.filter(period_start__gte=month)
+
+    with transaction.atomic():
+        rollups.delete()
+        rebuilt = []
+        for period, trunc in (('day', TruncDay), ('month', TruncMonth)):
+            totals = (
+                records
+                .annotate(period_start=trunc('timestamp'))
+                .values('user_id', 'service_type', 'period_start')
+                .annotate(
+                    total_records=Count('id'),
+                    total_seconds=Sum('audio_duration_seconds'),
+                    total_characters=Sum('character_count'),
+                    total_cost=Sum('cost'),
+                )
+                .order_by()
+            )
+            rebuilt.extend(
+                UsageRollup(
+                    user_id=row['user_id'],
+                    service_type=row['service_type'],
+                    period=period,
+                    period_start=timezone.localdate(row['period_start']),
+                    records=row['total_records'],
+                    audio_duration_seconds=row['total_seconds'],
+                    character_count=row['total_characters'],
+                    cost=row['total_cost'],
+                )
+                for row in totals.iterator()
+            )
+        UsageRollup.objects.bulk_create(rebuilt, batch_size=1000)
+    return len(rebuilt)
+
+
+def usage_totals(user_id, period='month', when=None):
+    """
+    Usage per service for the day or month containing ``when``
+
+    Reads one rollup row per service.
+
+    Args:
+        user_id (int): User to report
+        period (str): 'day' or 'month'
+        when (datetime, optional): Defaults to now
+
+    Returns:
+        dict: service_type -> dict of records, audio_duration_seconds,
+            character_count and cost
+    """
+    start = period_starts(when or timezone.now())[period]
+    rows = UsageRollup.objects.filter(
+        user_id=user_id, period=period, period_start=start
+    ).values('service_type', 'records', 'audio_duration_seconds', 'character_count', 'cost')
+    return {row.pop('service_type'): row for row in rows}
+
+
+def monthly_minutes_used(user_id):
+    """
+    Minutes of speech processed this calendar month, from one rollup row
+
+    Usage still waiting in the recorder buffer is not included.
+    """
+    seconds = UsageRollup.objects.filter(
+        user_id=user_id,
+        service_type='speech_to_text',
+        period='month',
+        period_start=period_starts(timezone.now())['month'],
+    ).values_list('audio_duration_seconds', flat=True).first()
+    return (seconds or 0) / 60
+
+
+def monthly_minutes_allowed(user_id):
+    """Subscription.monthly_minutes, or USAGE_DEFAULT_MONTHLY_MINUTES without a subscription"""
+    minutes = Subscription.objects.filter(user_id=user_id).values_list(
+        'monthly_minutes', flat=True
+    ).first()
+    return settings.USAGE_DEFAULT_MONTHLY_MINUTES if minutes is None else minutes
+
+
+def remaining_minutes(user_id):
+    """
+    Speech minutes left in this month's quota
+
+    Returns:
+        float: Minutes left; zero or less when the quota is used up
+    """
+    return monthly_minutes_allowed(user_id) - monthly_minutes_used(user_id)
+
+
+class UsageRecorder:
+    """
+    Write-behind recorder for UsageRecord rows
+
+    ``record`` only appends to an in-memory buffer, so it is safe to call on
+    the request path and from the event loop. Buffered rows are written with
+    one ``bulk_create`` when ``max_batch`` rows are waiting or every
+    ``flush_interval`` seconds, by a background thread, and once more when
+    the process exits. The same transaction adds them to their rollups.
+
+    When a batch fails its rows are retried one by one. A row the database
+    rejects (a data or integrity error) is dropped so it cannot block the
+    rest; any other error puts the unwritten rows back at the front of the
+    buffer for the next attempt. The buffer holds at most ``max_buffered``
+    rows, so a long database outage costs the newest records rather than
+    unbounded memory.
+    """
+
+    def __init__(self, max_batch=200, flush_interval=5.0, max_buffered=10000):
+        """
+        Args:
+            max_batch (int): Buffered rows that trigger an immediate flush,
+                and the bulk_create batch size
+            flush_interval (float): Longest a row waits before it is written
+            max_buffered (int): Rows kept while the database is unavailable
+        """
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_buffered = max(max_batch, max_buffered)
+
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.buffer = []
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.stats = {
+            'recorded': 0, 'written': 0, 'flushes': 0, 'failed_flushes': 0,
+            'rejected': 0, 'dropped': 0,
+        }
+
+    def record(self, user_id, service_type, character_count=0, audio_duration_seconds=0, cost=None):
+        """
+        Buffer one usage record
+
+        Args:
+            user_id (int): User the usage is billed to
+            service_type (str): One of UsageRecord.SERVICE_TYPES
+            character_count (int): Characters processed
+            audio_duration_seconds (float): Seconds of audio processed
+            cost (Decimal, optional): Defaults to the configured pricing
+        """
+        if cost is None:
+            cost = usage_cost(service_type, character_count, audio_duration_seconds)
+
+        row = UsageRecord(
+            user_id=user_id,
+            service_type=service_type,
+            character_count=character_count,
+            audio_duration_seconds=audio_duration_seconds,
+            cost=cost,
+            timestamp=timezone.now(),
+        )
+        with self.lock:
+            if len(self.buffer) < self.max_buffered:
+                self.buffer.append(row)
+                self.stats['recorded'] += 1
+            else:
+                self.stats['dropped'] += 1
+            full = len(self.buffer) >= self.max_batch
+
+        self._ensure_thread()
+        if full:
+            self.wakeup.set()
+
+    def flush(self):
+        """
+        Write every buffered record now
+
+        Returns:
+            int: Number of records written
+
+        Raises:
+            Exception: The database error, after the unwritten records were
+                put back
+        """
+        with self.flush_lock:
+            with self.lock:
+                batch, self.buffer = self.buffer, []
+            if not batch:
+                return 0
+
+            try:
+                self._write(batch)
+                written = len(batch)
+            except Exception:
+                written = self._write_each(batch)
+
+            with self.lock:
+                self.stats['written'] += written
+                self.stats['flushes'] += 1
+            return written
+
+    def _write(self, rows):
+        try:
+            with transaction.atomic():
+                UsageRecord.objects.bulk_create(rows, batch_size=self.max_batch)
+                apply_to_rollups(rows)
+        except Exception:
+            # Nothing was written; make the rows insertable again
+            for row in rows:
+                row.pk = None
+                row._state.adding = True
+            raise
+
+    def _write_each(self, batch):
+        # Retry a failed batch row by row to find the rows that cannot be written
+        written = 0
+        for i, row in enumerate(batch):
+            try:
+                self._write([row])
+            except (DataError, IntegrityError):
+                with self.lock:
+                    self.stats['rejected'] += 1
+            except Exception:
+                with self.lock:
+                    self.buffer[:0] = batch[i:]
+                    overflow = len(self.buffer) - self.max_buffered
+                    if overflow > 0:
+                        del self.buffer[-overflow:]
+                        self.stats['dropped'] += overflow
+                    self.stats['written'] += written
+                    self.stats['failed_flushes'] += 1
+                raise
+            else:
+                written += 1
+        return written
+
+    def pending(self):
+        """Number of records waiting to be written"""
+        with self.lock:
+            return len(self.buffer)
+
+    def _ensure_thread(self):
+        if self.thread is None or not self.thread.is_alive():
+            with self.lock:
+                if self.thread is None or not self.thread.is_alive():
+                    self.thread = threading.Thread(
+                        target=self._run, name='usage-recorder', daemon=True
+                    )
+                    self.thread.start()
+
+    def _run(self):
+        while True:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                # Records are back in the buffer; retried on the next pass
+                pass
+            finally:
+                connections.close_all()
+
+
+usage_recorder = UsageRecorder(
+    max_batch=settings.USAGE_FLUSH_MAX_BATCH,
+    flush_interval=settings.USAGE_FLUSH_INTERVAL_SECONDS,
+    max_buffered=settings.USAGE_MAX_BUFFERED_RECORDS,
+)
+
+
+def _flush_at_exit():
+    try:
+        usage_recorder.flush()
+    except Exception:
+        pass
+
+
+atexit.register(_flush_at_exit)
+
+
+def record_usage(user_id, service_type, character_count=0, audio_duration_seconds=0):
+    """
+    Record usage without touching the database on the caller's path
+
+    Args:
+        user_id (int): User the usage is billed to
+        service_type (str): One of UsageRecord.SERVICE_TYPES
+        character_count (int): Characters processed
+        audio_duration_seconds (float): Seconds of audio processed
+    """
+    usage_recorder.record(
+        user_id,
+        service_type,
+        character_count=character_count,
+        audio_duration_seconds=audio_duration_seconds,
+    )
@@ -0,0 +1,176 @@
+import numpy as np
+
+
+class VoiceActivityGate:
+    """
+    Energy / zero-crossing voice activity detector for mono PCM16 audio
+
+    Audio is cut into short analysis frames and each frame is classified in
+    one vectorized pass: loud frames are speech, and quieter frames with a
+    high zero-crossing rate are kept as unvoiced consonants. Speech is
+    forwarded together with a short pre-roll before it and a hangover after
+    it, so word onsets are not clipped and the transcriber still hears the
+    trailing silence it uses to end an utterance. Longer silences are
+    dropped; a short frame of digital silence is sent every
+    ``keepalive_ms`` instead so the upstream session is not closed for
+    inactivity.
+    """
+
+    def __init__(self, sample_rate, frame_ms=20, threshold_db=-45.0,
+                 unvoiced_margin_db=10.0, unvoiced_zcr=0.25,
+                 hangover_ms=800, preroll_ms=200, keepalive_ms=1000):
+        """
+        Args:
+            sample_rate (int): Sample rate of the PCM16 input
+            frame_ms (int): Analysis frame length
+            threshold_db (float): RMS level (dBFS) above which a frame is speech
+            unvoiced_margin_db (float): How far below ``threshold_db`` a
+                frame with a high zero-crossing rate still counts as speech
+            unvoiced_zcr (float): Zero crossings per sample marking unvoiced speech
+            hangover_ms (int): Audio kept after the last speech frame
+            preroll_ms (int): Audio kept before the first speech frame
+            keepalive_ms (int): Silence skipped between keep-alive frames
+        """
+        self.sample_rate = sample_rate
+        self.frame_length = max(1, sample_rate * frame_ms // 1000)
+        self.threshold_db = threshold_db
+        self.unvoiced_db = threshold_db - unvoiced_margin_db
+        self.unvoiced_zcr = unvoiced_zcr
+        self.hangover = hangover_ms // frame_ms
+        self.preroll = preroll_ms // frame_ms
+        self.keepalive = max(1, keepalive_ms // frame_ms)
+        self.keepalive_frame = bytes(self.frame_length * 2)
+
+        # Samples short of a full frame, carried into the next call
+        self.remainder = np.zeros(0, dtype=np.int16)
+        # Frames since the last speech frame, and skipped frames since the
+        # last keep-alive
+        self.since_speech = self.hangover + 1
+        self.since_keepalive = 0
+        # Most recent skipped frames, replayed as pre-roll when speech starts
+        self.skipped_tail = np.zeros((0, self.frame_length), dtype=np.int16)
+
+        self.stats = {
+            'frames': 0,
+            'speech_frames': 0,
+            'forwarded_frames': 0,
+            'skipped_frames': 0,
+            'keepalives': 0,
+        }
+
+    def classify(self, frames):
+        """
+        Classify analysis frames as speech or not
+
+        Args:
+            frames (np.ndarray): int16 array of shape (n, frame_length)
+
+        Returns:
+            np.ndarray: Boolean speech flag per frame
+        """
+        samples = frames.astype(np.float32) / 32768.0
+        rms = np.sqrt(np.mean(samples * samples, axis=1))
+        level_db = 20 * np.log10(np.maximum(rms, 1e-10))
+
+        signs = np.signbit(samples)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (self.frame_length - 1)
+
+        voiced = level_db > self.threshold_db
+        unvoiced = (level_db > self.unvoiced_db) & (zcr > self.unvoiced_zcr)
+        return voiced | unvoiced
+
+    def process(self, pcm):
+        """
+        Gate the next chunk of audio
+
+        Args:
+            pcm (bytes): Mono PCM16 audio
+
+        Returns:
+            bytes: Audio to forward upstream; empty when everything was
+                silence and no keep-alive is due
+        """
+        samples = np.frombuffer(pcm, dtype='<i2')
+        if len(self.remainder):
+            samples = np.concatenate((self.remainder, samples))
+
+        count = len(samples) // self.frame_length
+        self.remainder = samples[count * self.frame_length:].copy()
+        if not count:
+            return b''
+
+        frames = samples[:count * self.frame_length].reshape(count, self.frame_length)
+        speech = self.classify(frames)
+
+        # Hangover: frames since the most recent speech frame, carrying the
+        # count over from the previous chunk
+        index = np.arange(count)
+        last_speech = np.maximum.accumulate(np.where(speech, index, -1 - self.since_speech))
+        active = index - last_speech <= self.hangover
+
+        # Pre-roll: frames shortly before a speech frame in this chunk
+        if self.preroll:
+            following = np.where(speech, index, count + self.preroll)
+            next_speech = np.minimum.accumulate(following[::-1])[::-1]
+            active |= next_speech - index <= self.preroll
+
+        speech_frames = int(np.count_nonzero(speech))
+        self.stats['frames'] += count
+        self.stats['speech_frames'] += speech_frames
+        if speech_frames:
+            self.since_speech = count - 1 - int(np.flatnonzero(speech)[-1])
+        else:
+            self.since_speech += count
+
+        out = []
+        # Speech starting within the pre-roll window of this chunk also
+        # gets the tail of the audio skipped just before it
+        if active[0] and len(self.skipped_tail) and speech[:self.preroll + 1].any():
+            first = int(np.flatnonzero(speech)[0])
+            replay = self.skipped_tail[len(self.skipped_tail) - (self.preroll - first):]
+            if len(replay):
+                out.append(replay.tobytes())
+                self.stats['forwarded_frames'] += len(replay)
+                self.stats['skipped_frames'] -= len(replay)
+
+        # Walk runs of equal activity instead of single frames
+        edges = np.flatnonzero(np.diff(active.astype(np.int8))) + 1
+        for start, end in zip(np.concatenate(([0], edges)), np.concatenate((edges, [count]))):
+            if active[start]:
+                out.append(frames[start:end].tobytes())
+                self.stats['forwarded_frames'] += end - start
+                self.since_keepalive = 0
+                continue
+
+            skipped = end - start
+            self.stats['skipped_frames'] += skipped
+            due = (self.since_keepalive + skipped) // self.keepalive
+            if due:
+                out.append(self.keepalive_frame * due)
+                self.stats['keepalives'] += due
+            self.since_keepalive = (self.since_keepalive + skipped) % self.keepalive
+
+        # Remember the trailing skipped run for the next chunk's pre-roll
+        if active[-1] or not self.preroll:
+            self.skipped_tail = self.skipped_tail[:0]
+        elif active.any():
+            run_start = int(edges[-1]) if len(edges) else 0
+            self.skipped_tail = frames[max(run_start, count - self.preroll):].copy()
+        else:
+            self.skipped_tail = np.concatenate((self.skipped_tail, frames[-self.preroll:]))[-self.preroll:]
+
+        return b''.join(out)
+
+    def summary(self):
+        """
+        Report how much audio was forwarded and skipped
+
+        Returns:
+            dict: Frame counters plus seconds of audio forwarded and skipped
+        """
+        frame_seconds = self.frame_length / self.sample_rate
+        return {
+            **self.stats,
+            'forwarded_seconds': round(self.stats['forwarded_frames'] * frame_seconds, 2),
+            'skipped_seconds': round(self.stats['skipped_frames'] * frame_seconds, 2),
+        }
@@ -0,0 +1,79 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+
+
+class ShardedAudioStorage(FileSystemStorage):
+    """
+    Local audio storage with a hash-sharded layout and atomic writes
+
+    ``generated_audio/abcd.mp3`` is stored as ``generated_audio/3f/a2/abcd.mp3``
+    so no directory grows to millions of entries. Files are written to a
+    temporary name in the target directory and renamed into place, so readers
+    never see a partial file.
+
+    Selected through STORAGES['audio']; any Django storage backend can be
+    configured there instead.
+    """
+
+    TEMP_PREFIX = '.tmp-'
+
+    def __init__(self, shard_depth=2, shard_width=2, **kwargs):
+        """
+        Args:
+            shard_depth (int): Number of shard directory levels
+            shard_width (int): Hex characters per shard directory
+            **kwargs: Passed to FileSystemStorage
+        """
+        super().__init__(**kwargs)
+        self.shard_depth = shard_depth
+        self.shard_width = shard_width
+
+    def shard_name(self, name):
+        """
+        Return the sharded form of a name; already sharded names are unchanged
+
+        Args:
+            name (str): Storage-relative name
+
+        Returns:
+            str: Name with shard directories inserted before the file name
+        """
+        directory, basename = posixpath.split(name.replace('\\', '/'))
+        digest = hashlib.sha1(basename.encode('utf-8')).hexdigest()
+        shards = [
+            digest[i * self.shard_width:(i + 1) * self.shard_width]
+            for i in range(self.shard_depth)
+        ]
+
+        parts = directory.split('/') if directory else []
+        if parts[-self.shard_depth:] == shards:
+            return name
+        return posixpath.join(*parts, *shards, basename)
+
+    def get_available_name(self, name, max_length=None):
+        return super().get_available_name(self.shard_name(name), max_length)
+
+    def _save(self, name, content):
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=self.TEMP_PREFIX)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in content.chunks():
+                    f.write(chunk if isinstance(chunk, bytes) else chunk.encode('utf-8'))
+            os.chmod(temp_path, self.file_permissions_mode or 0o644)
+            os.replace(temp_path, full_path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+        return os.path.relpath(full_path, self.location).replace('\\', '/')
@@ -1,3 +1,1836 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import httpx
+import numpy as np
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.db import IntegrityError
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from elevenlabs.client import ElevenLabs
+
+from accounts.models import Subscription
+from core.models import (
+    SpeechCacheEntry, TranscriptionSession, TranslationHistory, UsageRecord, UsageRollup
+)
+
+from .consumers import RoomConsumer, TranscriptionConsumer
+from .storage import ShardedAudioStorage
+
+from .services import elevenlabs_service, openai_service, speech_cache
+from .services.assemblyai_service import TranscriptionSessionManager
+from .services.audio_ingest import AudioFramer, AudioIngestQueue
+from .services.audio_processing import (
+    AudioIngestStage, DecoderPool, StreamingResampler, decode_raw, to_pcm16_bytes
+)
+from .services.audio_storage import (
+    iter_stored_files, save_audio, save_audio_later, sweep_orphaned_audio
+)
+from .services.quota_meter import QuotaMeter, QuotaMeters, quota_meters
+from .services.rooms import (
+    RoomSubscriptions, can_join_room, claim_room, language_group, speakers_group
+)
+from .services.session_recovery import AudioReplayBuffer, TranscriptOverlapFilter, backoff_delays
+from .services.session_registry import DatabaseSessionRegistry, LocalSessionRegistry
+from .services.speech_pipeline import TranslationPipeline
+from .services.transcriber_pool import CallbackSlot, TranscriberPool
+from .services.transcript_bridge import TranscriptBridge
+from .services.translation_cache import TranslationCache
+from .services.usage import (
+    UsageRecorder, rebuild_rollups, remaining_minutes, usage_cost, usage_totals
+)
+from .services.voice_activity import VoiceActivityGate
+
+
+def tone(frequency, sample_rate, seconds=1.0, amplitude=0.5):
+    t = np.arange(int(sample_rate * seconds)) / sample_rate
+    return (amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+
+
+def level_db(samples, amplitude=0.5):
+    return 20 * np.log10(np.sqrt(np.mean(samples ** 2)) / (amplitude / np.sqrt(2)))
+
+
+class StreamingResamplerTests(SimpleTestCase):
+    def test_output_length_matches_rate_ratio(self):
+        out = StreamingResampler(44100, 16000).process(tone(440, 44100))
+        self.assertEqual(len(out), 16000)
+
+    def test_chunked_stream_matches_single_pass(self):
+        signal = tone(440, 44100)
+        whole = StreamingResampler(44100, 16000).process(signal)
+
+        resampler = StreamingResampler(44100, 16000)
+        rng = np.random.default_rng(0)
+        parts, start = [], 0
+        while start < len(signal):
+            size = int(rng.integers(1, 3000))
+            parts.append(resampler.process(signal[start:start + size]))
+            start += size
+
+        np.testing.assert_allclose(np.concatenate(parts), whole, atol=1e-6)
+
+    def test_tone_frequency_is_preserved(self):
+        out = StreamingResampler(48000, 16000).process(tone(440, 48000))
+        spectrum = np.abs(np.fft.rfft(out * np.hanning(len(out))))
+        self.assertAlmostEqual(np.argmax(spectrum) * 16000 / len(out), 440, delta=1)
+
+    def test_passband_level_is_kept(self):
+        out = StreamingResampler(48000, 16000).process(tone(1000, 48000))[200:]
+        self.assertAlmostEqual(level_db(out), 0.0, delta=0.1)
+
+    def test_tone_above_new_nyquist_is_rejected(self):
+        out = StreamingResampler(48000, 16000).process(tone(12000, 48000))[200:]
+        self.assertLess(level_db(out), -60)
+
+    def test_upsampling_interpolates(self):
+        out = StreamingResampler(8000, 16000).process(tone(440, 8000))
+        self.assertEqual(len(out), 15999)
+        spectrum = np.abs(np.fft.rfft(out * np.hanning(len(out))))
+        self.assertAlmostEqual(np.argmax(spectrum) * 16000 / len(out), 440, delta=1)
+
+
+class AudioIngestStageTests(SimpleTestCase):
+    def test_stereo_pcm16_is_downmixed(self):
+        left = tone(440, 16000, seconds=0.1)
+        stereo = np.stack([left, np.zeros_like(left)], axis=1).reshape(-1)
+        mono = decode_raw(to_pcm16_bytes(stereo), 'pcm16', channels=2)
+        np.testing.assert_allclose(mono, left / 2, atol=1e-4)
+
+    def test_pcm16_at_target_rate_passes_through(self):
+        stage = AudioIngestStage('pcm16', sample_rate=16000, target_rate=16000)
+        frame = to_pcm16_bytes(tone(440, 16000, seconds=0.02))
+        self.assertIs(stage.process(frame), frame)
+
+    def test_44k_pcm16_shrinks_to_16k(self):
+        stage = AudioIngestStage('pcm16', sample_rate=44100, target_rate=16000)
+        frame = to_pcm16_bytes(tone(440, 44100))
+        self.assertEqual(len(stage.process(frame)), 16000 * 2)
+
+    def test_raw_pcm_requires_sample_rate(self):
+        with self.assertRaises(ValueError):
+            AudioIngestStage('pcm16')
+
+    def test_handshake_reports_passthrough(self):
+        stage = AudioIngestStage('pcm16', sample_rate=16000, target_rate=16000)
+        self.assertEqual(stage.describe(), {
+            'encoding': 'pcm16', 'sampleRate': 16000, 'channels': 1,
+            'targetSampleRate': 16000, 'passthrough': True,
+        })
+
+    def test_bogus_sample_rate_is_rejected(self):
+        with self.assertRaises(ValueError):
+            AudioIngestStage('pcm16', sample_rate='16000')
+
+    def test_split_sample_frames_are_carried_over(self):
+        stereo = to_pcm16_bytes(tone(440, 16000, seconds=0.1, amplitude=0.3).repeat(2))
+        whole = AudioIngestStage('pcm16', sample_rate=16000, channels=2, target_rate=16000)
+        split = AudioIngestStage('pcm16', sample_rate=16000, channels=2, target_rate=16000)
+        parts = [stereo[i:i + 333] for i in range(0, len(stereo), 333)]
+        self.assertEqual(b''.join(split.process(part) for part in parts), whole.process(stereo))
+
+        passthrough = AudioIngestStage('pcm16', sample_rate=16000, target_rate=16000)
+        self.assertEqual(passthrough.process(b'\x01\x02\x03'), b'\x01\x02')
+        self.assertEqual(passthrough.process(b'\x04'), b'\x03\x04')
+
+    def test_decoder_pool_is_bounded(self):
+        pool = DecoderPool(max_workers=1)
+        release = threading.Event()
+        pool.start(release.wait)
+        with self.assertRaises(ValueError):
+            pool.start(release.wait)
+        release.set()
+        # The slot comes back once the job returns
+        self.assertTrue(pool.slots.acquire(timeout=1))
+        pool.slots.release()
+        pool.start(lambda: None)
+
+
+class VoiceActivityGateTests(SimpleTestCase):
+    def speech_with_pauses(self):
+        # 1 s tone, 3 s of faint noise, 1 s tone, 3 s of faint noise
+        noise = np.random.default_rng(0).normal(0, 0.001, 16000 * 3).astype(np.float32)
+        speech = tone(300, 16000)
+        return to_pcm16_bytes(np.concatenate((speech, noise, speech, noise)))
+
+    def test_silence_is_skipped(self):
+        gate = VoiceActivityGate(16000)
+        gate.process(self.speech_with_pauses())
+        summary = gate.summary()
+        # Speech, 800 ms hangover and 200 ms pre-roll are forwarded
+        self.assertAlmostEqual(summary['forwarded_seconds'], 1 + 0.8 + 0.2 + 1 + 0.8, delta=0.05)
+        self.assertAlmostEqual(summary['skipped_seconds'], 8 - summary['forwarded_seconds'], delta=0.05)
+        self.assertGreaterEqual(summary['keepalives'], 3)
+
+    def test_output_does_not_depend_on_chunking(self):
+        pcm = self.speech_with_pauses()
+        whole = VoiceActivityGate(16000).process(pcm)
+
+        gate = VoiceActivityGate(16000)
+        rng = np.random.default_rng(1)
+        parts, start = [], 0
+        while start < len(pcm):
+            size = int(rng.integers(1, 4000)) * 2
+            parts.append(gate.process(pcm[start:start + size]))
+            start += size
+
+        self.assertEqual(b''.join(parts), whole)
+
+    def test_speech_onset_is_kept(self):
+        gate = VoiceActivityGate(16000, keepalive_ms=10000)
+        silence = to_pcm16_bytes(np.zeros(16000, dtype=np.float32))
+        speech = to_pcm16_bytes(tone(300, 16000, seconds=0.5))
+        self.assertEqual(gate.process(silence), b'')
+        out = gate.process(speech)
+        # 200 ms of pre-roll from the previous chunk, then all of the speech
+        self.assertEqual(len(out), (3200 + 8000) * 2)
+        self.assertEqual(out[-len(speech):], speech)
+
+
+class AudioFramerTests(SimpleTestCase):
+    def test_irregular_chunks_become_fixed_frames(self):
+        framer = AudioFramer(frame_bytes=3200)
+        data = bytes(range(256)) * 100
+        rng = np.random.default_rng(2)
+        frames, start = [], 0
+        while start < len(data):
+            size = int(rng.integers(1, 9000))
+            frames.extend(framer.write(data[start:start + size]))
+            start += size
+
+        self.assertTrue(all(len(frame) == 3200 for frame in frames))
+        self.assertEqual(b''.join(frames), data[:len(frames) * 3200])
+        self.assertEqual(framer.fill, len(data) % 3200)
+
+    def test_stale_partial_frame_is_padded_and_released(self):
+        now = [0.0]
+        framer = AudioFramer(frame_bytes=4, max_hold=0.2, clock=lambda: now[0])
+        self.assertEqual(framer.write(b'ab'), [])
+        now[0] = 0.5
+        self.assertEqual(framer.write(b'c'), [b'ab\x00\x00'])
+        self.assertEqual(framer.flush(), b'c\x00\x00\x00')
+        self.assertEqual(framer.stats, {'frames': 2, 'padded': 2})
+
+
+class ElevenLabsServiceTests(SimpleTestCase):
+    def setUp(self):
+        self.requests = []
+
+        def handler(request):
+            self.requests.append((request.url.path, json.loads(request.content)))
+            return httpx.Response(200, content=b'ID3 mp3 audio')
+
+        client = ElevenLabs(api_key='test', httpx_client=httpx.Client(transport=httpx.MockTransport(handler)))
+        patcher = mock.patch.object(elevenlabs_service, 'get_client', return_value=client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_calls_match_the_client_interface(self):
+        self.assertEqual(elevenlabs_service.generate_speech_single('Bonjour', 'voice-1'), b'ID3 mp3 audio')
+        self.assertEqual(b''.join(elevenlabs_service.stream_speech('Salut', 'default')), b'ID3 mp3 audio')
+
+        (convert_path, convert_body), (stream_path, stream_body) = self.requests
+        self.assertEqual(convert_path, '/v1/text-to-speech/voice-1')
+        self.assertEqual(stream_path, f"/v1/text-to-speech/{settings.ELEVENLABS_DEFAULT_VOICE_ID}/stream")
+        self.assertEqual(
+            (convert_body['text'], convert_body['model_id']), ('Bonjour', elevenlabs_service.TTS_MODEL)
+        )
+        self.assertEqual(stream_body['text'], 'Salut')
+
+
+class SentencePieceTests(SimpleTestCase):
+    def test_abbreviations_and_initials_do_not_split(self):
+        pieces = elevenlabs_service.split_sentences(
+            'Dr. Smith met J. Doe at noon. Then they left, etc. and went home.', max_chars=10
+        )
+        self.assertEqual(pieces, ['Dr. Smith met J. Doe at noon.', 'Then they left, etc. and went home.'])
+
+    def test_text_without_terminal_punctuation(self):
+        self.assertEqual(elevenlabs_service.split_sentences('  just some words  '), ['just some words'])
+        self.assertEqual(elevenlabs_service.split_sentences('One. and then', max_chars=5), ['One.', 'and then'])
+        self.assertEqual(elevenlabs_service.split_sentences('   '), [])
+
+    def test_long_runs_are_grouped_up_to_the_limit(self):
+        text = ' '.join(f"Sentence {i}." for i in range(50))
+        pieces = elevenlabs_service.split_sentences(text, max_chars=40)
+        self.assertEqual(' '.join(pieces), text)
+        self.assertTrue(all(len(piece) <= 40 for piece in pieces))
+
+        long_sentence = 'word ' * 100 + 'end.'
+        self.assertEqual(elevenlabs_service.split_sentences(long_sentence, max_chars=40), [long_sentence])
+        self.assertEqual(elevenlabs_service.split_sentences('你好。再见！'), ['你好。 再见！'])
+
+    def wait_for_idle_workers(self):
+        # Every worker parks on the barrier only once the jobs queued before it are done
+        barrier = threading.Barrier(settings.TTS_PARALLEL_WORKERS + 1)
+        for _ in range(settings.TTS_PARALLEL_WORKERS):
+            elevenlabs_service.speech_workers.submit(barrier.wait, 5)
+        barrier.wait(5)
+
+    @override_settings(TTS_SENTENCE_MAX_CHARS=1)
+    def test_pieces_are_yielded_in_order_when_later_ones_finish_first(self):
+        last_done = threading.Event()
+
+        def synthesize(piece, voice_id):
+            if piece == 'Piece 0.':
+                last_done.wait(5)
+            elif piece == 'Piece 2.':
+                last_done.set()
+            return piece.encode()
+
+        with mock.patch.object(elevenlabs_service, 'generate_speech_single', side_effect=synthesize):
+            pieces = list(elevenlabs_service.iter_speech_pieces('Piece 0. Piece 1. Piece 2.', 'v1'))
+        self.assertEqual(pieces, [b'Piece 0.', b'Piece 1.', b'Piece 2.'])
+
+    @override_settings(TTS_SENTENCE_MAX_CHARS=1)
+    def test_stopping_early_drops_pieces_that_have_not_started(self):
+        workers = settings.TTS_PARALLEL_WORKERS
+        release, rendered = threading.Event(), []
+
+        def synthesize(piece, voice_id):
+            rendered.append(piece)
+            if piece != 'Piece 0.':
+                release.wait(5)
+            return piece.encode()
+
+        text = ' '.join(f"Piece {i}." for i in range(workers * 2))
+        with mock.patch.object(elevenlabs_service, 'generate_speech_single', side_effect=synthesize):
+            stream = elevenlabs_service.iter_speech_pieces(text, 'v1')
+            self.assertEqual(next(stream), b'Piece 0.')
+            stream.close()
+            release.set()
+            self.wait_for_idle_workers()
+
+        # Only the pieces already on a worker thread were rendered
+        self.assertLessEqual(len(rendered), workers + 1)
+        self.assertNotIn(f"Piece {workers * 2 - 1}.", rendered)
+
+
+def use_temp_audio_storage(test, **options):
+    directory = tempfile.TemporaryDirectory()
+    test.addCleanup(directory.cleanup)
+    storage = ShardedAudioStorage(location=directory.name, **options)
+    for target in ('api.services.audio_storage.get_audio_storage',
+                   'api.services.speech_cache.get_audio_storage'):
+        patcher = mock.patch(target, return_value=storage)
+        patcher.start()
+        test.addCleanup(patcher.stop)
+    return storage
+
+
+class SpeechCacheTests(TestCase):
+    def setUp(self):
+        self.storage = use_temp_audio_storage(self)
+
+    @mock.patch('api.services.speech_cache.generate_speech', return_value=b'mp3')
+    def test_repeated_text_is_synthesized_once(self, generate_speech):
+        file_name = speech_cache.get_or_create_speech('Hello  world', 'v1')
+        self.assertTrue(file_name.startswith('generated_audio/'))
+        self.assertTrue(self.storage.exists(file_name))
+
+        self.assertEqual(speech_cache.get_or_create_speech(' Hello world', 'v1'), file_name)
+        self.assertNotEqual(speech_cache.get_or_create_speech('Hello world', 'v2'), file_name)
+        self.assertEqual(generate_speech.call_count, 2)
+        self.assertEqual(SpeechCacheEntry.objects.get(file_name=file_name).hit_count, 1)
+
+    @mock.patch('api.services.speech_cache.generate_speech', return_value=b'mp3')
+    def test_missing_file_is_a_miss(self, generate_speech):
+        file_name = speech_cache.get_or_create_speech('Hello', 'v1')
+        self.storage.delete(file_name)
+
+        self.assertIsNone(speech_cache.lookup_speech('Hello', 'v1'))
+        self.assertFalse(SpeechCacheEntry.objects.exists())
+
+    def test_prune_keeps_files_referenced_by_history(self):
+        now = timezone.now()
+        names = {}
+        for text, age in (('kept', 100), ('stale', 100), ('older', 2), ('newer', 1)):
+            names[text] = speech_cache.store_speech(text, 'v1', b'x' * 10)
+            SpeechCacheEntry.objects.filter(file_name=names[text]).update(
+                last_used=now - timedelta(days=age)
+            )
+
+        user = get_user_model().objects.create_user('listener', 'listener@example.com', 'pw')
+        TranslationHistory.objects.create(
+            user=user, original_text='kept', translated_text='kept',
+            target_language='French', translated_audio_file=names['kept'],
+        )
+
+        result = speech_cache.prune_speech_cache(max_age_days=90, max_bytes=20)
+        self.assertEqual(result, {'evicted': 2, 'evicted_bytes': 20, 'referenced': 1})
+        self.assertEqual(
+            set(SpeechCacheEntry.objects.values_list('file_name', flat=True)),
+            {names['kept'], names['newer']}
+        )
+        self.assertFalse(self.storage.exists(names['stale']))
+        self.assertFalse(self.storage.exists(names['older']))
+        self.assertTrue(self.storage.exists(names['kept']))
+
+
+class AudioStorageTests(TestCase):
+    def setUp(self):
+        self.storage = use_temp_audio_storage(self)
+
+    def listing(self, directory):
+        return sorted(iter_stored_files(self.storage, directory))
+
+    def test_names_are_sharded_once(self):
+        name = self.storage.shard_name('generated_audio/abcd.mp3')
+        self.assertRegex(name, r'^generated_audio/[0-9a-f]{2}/[0-9a-f]{2}/abcd\.mp3$')
+        self.assertEqual(self.storage.shard_name(name), name)
+
+    def test_save_is_atomic(self):
+        name = save_audio('generated_audio/clip.mp3', b'mp3')
+        self.assertEqual(self.listing('generated_audio'), [name])
+        with self.storage.open(name) as f:
+            self.assertEqual(f.read(), b'mp3')
+
+        self.assertEqual(save_audio('generated_audio/clip.mp3', b'new', reuse_existing=True), name)
+        self.assertNotEqual(save_audio('generated_audio/clip.mp3', b'new'), name)
+
+        # A failed write leaves neither a partial file nor its temporary
+        broken = ContentFile(b'')
+        broken.chunks = mock.Mock(side_effect=OSError('disk full'))
+        with self.assertRaises(OSError):
+            self.storage.save('generated_audio/broken.mp3', broken)
+        self.assertEqual(len(self.listing('generated_audio')), 2)
+
+    def test_background_save_reports_the_stored_name(self):
+        saved = []
+        future = save_audio_later('generated_audio/later.mp3', b'mp3', on_saved=saved.append)
+        self.assertEqual(saved, [future.result(timeout=5)])
+        self.assertTrue(self.storage.exists(saved[0]))
+
+    def test_sweep_deletes_old_unreferenced_files(self):
+        names = {
+            label: save_audio(f"{directory}/{label}.mp3", b'mp3')
+            for label, directory in (
+                ('history', 'translation_audio'), ('cached', 'generated_audio'),
+                ('orphan', 'generated_audio'), ('upload', 'translation_audio'),
+                ('fresh', 'generated_audio'),
+            )
+        }
+        old = time.time() - 2 * 3600
+        for label in ('history', 'cached', 'orphan', 'upload'):
+            os.utime(self.storage.path(names[label]), (old, old))
+
+        user = get_user_model().objects.create_user('listener', 'listener@example.com', 'pw')
+        TranslationHistory.objects.create(
+            user=user, original_text='a', translated_text='b', target_language='French',
+            original_audio_file=names['history'],
+        )
+        SpeechCacheEntry.objects.create(key='k', model='m', file_name=names['cached'])
+
+        self.assertEqual(sweep_orphaned_audio(dry_run=True), {'scanned': 5, 'orphaned': 2})
+        self.assertEqual(len(self.listing('generated_audio') + self.listing('translation_audio')), 5)
+
+        self.assertEqual(sweep_orphaned_audio(), {'scanned': 5, 'orphaned': 2})
+        self.assertEqual(
+            self.listing('generated_audio') + self.listing('translation_audio'),
+            sorted([names['cached'], names['fresh']]) + [names['history']]
+        )
+
+
+class TranscriptBridgeTests(SimpleTestCase):
+    async def test_partials_coalesce_behind_a_slow_send(self):
+        delivered, release = [], asyncio.Event()
+
+        async def deliver(data):
+            delivered.append(data['text'])
+            await release.wait()
+
+        bridge = TranscriptBridge(asyncio.get_running_loop(), deliver)
+        partial = lambda text: {'event': 'transcript', 'isFinal': False, 'text': text}
+        bridge.push(partial('he'))
+        await asyncio.sleep(0.01)
+
+        # Pushed from SDK threads while the first send is in flight
+        events = [
+            partial('hel'), partial('hell'),
+            {'event': 'transcript', 'isFinal': True, 'text': 'hello'},
+            partial('wor'),
+            {'event': 'status', 'text': 'reconnecting'},
+        ]
+        thread = threading.Thread(target=lambda: [bridge.push(event) for event in events])
+        thread.start()
+        thread.join()
+        release.set()
+        await asyncio.sleep(0.01)
+
+        self.assertEqual(delivered, ['he', 'hello', 'wor', 'reconnecting'])
+        self.assertEqual(bridge.stats, {'delivered': 4, 'coalesced': 2})
+        await bridge.close()
+
+    async def test_failed_send_does_not_stop_delivery(self):
+        delivered = []
+
+        async def deliver(data):
+            if data['text'] == 'bad':
+                raise ConnectionError
+            delivered.append(data['text'])
+
+        bridge = TranscriptBridge(asyncio.get_running_loop(), deliver)
+        for text in ('one', 'bad', 'two'):
+            bridge.push({'event': 'transcript', 'isFinal': True, 'text': text})
+        await asyncio.sleep(0.01)
+
+        self.assertEqual(delivered, ['one', 'two'])
+        await bridge.close()
+
+
+class AudioIngestQueueTests(SimpleTestCase):
+    async def test_one_message_is_never_dropped(self):
+        sent = []
+
+        async def sender(frame):
+            sent.append(frame)
+            await asyncio.sleep(0)
+
+        queue = AudioIngestQueue(sender, max_frames=5)
+        frames = [bytes([i]) for i in range(100)]
+        await queue.put(frames)
+        await queue.queue.join()
+
+        self.assertEqual(sent, frames)
+        self.assertEqual(queue.stats, {'enqueued': 100, 'sent': 100, 'dropped': 0})
+        await queue.close()
+
+    async def blocked_queue(self, policy):
+        sent, flow, release = [], [], asyncio.Event()
+
+        async def sender(frame):
+            await release.wait()
+            sent.append(frame)
+
+        async def on_flow_control(state):
+            flow.append(state)
+
+        queue = AudioIngestQueue(sender, max_frames=4, policy=policy, on_flow_control=on_flow_control)
+        # The sender holds frame 0 while the queue fills up behind it
+        await queue.put([b'0', b'1', b'2', b'3'])
+        await asyncio.sleep(0)
+        await queue.put([b'4'])
+        self.assertTrue(queue.queue.full())
+        return queue, sent, flow, release
+
+    async def test_drop_oldest_makes_room_from_older_audio(self):
+        queue, sent, flow, release = await self.blocked_queue('drop_oldest')
+        await queue.put([b'5', b'6'])
+        release.set()
+        await queue.queue.join()
+
+        self.assertEqual(sent, [b'0', b'3', b'4', b'5', b'6'])
+        self.assertEqual(flow, [])
+        self.assertEqual(queue.stats, {'enqueued': 7, 'sent': 5, 'dropped': 2})
+        await queue.close()
+
+    async def test_pause_drops_new_messages_until_drained(self):
+        queue, sent, flow, release = await self.blocked_queue('pause')
+        await queue.put([b'5'])
+        await queue.put([b'6'])
+        self.assertEqual(flow, ['pause'])
+
+        release.set()
+        await queue.queue.join()
+        self.assertEqual(sent, [b'0', b'1', b'2', b'3', b'4'])
+        self.assertEqual(flow, ['pause', 'resume'])
+        self.assertEqual(queue.stats, {'enqueued': 5, 'sent': 5, 'dropped': 2})
+
+        await queue.put([b'7'])
+        await queue.queue.join()
+        self.assertEqual(sent[-1], b'7')
+        await queue.close()
+
+    async def test_close_releases_a_waiting_put(self):
+        release = asyncio.Event()
+
+        async def sender(frame):
+            await release.wait()
+
+        queue = AudioIngestQueue(sender, max_frames=2)
+        put = asyncio.ensure_future(queue.put([b'a'] * 10))
+        await asyncio.sleep(0.01)
+        self.assertFalse(put.done())
+
+        await queue.close()
+        await asyncio.wait_for(put, 1)
+
+
+class BatchTranslationTests(SimpleTestCase):
+    def translate(self, texts, replies):
+        batch_chain, single_chain = mock.Mock(), mock.Mock()
+        batch_chain.invoke.side_effect = lambda data: replies(json.loads(data['sentences']))
+        single_chain.invoke.side_effect = lambda data: data['sentence'].upper()
+        with mock.patch.object(openai_service, 'get_batch_translation_chain', return_value=batch_chain), \
+                mock.patch.object(openai_service, 'get_translation_chain', return_value=single_chain):
+            result = openai_service.translate_segments(texts, 'French')
+        return result, batch_chain.invoke.call_count + single_chain.invoke.call_count
+
+    def test_pack_batches(self):
+        segments = list(enumerate(['aaaa', 'bb', 'cccccccc', 'd', 'e', 'f']))
+        batches = openai_service.pack_batches(segments, max_chars=6, max_segments=2)
+        self.assertEqual([[i for i, _ in batch] for batch in batches], [[0, 1], [2], [3, 4], [5]])
+
+    def test_aligned_reply_is_one_call(self):
+        texts = ['a', 'b', 'c', 'd']
+        result, calls = self.translate(texts, lambda batch: json.dumps([t.upper() for t in batch]))
+        self.assertEqual((result, calls), (['A', 'B', 'C', 'D'], 1))
+
+    def test_fenced_reply_is_one_call(self):
+        texts = ['a', 'b', 'c', 'd']
+        reply = lambda batch: 'Here you go:\n```json\n' + json.dumps([t.upper() for t in batch]) + '\n```'
+        result, calls = self.translate(texts, reply)
+        self.assertEqual((result, calls), (['A', 'B', 'C', 'D'], 1))
+        self.assertEqual(openai_service.parse_json_array('```json\n["x"]\n```'), ['x'])
+
+    def test_misaligned_reply_is_split(self):
+        texts = ['a', 'b', 'c', 'd']
+        # Only two-sentence batches come back aligned
+        reply = lambda batch: json.dumps([t.upper() for t in batch][:2])
+        result, calls = self.translate(texts, reply)
+        self.assertEqual((result, calls), (['A', 'B', 'C', 'D'], 3))
+
+
+    def test_batch_uses_one_cache_read_and_one_write(self):
+        cache = TranslationCache(max_entries=8)
+        cache.set('b', 'French', settings.OPENAI_TRANSLATION_MODEL, 'B-cached')
+        shared = mock.Mock()
+        shared.get_many.return_value = {}
+        with mock.patch.object(TranslationCache, 'shared', shared), \
+                mock.patch.object(openai_service, 'translation_cache', cache), \
+                mock.patch.object(openai_service, 'translate_segments',
+                                  side_effect=lambda texts, language: [t.upper() for t in texts]):
+            result = openai_service.translate_batch(['a', 'b', ' ', 'c'], 'French')
+
+        self.assertEqual(result, ['A', 'B-cached', ' ', 'C'])
+        shared.get_many.assert_called_once()
+        self.assertEqual(len(shared.get_many.call_args.args[0]), 2)
+        shared.set_many.assert_called_once()
+        self.assertEqual(sorted(shared.set_many.call_args.args[0].values()), ['A', 'C'])
+        shared.get.assert_not_called()
+
+class FakeTranslationChain:
+    def __init__(self, tokens, error=None):
+        self.tokens = tokens
+        self.error = error
+
+    async def astream(self, data):
+        for token in self.tokens:
+            await asyncio.sleep(0)
+            yield token
+        if self.error:
+            raise self.error
+
+
+@mock.patch('api.views.record_usage')
+class StreamingTranslationTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('reader', 'reader@example.com', 'pw')
+        # Served over ASGI, so the view and the stream share one event loop
+        self.async_client.force_login(self.user)
+        cache = mock.Mock(aget=mock.AsyncMock(return_value=None), aset=mock.AsyncMock())
+        patcher = mock.patch.object(openai_service, 'translation_cache', cache)
+        self.cache = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def post(self, chain):
+        with mock.patch.object(openai_service, 'get_translation_chain', return_value=chain):
+            response = await self.async_client.post(
+                reverse('translate'),
+                json.dumps({'text': 'Good morning', 'language': 'French', 'stream': True}),
+                content_type='application/json',
+            )
+            if not response.streaming:
+                return response, None
+            return response, [chunk async for chunk in response.streaming_content]
+
+    async def test_tokens_stream_in_order(self, record_usage):
+        response, chunks = await self.post(FakeTranslationChain(['Bon', 'jour', ' !']))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(chunks, [b'Bon', b'jour', b' !'])
+        record_usage.assert_called_once_with(self.user.pk, 'translation', character_count=12)
+        self.assertEqual(self.cache.aset.call_args.args[-1], 'Bonjour !')
+
+    async def test_failure_before_the_first_token_is_a_json_error(self, record_usage):
+        response, chunks = await self.post(FakeTranslationChain([], error=RuntimeError('model down')))
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.json(), {'error': 'model down'})
+        record_usage.assert_not_called()
+
+
+class MultiLanguageTranslationTests(SimpleTestCase):
+    def test_validate_languages(self):
+        self.assertEqual(
+            openai_service.validate_languages(['French', 'German', 'French']), ['French', 'German']
+        )
+        for languages, message in (
+            ([], 'non-empty list'),
+            ('French', 'non-empty list'),
+            (['French', 'Klingon'], 'Unsupported languages: Klingon'),
+        ):
+            with self.assertRaisesMessage(ValueError, message):
+                openai_service.validate_languages(languages)
+
+        with self.settings(TRANSLATION_MAX_TARGET_LANGUAGES=2):
+            with self.assertRaisesMessage(ValueError, 'At most 2 target languages'):
+                openai_service.validate_languages(['French', 'German', 'Spanish'])
+            # Duplicates do not count against the limit
+            openai_service.validate_languages(['French', 'German', 'German'])
+
+    def test_failed_language_does_not_fail_the_others(self):
+        def translate_text(text, language):
+            if language == 'German':
+                raise RuntimeError('rate limited')
+            return f"{text} ({language})"
+
+        with mock.patch.object(openai_service, 'translate_text', side_effect=translate_text):
+            result = openai_service.translate_multi('Hi', ['French', 'German', 'Spanish'])
+        self.assertEqual(result, {
+            'French': {'translation': 'Hi (French)'},
+            'German': {'error': 'rate limited'},
+            'Spanish': {'translation': 'Hi (Spanish)'},
+        })
+
+    def test_languages_translate_concurrently(self):
+        languages = ['French', 'German', 'Spanish', 'Italian']
+        lock, active, peak = threading.Lock(), [0], [0]
+
+        def translate_text(text, language):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            return language
+
+        with mock.patch.object(openai_service, 'translate_text', side_effect=translate_text), \
+                self.settings(TRANSLATION_FANOUT_CONCURRENCY=4):
+            result = openai_service.translate_multi('Hi', languages)
+        self.assertEqual(list(result), languages)
+        self.assertEqual(peak[0], 4)
+
+        peak[0] = 0
+        with mock.patch.object(openai_service, 'translate_text', side_effect=translate_text), \
+                self.settings(TRANSLATION_FANOUT_CONCURRENCY=2):
+            openai_service.translate_multi('Hi', languages)
+        self.assertEqual(peak[0], 2)
+
+
+class TranslationCacheTests(SimpleTestCase):
+    def test_lru_evicts_least_recently_used(self):
+        shared = mock.Mock()
+        shared.get.return_value = None
+        cache = TranslationCache(max_entries=2)
+
+        with mock.patch.object(TranslationCache, 'shared', shared):
+            cache.set('one', 'French', 'm', 'un')
+            cache.set('two', 'French', 'm', 'deux')
+            # Reading 'one' makes 'two' the least recently used
+            self.assertEqual(cache.get(' one ', 'french', 'm'), 'un')
+            cache.set('three', 'French', 'm', 'trois')
+
+            self.assertIsNone(cache.get('two', 'French', 'm'))
+            self.assertEqual(cache.get('three', 'French', 'm'), 'trois')
+            self.assertIsNone(cache.get('one', 'German', 'm'))
+
+        self.assertEqual(cache.stats(), {
+            'memory_hits': 2, 'shared_hits': 0, 'misses': 2,
+            'evictions': 1, 'shared_errors': 0, 'memory_entries': 2,
+        })
+
+    def test_shared_hits_fill_the_lru(self):
+        shared = mock.Mock()
+        shared.get.return_value = 'bonjour'
+        cache = TranslationCache(max_entries=2)
+
+        with mock.patch.object(TranslationCache, 'shared', shared):
+            self.assertEqual(cache.get('hello', 'French', 'm'), 'bonjour')
+            self.assertEqual(cache.get('hello', 'French', 'm'), 'bonjour')
+
+        self.assertEqual(shared.get.call_count, 1)
+        stats = cache.stats()
+        self.assertEqual((stats['shared_hits'], stats['memory_hits']), (1, 1))
+
+    def test_shared_tier_errors_are_misses(self):
+        broken = mock.Mock()
+        broken.get.side_effect = broken.set.side_effect = RuntimeError('no such table')
+        broken.aget.side_effect = broken.aset.side_effect = RuntimeError('no such table')
+        cache = TranslationCache(max_entries=4)
+
+        with mock.patch.object(TranslationCache, 'shared', broken):
+            self.assertIsNone(cache.get('Hello', 'French', 'm'))
+            cache.set('Hello', 'French', 'm', 'Bonjour')
+            self.assertEqual(cache.get('Hello', 'French', 'm'), 'Bonjour')
+            self.assertIsNone(asyncio.run(cache.aget('Bye', 'French', 'm')))
+            asyncio.run(cache.aset('Bye', 'French', 'm', 'Au revoir'))
+
+        stats = cache.stats()
+        self.assertEqual((stats['shared_errors'], stats['misses'], stats['memory_hits']), (4, 2, 1))
+
+
+    def test_get_many_reads_the_shared_tier_once(self):
+        shared = mock.Mock()
+        cache = TranslationCache(max_entries=8)
+
+        with mock.patch.object(TranslationCache, 'shared', shared):
+            cache.set('one', 'French', 'm', 'un')
+            shared.get_many.side_effect = lambda keys: {keys[0]: 'deux'}
+            found = cache.get_many(['one', 'two', ' two', 'three'], 'French', 'm')
+            self.assertEqual(found, {'one': 'un', 'two': 'deux', ' two': 'deux'})
+
+            cache.set_many({'three': 'trois', 'four': 'quatre'}, 'French', 'm')
+            self.assertEqual(cache.get_many(['three', 'four'], 'French', 'm'), {'three': 'trois', 'four': 'quatre'})
+
+            shared.get_many.side_effect = RuntimeError('no such table')
+            self.assertEqual(cache.get_many(['five'], 'French', 'm'), {})
+
+        self.assertEqual(shared.get_many.call_count, 2)
+        self.assertEqual(len(shared.set_many.call_args.args[0]), 2)
+        stats = cache.stats()
+        self.assertEqual(
+            (stats['memory_hits'], stats['shared_hits'], stats['misses'], stats['shared_errors']), (3, 1, 2, 1)
+        )
+
+class ClosableTranscriber:
+    def __init__(self):
+        self.connected = False
+        self.closed = False
+
+        self.audio = []
+
+    def connect(self):
+        self.connected = True
+
+    def stream(self, data):
+        self.audio.append(data)
+
+    def close(self):
+        self.closed = True
+
+
+class TranscriptionConsumerTests(SimpleTestCase):
+    def make_consumer(self):
+        consumer = TranscriptionConsumer()
+        consumer.scope = {}
+        consumer.user = mock.Mock(pk=7)
+        consumer.channel_name = 'consumer'
+        for name in ('session_id', 'transcriber', 'audio_queue', 'audio_stage', 'vad', 'framer',
+                     'transcript_bridge', 'pipeline', 'room', 'room_subscriptions',
+                     'quota_meter', 'quota_cutoff'):
+            setattr(consumer, name, None)
+        consumer.unmetered_bytes = 0
+        consumer.sent = []
+
+        async def send(text_data):
+            consumer.sent.append(json.loads(text_data))
+
+        consumer.send = send
+        return consumer
+
+    @mock.patch('api.consumers.record_usage')
+    def test_streamed_translation_deltas_precede_the_translation(self, record_usage):
+        async def astream_translation(text, language):
+            for token in ('Bon', 'jour'):
+                await asyncio.sleep(0)
+                yield token
+
+        consumer = self.make_consumer()
+
+        async def scenario():
+            consumer.start_pipeline(['French'], speak=False, streaming=True)
+            consumer.pipeline.submit('Good morning')
+            await asyncio.sleep(0.01)
+            await consumer.pipeline.close()
+
+        with mock.patch('api.consumers.astream_translation', astream_translation):
+            asyncio.run(scenario())
+
+        self.assertEqual(
+            [(m['type'], m.get('delta', m.get('translation'))) for m in consumer.sent],
+            [('translation_delta', 'Bon'), ('translation_delta', 'jour'), ('translation', 'Bonjour')]
+        )
+        self.assertEqual({m['utterance'] for m in consumer.sent}, {1})
+        record_usage.assert_called_once_with(7, 'translation', character_count=12)
+
+    def run_scenario(self, scenario):
+        built = []
+
+        def build_transcriber(callback):
+            transcriber = ClosableTranscriber()
+            built.append(transcriber)
+            return transcriber
+
+        manager = TranscriptionSessionManager(LocalSessionRegistry())
+        with mock.patch('api.services.assemblyai_service.session_manager', manager), \
+                mock.patch('api.services.assemblyai_service.build_transcriber', build_transcriber), \
+                mock.patch.object(quota_meters, '_read_quota', lambda user_id: 3600), \
+                self.settings(TRANSCRIPTION_SAMPLE_RATE=16000, TRANSCRIPTION_FRAME_MS=100):
+            asyncio.run(scenario(manager))
+        return manager, built
+
+    start = {'audioFormat': {'encoding': 'pcm16', 'sampleRate': 16000}, 'vad': False}
+
+    @mock.patch('api.services.quota_meter.record_usage')
+    def test_start_stream_and_stop(self, record_usage):
+        consumer = self.make_consumer()
+        pcm = to_pcm16_bytes(tone(440, 16000, seconds=0.3))
+
+        async def scenario(manager):
+            await consumer.start_transcription(self.start)
+            self.assertEqual(consumer.sent[-1]['type'], 'session_started')
+            self.assertIn(consumer.session_id, manager.sessions)
+
+            await consumer.process_audio(pcm)
+            await consumer.audio_queue.queue.join()
+            await consumer.stop_transcription()
+
+        manager, built = self.run_scenario(scenario)
+        transcriber, = built
+        self.assertTrue(transcriber.connected and transcriber.closed)
+        self.assertEqual(b''.join(transcriber.audio), pcm)
+        self.assertEqual(consumer.sent[-1]['type'], 'session_stopped')
+        self.assertEqual(manager.sessions, {})
+        self.assertEqual(record_usage.call_args.kwargs['audio_duration_seconds'], 0.3)
+        self.assertNotIn(7, quota_meters.meters)
+
+    @mock.patch('api.services.quota_meter.record_usage')
+    def test_second_start_is_rejected(self, record_usage):
+        consumer = self.make_consumer()
+
+        async def scenario(manager):
+            await consumer.start_transcription(self.start)
+            queue, session_id = consumer.audio_queue, consumer.session_id
+            await consumer.start_transcription(self.start)
+            self.assertEqual(consumer.sent[-1]['type'], 'error')
+            self.assertEqual((consumer.audio_queue, consumer.session_id), (queue, session_id))
+            self.assertEqual(list(manager.sessions), [session_id])
+            self.assertEqual(quota_meters.meters[7].sessions, 1)
+            await consumer.stop_transcription()
+
+        manager, built = self.run_scenario(scenario)
+        self.assertEqual(len(built), 1)
+
+    @mock.patch('api.services.quota_meter.record_usage')
+    @mock.patch('api.consumers.AudioIngestQueue', side_effect=RuntimeError('boom'))
+    def test_failed_start_is_undone(self, queue, record_usage):
+        consumer = self.make_consumer()
+
+        async def scenario(manager):
+            await consumer.start_transcription(self.start)
+            self.assertEqual(consumer.sent[-1], {'type': 'error', 'message': 'boom'})
+            self.assertIsNone(consumer.session_id)
+            self.assertEqual(manager.sessions, {})
+
+        manager, built = self.run_scenario(scenario)
+        self.assertTrue(built[0].closed)
+        self.assertIsNone(consumer.transcript_bridge)
+        self.assertNotIn(7, quota_meters.meters)
+
+
+class SessionManagerTests(SimpleTestCase):
+    def make_manager(self, **options):
+        built = []
+
+        def build(callback):
+            transcriber = ClosableTranscriber()
+            built.append(transcriber)
+            return transcriber
+
+        patcher = mock.patch('api.services.assemblyai_service.build_transcriber', build)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return TranscriptionSessionManager(LocalSessionRegistry(), **options), built
+
+    async def test_sessions_are_capped(self):
+        manager, built = self.make_manager(max_sessions=2)
+        first = await manager.create_session()
+        await manager.create_session()
+        with self.assertRaisesMessage(ValueError, 'Too many active transcription sessions'):
+            await manager.create_session()
+        self.assertEqual(len(built), 2)
+
+        await manager.close_session(first)
+        await manager.create_session()
+        self.assertEqual(len(manager.sessions), 2)
+        manager.maintenance_task.cancel()
+
+    async def test_state_counts_cover_every_state(self):
+        manager, built = self.make_manager()
+        await manager.create_session()
+        reconnecting = await manager.create_session()
+        await manager._set_status(reconnecting, 'reconnecting')
+
+        self.assertEqual(await manager.state_counts(), {
+            'initialized': 0, 'connecting': 0, 'connected': 1, 'reconnecting': 1, 'error': 0,
+        })
+        manager.maintenance_task.cancel()
+
+    async def test_failed_registration_closes_the_transcriber(self):
+        manager, built = self.make_manager()
+        manager.registry.register = mock.AsyncMock(side_effect=RuntimeError('database down'))
+        with self.assertRaises(RuntimeError):
+            await manager.create_session()
+        await asyncio.sleep(0.01)
+
+        self.assertEqual(manager.sessions, {})
+        self.assertTrue(built[0].closed)
+
+
+class DatabaseSessionRegistryTests(TestCase):
+    def setUp(self):
+        self.registry = DatabaseSessionRegistry(owner='worker-a', lease_seconds=30)
+
+    async def expire(self, session_id):
+        await TranscriptionSession.objects.filter(session_id=session_id).aupdate(
+            lease_expires=timezone.now() - timedelta(seconds=1)
+        )
+
+    async def test_register_and_lease_expiry(self):
+        await self.registry.register('s1', route='channel-1')
+        await self.registry.set_status('s1', 'connected')
+        self.assertEqual(await self.registry.get('s1'), {
+            'session_id': 's1', 'owner': 'worker-a', 'route': 'channel-1',
+            'user_id': None, 'status': 'connected',
+        })
+
+        await self.expire('s1')
+        self.assertIsNone(await self.registry.get('s1'))
+        self.assertEqual(await self.registry.state_counts(), {})
+
+    async def test_heartbeat_renews_only_own_sessions(self):
+        other = DatabaseSessionRegistry(owner='worker-b', lease_seconds=30)
+        await self.registry.register('mine')
+        await other.register('theirs')
+        await self.expire('mine')
+        await self.expire('theirs')
+
+        await self.registry.heartbeat(['mine', 'theirs'])
+        self.assertIsNotNone(await self.registry.get('mine'))
+        self.assertIsNone(await self.registry.get('theirs'))
+
+    async def test_find_session_reports_the_owner_route(self):
+        other_worker = DatabaseSessionRegistry(owner='worker-b')
+        await other_worker.register('remote', status='connected', route='channel-b')
+        manager = TranscriptionSessionManager(self.registry)
+
+        record = await manager.find_session('remote')
+        self.assertEqual((record['owner'], record['route']), ('worker-b', 'channel-b'))
+        self.assertIsNone(await manager.find_session('unknown'))
+
+    async def test_staff_report_counts_registered_sessions(self):
+        await self.registry.register('s1', status='connected')
+        staff = await get_user_model().objects.acreate(username='ops', email='ops@example.com', is_staff=True)
+        await self.async_client.aforce_login(staff)
+
+        manager = TranscriptionSessionManager(self.registry)
+        with mock.patch('api.services.assemblyai_service.session_manager', manager):
+            response = await self.async_client.get(reverse('transcription-sessions'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['sessions']['connected'], 1)
+
+    async def test_purge_removes_expired_sessions(self):
+        for session_id in ('live', 'dead-1', 'dead-2'):
+            await self.registry.register(session_id)
+        await self.expire('dead-1')
+        await self.expire('dead-2')
+
+        self.assertEqual(await self.registry.purge_expired(), 2)
+        self.assertEqual(await self.registry.state_counts(), {'initialized': 1})
+        self.assertEqual(
+            [session_id async for session_id in TranscriptionSession.objects.values_list('session_id', flat=True)],
+            ['live']
+        )
+
+
+class SessionReaperTests(SimpleTestCase):
+    async def open_session(self, manager, session_id, age=0, idle=0, **hooks):
+        now = time.monotonic()
+        manager.sessions[session_id] = {
+            'transcriber': ClosableTranscriber(),
+            'status': 'connected',
+            'created': now - age,
+            'last_audio': now - idle,
+            'attached': None,
+            'buffered': None,
+            'on_reaped': None,
+            **hooks,
+        }
+        await manager.registry.register(session_id)
+        return manager.sessions[session_id]['transcriber']
+
+    async def test_sessions_over_limits_are_reaped(self):
+        manager = TranscriptionSessionManager(
+            LocalSessionRegistry(), idle_timeout=60, max_duration=3600, max_buffered_bytes=1000
+        )
+        notified = []
+
+        async def on_reaped(session_id, reason):
+            notified.append((session_id, reason))
+
+        kept = await self.open_session(manager, 'ok', age=100, idle=1)
+        idle = await self.open_session(manager, 'idle', idle=120, on_reaped=on_reaped)
+        old = await self.open_session(manager, 'old', age=7200)
+        await self.open_session(manager, 'full', buffered=lambda: 5000)
+        await self.open_session(manager, 'leak', attached=lambda session_id: False, on_reaped=on_reaped)
+
+        reaped = await manager.reap()
+
+        self.assertEqual(reaped, {
+            'idle': 'idle', 'old': 'max_duration', 'full': 'max_buffered_bytes', 'leak': 'leaked'
+        })
+        self.assertTrue(idle.closed and old.closed)
+        self.assertFalse(kept.closed)
+        self.assertEqual(list(manager.sessions), ['ok'])
+        self.assertIsNone(await manager.registry.get('idle'))
+        self.assertEqual(notified, [('idle', 'idle')])
+
+        stats = manager.lifecycle_stats()
+        self.assertEqual(stats['reaped'], {'idle': 1, 'max_duration': 1, 'max_buffered_bytes': 1})
+        self.assertEqual((stats['leaked'], stats['closed'], stats['live']), (1, 0, 1))
+
+    async def test_closed_session_is_counted_once(self):
+        manager = TranscriptionSessionManager(LocalSessionRegistry())
+        transcriber = await self.open_session(manager, 'a')
+        await manager.close_session('a')
+        self.assertTrue(transcriber.closed)
+        self.assertEqual(manager.lifecycle_stats()['closed'], 1)
+        with self.assertRaises(ValueError):
+            await manager.close_session('a')
+
+
+class TranscriberPoolTests(SimpleTestCase):
+    def make_pool(self, **options):
+        built = []
+
+        def factory():
+            transcriber = ClosableTranscriber()
+            built.append(transcriber)
+            return transcriber, CallbackSlot()
+
+        return TranscriberPool(factory, **options), built
+
+    async def test_pool_follows_demand(self):
+        pool, built = self.make_pool(max_size=4, horizon=60, demand_window=60)
+        self.assertEqual(pool.target_size(), 0)
+
+        self.assertIsNone(pool.claim(print))
+        await pool.refill()
+        self.assertEqual(len(pool.idle), 1)
+        self.assertTrue(built[0].connected)
+
+        self.assertIs(pool.claim(print), built[0])
+        self.assertEqual(pool.summary()['claimed'], 1)
+        await pool.close()
+
+    async def test_occasional_starts_do_not_warm_connections(self):
+        pool, built = self.make_pool(max_size=4, horizon=10, demand_window=300)
+        now = time.monotonic()
+        pool.starts.extend([now] * 14)
+        self.assertEqual(pool.target_size(now), 0)
+
+        pool.starts.append(now)
+        self.assertEqual(pool.target_size(now), 1)
+
+        # An explicit minimum is kept warm without any demand
+        pool.min_size = 1
+        pool.starts.clear()
+        self.assertEqual(pool.target_size(now), 1)
+
+    async def test_claimer_sees_connected_event(self):
+        slot = CallbackSlot()
+        slot({'event': 'connected', 'sessionId': 'upstream'})
+        received = []
+        slot.attach(received.append)
+        slot({'event': 'transcript', 'text': 'hi', 'isFinal': True})
+        self.assertEqual([event['event'] for event in received], ['connected', 'transcript'])
+
+    async def test_stale_connections_are_recycled(self):
+        pool, built = self.make_pool(min_size=1, max_idle=30, refill_interval=2)
+        await pool.refill()
+        transcriber, slot, connected_at = pool.idle[0]
+        pool.idle[0] = (transcriber, slot, connected_at - 29)
+
+        await pool.refill()
+        self.assertEqual(len(pool.idle), 1)
+        self.assertIsNot(pool.idle[0][0], built[0])
+        self.assertEqual(pool.summary()['recycled'], 1)
+        await pool.close()
+
+
+class SessionRecoveryTests(SimpleTestCase):
+    def test_backoff_doubles_up_to_maximum(self):
+        self.assertEqual(backoff_delays(6, base=0.5, maximum=8), [0.5, 1, 2, 4, 8, 8])
+
+    def test_replay_buffer_keeps_latest_bytes_in_order(self):
+        ring = AudioReplayBuffer(10)
+        ring.write(b'abcdef')
+        ring.write(b'ghij')
+        ring.write(b'klm')
+        self.assertEqual(ring.snapshot(), b'defghijklm')
+        ring.write(b'0123456789ABC')
+        self.assertEqual(ring.snapshot(), b'3456789ABC')
+
+    def test_overlap_filter_trims_repeated_words(self):
+        overlap = TranscriptOverlapFilter()
+        overlap.process({'text': 'Hello there, how are you?', 'isFinal': True})
+        overlap.arm()
+
+        self.assertIsNone(overlap.process({'text': 'how are', 'isFinal': False}))
+        self.assertIsNone(overlap.process({'text': 'How are you', 'isFinal': True}))
+        trimmed = overlap.process({'text': 'are you? I am fine', 'isFinal': True})
+        self.assertEqual(trimmed['text'], 'I am fine')
+
+        # Filtering stops after the first final with new text
+        self.assertEqual(overlap.process({'text': 'fine thanks', 'isFinal': True})['text'], 'fine thanks')
+        self.assertFalse(overlap.active)
+
+    async def test_dropped_connection_reconnects_and_replays_audio(self):
+        def factory():
+            return ClosableTranscriber(), CallbackSlot()
+
+        pool = TranscriberPool(factory, min_size=2, max_size=2)
+        await pool.refill()
+        manager = TranscriptionSessionManager(
+            LocalSessionRegistry(), pool=pool, replay_bytes=8, reconnect_delays=(0,)
+        )
+        events = []
+        session_id = await manager.create_session(callback=events.append)
+        session = manager.sessions[session_id]
+        first = session['transcriber']
+
+        manager.send_audio(session_id, b'abcdef')
+        handler = manager._event_handler(session_id, session, 0)
+        handler({'event': 'error', 'error': 'socket closed'})
+        handler({'event': 'disconnected'})
+        manager.send_audio(session_id, b'ghij')
+
+        await asyncio.sleep(0)
+        await session['reconnect_task']
+
+        second = session['transcriber']
+        self.assertIsNot(second, first)
+        self.assertEqual(session['status'], 'connected')
+        self.assertEqual(second.audio, [b'cdefghij'])
+        self.assertEqual([event['event'] for event in events], ['reconnecting'])
+        self.assertEqual(manager.lifecycle_stats()['reconnects'], 1)
+
+        await manager.close_session(session_id)
+        manager.maintenance_task.cancel()
+        await pool.close()
+
+    async def test_failed_reconnect_closes_the_session(self):
+        built = []
+
+        def build(callback):
+            transcriber = ClosableTranscriber()
+            built.append(transcriber)
+            if len(built) > 1:
+                transcriber.connect = mock.Mock(side_effect=ConnectionError)
+            return transcriber
+
+        reaped = []
+
+        async def on_reaped(session_id, reason):
+            reaped.append((session_id, reason))
+
+        manager = TranscriptionSessionManager(LocalSessionRegistry(), reconnect_delays=(0, 0))
+        with mock.patch('api.services.assemblyai_service.build_transcriber', build):
+            session_id = await manager.create_session(on_reaped=on_reaped)
+            session = manager.sessions[session_id]
+            manager._event_handler(session_id, session, 0)({'event': 'disconnected'})
+            await asyncio.sleep(0)
+            await session['reconnect_task']
+
+        self.assertEqual(reaped, [(session_id, 'reconnect_failed')])
+        self.assertNotIn(session_id, manager.sessions)
+        self.assertIsNone(await manager.find_session(session_id))
+        self.assertTrue(built[0].closed)
+        stats = manager.lifecycle_stats()
+        self.assertEqual((stats['reconnect_failures'], stats['closed']), (1, 1))
+        manager.maintenance_task.cancel()
+
+
+    async def test_cancelled_reconnect_closes_the_new_connection(self):
+        built, connecting, release = [], threading.Event(), threading.Event()
+
+        def build(callback):
+            transcriber = ClosableTranscriber()
+            built.append(transcriber)
+            if len(built) > 1:
+                def connect():
+                    connecting.set()
+                    release.wait(5)
+                    transcriber.connected = True
+
+                transcriber.connect = connect
+            return transcriber
+
+        manager = TranscriptionSessionManager(LocalSessionRegistry(), reconnect_delays=(0,))
+        with mock.patch('api.services.assemblyai_service.build_transcriber', build):
+            session_id = await manager.create_session()
+            session = manager.sessions[session_id]
+            manager._event_handler(session_id, session, 0)({'event': 'disconnected'})
+            await asyncio.sleep(0)
+            reconnect = session['reconnect_task']
+            await asyncio.get_running_loop().run_in_executor(None, connecting.wait, 5)
+
+            # Closing the session cancels the reconnect mid-handshake
+            await manager.close_session(session_id)
+            self.assertTrue(reconnect.cancelled() or reconnect.done())
+            replacement = built[1]
+            self.assertFalse(replacement.closed)
+
+            release.set()
+            for _ in range(100):
+                if replacement.closed:
+                    break
+                await asyncio.sleep(0.01)
+
+        self.assertTrue(replacement.connected and replacement.closed)
+        manager.maintenance_task.cancel()
+
+
+class TranslationPipelineTests(SimpleTestCase):
+    async def test_results_keep_submission_order_per_language(self):
+        # Later utterances finish first; German is slower than French
+        delays = {'one': 0.04, 'two': 0.02, 'three': 0.0}
+
+        async def translate(text, language):
+            await asyncio.sleep(delays[text] * (2 if language == 'German' else 1))
+            if text == 'two':
+                raise RuntimeError('translation failed')
+            return f"{text} ({language})"
+
+        async def synthesize(text):
+            if text == 'three (German)':
+                raise RuntimeError('synthesis failed')
+            return text.encode()
+
+        delivered = []
+
+        async def deliver(message):
+            delivered.append(message)
+
+        pipeline = TranslationPipeline(translate, synthesize, deliver, ['French', 'German'])
+        for text in ('one', 'two', 'three'):
+            pipeline.submit(text)
+        await asyncio.sleep(0.2)
+        await pipeline.close()
+
+        def sent(language, *types):
+            return [
+                (m['type'], m['utterance']) for m in delivered
+                if m['language'] == language and m['type'] in types
+            ]
+
+        self.assertEqual(
+            sent('French', 'translation', 'error'),
+            [('translation', 1), ('error', 2), ('translation', 3)]
+        )
+        self.assertEqual(
+            sent('French', 'translation_audio'),
+            [('translation_audio', 1), ('translation_audio', 3)]
+        )
+        self.assertEqual(sent('German', 'translation'), [('translation', 1), ('translation', 3)])
+        self.assertEqual(sent('German', 'translation_audio'), [('translation_audio', 1)])
+        self.assertEqual(sent('German', 'error'), [('error', 2), ('error', 3)])
+
+        # French was delivered without waiting for German
+        first_german = next(i for i, m in enumerate(delivered) if m['language'] == 'German')
+        self.assertEqual(delivered[first_german - 1]['language'], 'French')
+
+    async def test_utterance_fans_out_to_every_language_at_once(self):
+        languages = ['French', 'German', 'Spanish', 'Italian', 'Dutch', 'Polish', 'Greek', 'Czech']
+        active, peak = [0], [0]
+
+        async def translate(text, language):
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+            await asyncio.sleep(0.05)
+            active[0] -= 1
+            return text
+
+        async def deliver(message):
+            delivered.append(message)
+
+        delivered = []
+        pipeline = TranslationPipeline(translate, None, deliver, languages, max_in_flight=4)
+        pipeline.submit('Hello')
+        while len(delivered) < 8:
+            await asyncio.sleep(0.005)
+
+        # One round, not two rounds of four
+        self.assertEqual(peak[0], 8)
+        await pipeline.close()
+
+    async def test_in_flight_limit_counts_utterances(self):
+        active, peak = set(), [0]
+
+        async def translate(text, language):
+            active.add(text)
+            peak[0] = max(peak[0], len(active))
+            await asyncio.sleep(0.02)
+            active.discard(text)
+            return text
+
+        async def deliver(message):
+            delivered.append((message['language'], message['translation']))
+
+        delivered = []
+        pipeline = TranslationPipeline(
+            translate, None, deliver, ['French', 'German', 'Spanish'],
+            max_in_flight=2, fanout_concurrency=2,
+        )
+        for text in ('one', 'two', 'three', 'four'):
+            pipeline.submit(text)
+        while len(delivered) < 12:
+            await asyncio.sleep(0.005)
+
+        self.assertEqual(peak[0], 2)
+        for language in ('French', 'German', 'Spanish'):
+            self.assertEqual(
+                [text for target, text in delivered if target == language],
+                ['one', 'two', 'three', 'four']
+            )
+        await pipeline.close()
+
+    async def test_failed_send_does_not_stop_delivery(self):
+        async def translate(text, language):
+            return text
+
+        delivered = []
+
+        async def deliver(message):
+            if message['utterance'] == 1:
+                raise ConnectionError
+            delivered.append(message['utterance'])
+
+        pipeline = TranslationPipeline(translate, None, deliver, ['French'])
+        pipeline.submit('one')
+        pipeline.submit('two')
+        await asyncio.sleep(0.01)
+        await pipeline.close()
+        self.assertEqual(delivered, [2])
+
+
+class Listener:
+    is_anonymous = False
+
+
+class RoomTests(SimpleTestCase):
+    async def test_each_language_is_translated_once_per_utterance(self):
+        calls = []
+
+        async def translate(text, language):
+            calls.append(language)
+            return f"{text} ({language})"
+
+        delivered = []
+
+        async def deliver(message):
+            delivered.append(message)
+
+        pipeline = TranslationPipeline(translate, None, deliver, [])
+        subscriptions = RoomSubscriptions()
+        languages = ['French', 'German', 'Spanish']
+        for i in range(200):
+            added, dropped = subscriptions.subscribe(f"listener-{i}", languages[i % 3])
+            if added:
+                pipeline.add_language(added)
+
+        pipeline.submit('Hello')
+        await asyncio.sleep(0.01)
+        self.assertEqual(sorted(calls), languages)
+        self.assertEqual(len(delivered), 3)
+
+        # The last German listener switching away stops German translation
+        for i in range(1, 200, 3):
+            added, dropped = subscriptions.subscribe(f"listener-{i}", 'French')
+            if dropped:
+                pipeline.remove_language(dropped)
+        self.assertEqual(subscriptions.counts(), {'French': 134, 'Spanish': 66})
+        self.assertEqual(sorted(pipeline.languages), ['French', 'Spanish'])
+        await pipeline.close()
+
+    async def test_removed_language_cancels_in_flight_stages(self):
+        started, finished = [], []
+
+        async def translate(text, language):
+            started.append(language)
+            await asyncio.sleep(0.05)
+            finished.append(language)
+            return text
+
+        async def deliver(message):
+            pass
+
+        pipeline = TranslationPipeline(translate, None, deliver, ['French', 'German'])
+        pipeline.submit('Hello')
+        await asyncio.sleep(0.01)
+        self.assertEqual(sorted(started), ['French', 'German'])
+
+        german = list(pipeline.language_stages['German'])
+        pipeline.remove_language('German')
+        await asyncio.gather(*german, return_exceptions=True)
+        self.assertTrue(all(task.cancelled() for task in german))
+
+        await asyncio.sleep(0.1)
+        self.assertEqual(finished, ['French'])
+        await pipeline.close()
+
+    async def test_listener_subscription_reaches_speakers(self):
+        layer = get_channel_layer()
+        speaker = await layer.new_channel()
+        await layer.group_add(speakers_group('demo'), speaker)
+
+        listener = RoomConsumer()
+        listener.channel_layer = layer
+        listener.channel_name = await layer.new_channel()
+        listener.room = 'demo'
+        listener.language = None
+        sent = []
+
+        async def send(text_data):
+            sent.append(json.loads(text_data))
+
+        listener.send = send
+
+        await listener.subscribe('French')
+        self.assertEqual(sent, [{'type': 'subscribed', 'language': 'French'}])
+        event = await layer.receive(speaker)
+        self.assertEqual((event['type'], event['language']), ('room.subscribe', 'French'))
+
+        # A speaker joining later gets the subscription repeated
+        await listener.room_hello({'type': 'room.hello'})
+        self.assertEqual((await layer.receive(speaker))['channel'], listener.channel_name)
+
+        await layer.group_send(language_group('demo', 'French'), {
+            'type': 'room.message',
+            'message': {'type': 'translation', 'language': 'French', 'translation': 'Bonjour'},
+        })
+        await listener.room_message(await layer.receive(listener.channel_name))
+        self.assertEqual(sent[-1]['translation'], 'Bonjour')
+
+        await listener.unsubscribe()
+        self.assertEqual((await layer.receive(speaker))['type'], 'room.unsubscribe')
+
+
+class UsageRecorderTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('usage', 'usage@example.com', 'pw')
+        self.recorder = UsageRecorder(max_batch=3, flush_interval=60)
+        # Flushes are driven by the test, not the background thread
+        self.recorder._ensure_thread = lambda: None
+
+    def test_records_are_buffered_until_flush(self):
+        self.recorder.record(self.user.pk, 'translation', character_count=1000)
+        self.recorder.record(self.user.pk, 'speech_to_text', audio_duration_seconds=10)
+        self.assertEqual(UsageRecord.objects.count(), 0)
+
+        self.assertEqual(self.recorder.flush(), 2)
+        self.assertEqual(UsageRecord.objects.count(), 2)
+        self.assertEqual(self.recorder.pending(), 0)
+        self.assertEqual(
+            UsageRecord.objects.get(service_type='translation').cost,
+            usage_cost('translation', character_count=1000),
+        )
+
+    def test_full_buffer_wakes_the_flusher(self):
+        for _ in range(2):
+            self.recorder.record(self.user.pk, 'translation', character_count=1)
+        self.assertFalse(self.recorder.wakeup.is_set())
+        self.recorder.record(self.user.pk, 'translation', character_count=1)
+        self.assertTrue(self.recorder.wakeup.is_set())
+
+    def test_failed_flush_keeps_records(self):
+        self.recorder.record(self.user.pk, 'text_to_speech', character_count=5)
+        with mock.patch.object(UsageRecord.objects, 'bulk_create', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.recorder.flush()
+        self.assertEqual(self.recorder.pending(), 1)
+        self.assertEqual(self.recorder.stats['failed_flushes'], 1)
+
+        self.assertEqual(self.recorder.flush(), 1)
+        self.assertEqual(UsageRecord.objects.count(), 1)
+
+    def test_rejected_row_does_not_block_the_batch(self):
+        for count in (1, 666, 3):
+            self.recorder.record(self.user.pk, 'translation', character_count=count)
+        bulk_create = UsageRecord.objects.bulk_create
+
+        def reject_bad_rows(rows, **kwargs):
+            if any(row.character_count == 666 for row in rows):
+                raise IntegrityError('bad row')
+            return bulk_create(rows, **kwargs)
+
+        with mock.patch.object(UsageRecord.objects, 'bulk_create', side_effect=reject_bad_rows):
+            self.assertEqual(self.recorder.flush(), 2)
+        self.assertEqual(
+            sorted(UsageRecord.objects.values_list('character_count', flat=True)), [1, 3]
+        )
+        self.assertEqual(self.recorder.pending(), 0)
+        self.assertEqual(self.recorder.stats['rejected'], 1)
+        self.assertEqual(usage_totals(self.user.pk)['translation']['records'], 2)
+
+    def test_buffer_is_capped_while_the_database_is_down(self):
+        recorder = UsageRecorder(max_batch=2, flush_interval=60, max_buffered=4)
+        recorder._ensure_thread = lambda: None
+        for count in range(3):
+            recorder.record(self.user.pk, 'translation', character_count=count)
+
+        with mock.patch.object(UsageRecord.objects, 'bulk_create', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                recorder.flush()
+        for count in range(3, 6):
+            recorder.record(self.user.pk, 'translation', character_count=count)
+
+        self.assertEqual([row.character_count for row in recorder.buffer], [0, 1, 2, 3])
+        self.assertEqual(recorder.stats['dropped'], 2)
+        self.assertEqual(recorder.flush(), 4)
+
+
+class UsageRollupTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('rollup', 'rollup@example.com', 'pw')
+        self.recorder = UsageRecorder(max_batch=100, flush_interval=60)
+        self.recorder._ensure_thread = lambda: None
+
+    def totals(self):
+        return list(UsageRollup.objects.order_by('service_type', 'period').values_list(
+            'service_type', 'period', 'records', 'audio_duration_seconds', 'character_count', 'cost'
+        ))
+
+    def test_flush_updates_day_and_month_rollups(self):
+        for _ in range(3):
+            self.recorder.record(self.user.pk, 'speech_to_text', audio_duration_seconds=20)
+        self.recorder.record(self.user.pk, 'translation', character_count=100)
+        self.recorder.flush()
+        self.recorder.record(self.user.pk, 'speech_to_text', audio_duration_seconds=60)
+        self.recorder.flush()
+
+        self.assertEqual(UsageRollup.objects.count(), 4)
+        with self.assertNumQueries(1):
+            totals = usage_totals(self.user.pk)
+        self.assertEqual(totals['speech_to_text']['records'], 4)
+        self.assertEqual(totals['speech_to_text']['audio_duration_seconds'], 120)
+        self.assertEqual(totals['translation']['character_count'], 100)
+        self.assertEqual(
+            totals['speech_to_text']['cost'],
+            usage_cost('speech_to_text', audio_duration_seconds=120),
+        )
+
+    def test_remaining_minutes(self):
+        self.assertEqual(remaining_minutes(self.user.pk), 60)
+        self.recorder.record(self.user.pk, 'speech_to_text', audio_duration_seconds=90)
+        self.recorder.flush()
+        self.assertEqual(remaining_minutes(self.user.pk), 58.5)
+
+        Subscription.objects.create(user=self.user, monthly_minutes=2)
+        self.assertEqual(remaining_minutes(self.user.pk), 0.5)
+
+    def test_rebuild_matches_incremental_totals(self):
+        self.recorder.record(self.user.pk, 'speech_to_text', audio_duration_seconds=30)
+        self.recorder.record(self.user.pk, 'text_to_speech', character_count=40)
+        self.recorder.flush()
+        incremental = self.totals()
+
+        UsageRollup.objects.update(records=0, audio_duration_seconds=0)
+        self.assertEqual(rebuild_rollups(), 4)
+        self.assertEqual(self.totals(), incremental)
+
+
+@mock.patch('api.services.quota_meter.record_usage')
+class QuotaMeterTests(SimpleTestCase):
+    def test_checkpoints_warns_once_and_exhausts(self, record_usage):
+        meter = QuotaMeter(7, remaining_seconds=70, checkpoint_seconds=10, warn_seconds=20)
+
+        # 22 s left; recorded every 12 s without touching the database per frame
+        self.assertEqual([meter.add(4) for _ in range(12)], ['ok'] * 12)
+        self.assertEqual([c.kwargs['audio_duration_seconds'] for c in record_usage.call_args_list], [12, 12, 12, 12])
+        self.assertEqual(meter.add(4), 'warn')
+        self.assertEqual(meter.add(4), 'ok')
+        self.assertEqual(meter.add(14), 'exhausted')
+        self.assertEqual(meter.remaining, 0)
+
+        meter.checkpoint()
+        recorded = sum(c.kwargs['audio_duration_seconds'] for c in record_usage.call_args_list)
+        self.assertEqual(recorded, 70)
+
+    def test_sessions_of_one_user_share_a_meter(self, record_usage):
+        meters = QuotaMeters(checkpoint_seconds=10)
+        meters._read_quota = lambda user_id: 60
+
+        async def scenario():
+            first = await meters.acquire(7)
+            second = await meters.acquire(7)
+            self.assertIs(first, second)
+            first.add(3)
+            meters.release(first)
+            self.assertIn(7, meters.meters)
+            second.add(2)
+            meters.release(second)
+            self.assertNotIn(7, meters.meters)
+
+        asyncio.run(scenario())
+        self.assertEqual([c.kwargs['audio_duration_seconds'] for c in record_usage.call_args_list], [3, 2])
+
+    @mock.patch('api.consumers.process_audio_chunk')
+    def test_consumer_warns_then_ends_the_session(self, process_audio_chunk, record_usage):
+        consumer = TranscriptionConsumer()
+        consumer.session_id = 'session'
+        consumer.quota_cutoff = None
+        # One second of audio left, warn below half a second
+        consumer.quota_meter = QuotaMeter(7, 1, checkpoint_seconds=10, warn_seconds=0.5)
+        sent, stopped = [], []
+
+        async def send(text_data):
+            sent.append(json.loads(text_data))
+
+        async def stop_transcription(reason=None):
+            stopped.append(reason)
+
+        consumer.send = send
+        consumer.stop_transcription = stop_transcription
+        frame = bytes(int(16000 * 0.25) * 2)
+        consumer.unmetered_bytes = 6 * len(frame)
+
+        async def scenario():
+            for _ in range(6):
+                await consumer.forward_audio(frame)
+            await consumer.quota_cutoff
+
+        with self.settings(TRANSCRIPTION_SAMPLE_RATE=16000):
+            asyncio.run(scenario())
+
+        self.assertEqual(sent, [{'type': 'quota_warning', 'remainingSeconds': 0}])
+        self.assertEqual(stopped, ['quota_exhausted'])
+        # Frames after the quota ran out are not sent upstream
+        self.assertEqual(process_audio_chunk.call_count, 4)
+
+    @mock.patch('api.consumers.process_audio_chunk')
+    def test_synthetic_silence_is_not_metered(self, process_audio_chunk, record_usage):
+        consumer = TranscriptionConsumer()
+        consumer.session_id = 'session'
+        consumer.quota_cutoff = None
+        consumer.unmetered_bytes = 0
+        consumer.quota_meter = QuotaMeter(7, 60, checkpoint_seconds=600, warn_seconds=0)
+        consumer.send = mock.AsyncMock()
+        consumer.audio_stage = AudioIngestStage('pcm16', sample_rate=16000, target_rate=16000)
+        consumer.vad = VoiceActivityGate(16000, hangover_ms=0, preroll_ms=0, keepalive_ms=100)
+        # A clock that jumps ahead so every partial frame is padded on the next write
+        ticks = iter(range(0, 1000, 10))
+        consumer.framer = AudioFramer(frame_bytes=640 * 4, max_hold=1, clock=lambda: next(ticks))
+
+        class ForwardingQueue:
+            async def put(self, frames):
+                for frame in frames:
+                    await consumer.forward_audio(frame)
+
+        consumer.audio_queue = ForwardingQueue()
+        tone = (np.sin(np.arange(16000) * 0.3) * 8000).astype('<i2').tobytes()
+
+        async def scenario():
+            # Two seconds of silence become keep-alives, padded into frames
+            for _ in range(20):
+                await consumer.process_audio(bytes(3200))
+            self.assertGreater(consumer.vad.stats['keepalives'], 0)
+            self.assertEqual(consumer.quota_meter.remaining, 60)
+
+            await consumer.process_audio(tone)
+            await consumer.process_audio(bytes(3200))
+
+        with self.settings(TRANSCRIPTION_SAMPLE_RATE=16000):
+            asyncio.run(scenario())
+
+        self.assertGreater(consumer.framer.stats['padded'], 0)
+        self.assertGreater(process_audio_chunk.call_count, 0)
+        consumer.send.assert_not_called()
+        # Only the second of speech is charged
+        self.assertAlmostEqual(consumer.quota_meter.remaining, 59, places=2)
+
+
+@mock.patch('api.views.record_usage')
+@mock.patch('api.views.speech_cache.lookup_speech', return_value=None)
+@mock.patch('api.views.elevenlabs_service.stream_speech', return_value=iter([b'mp3']))
+class SpeechStreamLinkTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user('speaker', 'speaker@example.com', 'pw')
+        self.other = User.objects.create_user('other', 'other@example.com', 'pw')
+        self.client = Client(enforce_csrf_checks=True)
+        self.client.force_login(self.user)
+
+    def link(self, user):
+        client = Client()
+        client.force_login(user)
+        response = client.post(
+            reverse('text-to-speech-stream-link'),
+            json.dumps({'text': 'Bonjour'}),
+            content_type='application/json',
+        )
+        return response.json()['url']
+
+    def test_get_needs_a_link_for_the_same_user(self, stream_speech, lookup_speech, record_usage):
+        url = reverse('text-to-speech-stream')
+        self.assertEqual(self.client.get(url, {'text': 'Bonjour'}).status_code, 403)
+        self.assertEqual(self.client.get(self.link(self.other)).status_code, 403)
+        stream_speech.assert_not_called()
+
+        response = self.client.get(self.link(self.user))
+        self.assertEqual(response.status_code, 200)
+        async def body():
+            return b''.join([chunk async for chunk in response.streaming_content])
+
+        self.assertEqual(asyncio.run(body()), b'mp3')
+        stream_speech.assert_called_once_with('Bonjour', '')
+
+    def test_post_requires_csrf(self, stream_speech, lookup_speech, record_usage):
+        response = self.client.post(
+            reverse('text-to-speech-stream'),
+            json.dumps({'text': 'Bonjour'}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 403)
+        stream_speech.assert_not_called()
+        record_usage.assert_not_called()
+
+
+class RoomAccessTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.owner = User.objects.create_user('owner', 'owner@example.com', 'pw')
+        self.guest = User.objects.create_user('guest', 'guest@example.com', 'pw')
+
+    def test_only_owner_and_invited_members_may_join(self):
+        self.assertFalse(can_join_room('demo', self.owner.pk))
+        self.assertTrue(claim_room('demo', self.owner.pk))
+        self.assertTrue(can_join_room('demo', self.owner.pk))
+        self.assertFalse(claim_room('demo', self.guest.pk))
+        self.assertFalse(can_join_room('demo', self.guest.pk))
+
+        client = Client()
+        client.force_login(self.guest)
+        url = reverse('room-members', args=['demo'])
+        self.assertEqual(client.post(url, json.dumps({'email': 'guest@example.com'}),
+                                     content_type='application/json').status_code, 404)
+
+        client.force_login(self.owner)
+        response = client.post(url, json.dumps({'email': 'guest@example.com'}),
+                               content_type='application/json')
+        self.assertEqual(response.json()['members'], ['guest@example.com'])
+        self.assertTrue(can_join_room('demo', self.guest.pk))
+        self.assertTrue(claim_room('demo', self.guest.pk))
+
+        client.delete(url, json.dumps({'email': 'guest@example.com'}), content_type='application/json')
+        self.assertFalse(can_join_room('demo', self.guest.pk))
@@ -3,6 +3,12 @@ from . import views
 
 urlpatterns = [
     path('translate/', views.translate_text, name='translate'),
+    path('translate/batch/', views.translate_batch, name='translate-batch'),
     path('text-to-speech/', views.text_to_speech, name='text-to-speech'),
+    path('text-to-speech/stream/', views.text_to_speech_stream, name='text-to-speech-stream'),
+    path('text-to-speech/stream/link/', views.text_to_speech_stream_link, name='text-to-speech-stream-link'),
+    path('transcription-sessions/', views.transcription_sessions, name='transcription-sessions'),
+    path('translation-cache/', views.translation_cache_stats, name='translation-cache'),
+    path('rooms/<str:room>/members/', views.room_members, name='room-members'),
     # Add other API endpoints as needed
 ]
\ No newline at end of file
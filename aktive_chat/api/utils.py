@@ -0,0 +1,49 @@
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+
+
+async def aiterate(iterable):
+    """
+    Iterate a blocking iterable from async code, one item per thread hop
+
+    Django's StreamingHttpResponse buffers a synchronous iterator completely
+    when served over ASGI, which defeats streaming. Wrapping the iterator
+    with this keeps each chunk flowing to the client as soon as it exists.
+    Iterators may touch the database (the speech cache saves the finished
+    stream), so each hop closes stale connections.
+    """
+    iterator = iter(iterable)
+    sentinel = object()
+    while True:
+        item = await database_sync_to_async(next, thread_sensitive=False)(iterator, sentinel)
+        if item is sentinel:
+            break
+        yield item
+
+
+def prime(aiterator):
+    """
+    Wait for the first item of an async iterator from sync code
+
+    Lets a sync view see errors raised before the first item (and answer
+    with a proper status code) before it commits to a streaming response.
+    Under ASGI the first item is read on the server's event loop, the same
+    loop that later streams the rest.
+
+    Returns:
+        async iterator: The same items, starting with the one already read
+    """
+    async def first():
+        async for item in aiterator:
+            return [item]
+        return []
+
+    head = async_to_sync(first)()
+
+    async def chained():
+        for item in head:
+            yield item
+        async for item in aiterator:
+            yield item
+
+    return chained()
@@ -1,9 +1,31 @@
 # in api/views.py
-from django.http import JsonResponse
+from django.http import FileResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.core import signing
+from django.urls import reverse
+from urllib.parse import urlencode
+from asgiref.sync import async_to_sync
+import itertools
 import json
 
+from core.models import ConversationRoom
+
+from .utils import aiterate, prime
+from .services.assemblyai_service import get_session_lifecycle_stats, get_session_state_counts
+from .services import openai_service
+from .services import elevenlabs_service
+from .services import speech_cache
+from .services.translation_cache import translation_cache
+from .services.rooms import validate_room
+from .services.usage import record_usage
+
+# Salt for signed text_to_speech_stream GET links
+SPEECH_LINK_SALT = 'api.text_to_speech_stream'
+
 @login_required
 @csrf_exempt
 def translate_text(request):
@@ -12,16 +34,68 @@ def translate_text(request):
         text = data.get('text', '')
         target_language = data.get('language', 'French')
         
-        # Call your translation service here
-        # translated_text = your_translation_function(text, target_language)
+        # Translate into several languages at once
+        if 'languages' in data:
+            try:
+                languages = openai_service.validate_languages(data['languages'])
+            except ValueError as e:
+                return JsonResponse({'error': str(e)}, status=400)
+            
+            translations = openai_service.translate_multi(text, languages)
+            record_usage(request.user.pk, 'translation', character_count=len(text) * len(languages))
+            return JsonResponse({'translations': translations})
         
-        # For testing purposes
-        translated_text = f"Translated to {target_language}: {text}"
+        # Stream tokens back as a chunked response as the model produces them
+        if data.get('stream'):
+            try:
+                # Wait for the first token so model errors still get a JSON response
+                tokens = prime(openai_service.astream_translation(text, target_language))
+            except Exception as e:
+                return JsonResponse({'error': str(e)}, status=500)
+            
+            record_usage(request.user.pk, 'translation', character_count=len(text))
+            response = StreamingHttpResponse(tokens, content_type='text/plain; charset=utf-8')
+            response['X-Accel-Buffering'] = 'no'
+            return response
         
+        try:
+            # Repeated phrases are served from the translation cache
+            translated_text = openai_service.translate_text(text, target_language)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+        
+        record_usage(request.user.pk, 'translation', character_count=len(text))
         return JsonResponse({'translation': translated_text})
     
     return JsonResponse({'error': 'Invalid request method'}, status=400)
 
+@login_required
+@csrf_exempt
+def translate_batch(request):
+    if request.method == 'POST':
+        data = json.loads(request.body)
+        segments = data.get('segments', [])
+        target_language = data.get('language', 'French')
+        
+        if not isinstance(segments, list) or not all(isinstance(s, str) for s in segments):
+            return JsonResponse({'error': 'segments must be a list of strings'}, status=400)
+        
+        if len(segments) > settings.TRANSLATION_BATCH_MAX_INPUT_SEGMENTS:
+            return JsonResponse({
+                'error': f'At most {settings.TRANSLATION_BATCH_MAX_INPUT_SEGMENTS} segments per request'
+            }, status=400)
+        
+        try:
+            # Segments are packed into as few model requests as the budget allows
+            translations = openai_service.translate_batch(segments, target_language)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+        
+        record_usage(request.user.pk, 'translation', character_count=sum(map(len, segments)))
+        return JsonResponse({'translations': translations})
+    
+    return JsonResponse({'error': 'Invalid request method'}, status=400)
+
 @login_required
 @csrf_exempt
 def text_to_speech(request):
@@ -30,12 +104,142 @@ def text_to_speech(request):
         text = data.get('text', '')
         voice_id = data.get('voiceId', '')
         
-        # Call your text-to-speech service here
-        # audio_url = your_tts_function(text, voice_id)
+        if not text:
+            return JsonResponse({'error': 'No text provided'}, status=400)
         
-        # For testing purposes
-        audio_url = "/static/sample_audio.mp3"
+        try:
+            # Identical text and voice reuse the same cached file
+            file_name = speech_cache.get_or_create_speech(text, voice_id)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
         
-        return JsonResponse({'audioUrl': audio_url})
+        record_usage(request.user.pk, 'text_to_speech', character_count=len(text))
+        return JsonResponse({'audioUrl': speech_cache.speech_url(file_name)})
+    
+    return JsonResponse({'error': 'Invalid request method'}, status=400)
+
+def speech_request(data):
+    """Read text, voice ID and save flag from a speech stream request"""
+    save = data.get('save', settings.TTS_PERSIST_STREAMED_AUDIO)
+    if isinstance(save, str):
+        save = save.lower() in ('1', 'true', 'yes')
+    return data.get('text', ''), data.get('voiceId', ''), bool(save)
+
+@login_required
+def text_to_speech_stream_link(request):
+    """
+    Issue a short-lived URL that streams speech with a GET
+
+    Lets an <audio> element point straight at the stream endpoint. The URL
+    carries a token signed for the requesting user, so another site cannot
+    make a logged-in user's browser start paid synthesis.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Invalid request method'}, status=400)
+    
+    text, voice_id, save = speech_request(json.loads(request.body))
+    if not text:
+        return JsonResponse({'error': 'No text provided'}, status=400)
+    
+    token = signing.dumps(
+        {'user': request.user.pk, 'text': text, 'voiceId': voice_id, 'save': save},
+        salt=SPEECH_LINK_SALT,
+        compress=True,
+    )
+    url = f"{reverse('text-to-speech-stream')}?{urlencode({'token': token})}"
+    return JsonResponse({'url': url, 'expiresIn': settings.TTS_STREAM_LINK_SECONDS})
+
+@login_required
+def text_to_speech_stream(request):
+    """Stream synthesized MP3 audio to the client as the provider produces it"""
+    if request.method == 'POST':
+        data = json.loads(request.body)
+    elif request.method == 'GET':
+        # Only with a token from text_to_speech_stream_link
+        try:
+            data = signing.loads(
+                request.GET.get('token', ''),
+                salt=SPEECH_LINK_SALT,
+                max_age=settings.TTS_STREAM_LINK_SECONDS,
+            )
+        except signing.BadSignature:
+            return JsonResponse({'error': 'Invalid or expired link'}, status=403)
+        if data['user'] != request.user.pk:
+            return JsonResponse({'error': 'Invalid or expired link'}, status=403)
+    else:
+        return JsonResponse({'error': 'Invalid request method'}, status=400)
+    
+    text, voice_id, save = speech_request(data)
+    
+    if not text:
+        return JsonResponse({'error': 'No text provided'}, status=400)
+    
+    # Cached speech is served from disk without calling the provider
+    file_name = speech_cache.lookup_speech(text, voice_id)
+    if file_name:
+        response = FileResponse(speech_cache.open_speech(file_name), content_type='audio/mpeg')
+        response['X-Audio-Url'] = speech_cache.speech_url(file_name)
+        record_usage(request.user.pk, 'text_to_speech', character_count=len(text))
+        return response
+    
+    try:
+        # Wait for the first chunk so provider errors still get a JSON response
+        chunks = elevenlabs_service.stream_speech(text, voice_id)
+        first_chunk = next(chunks, b'')
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+    
+    record_usage(request.user.pk, 'text_to_speech', character_count=len(text))
+    chunks = itertools.chain([first_chunk], chunks)
+    
+    # Saving to the speech cache is optional and happens after the last
+    # chunk is sent
+    if save:
+        chunks = speech_cache.store_speech_when_complete(chunks, text, voice_id)
+    
+    response = StreamingHttpResponse(aiterate(chunks), content_type='audio/mpeg')
+    response['Cache-Control'] = 'no-store'
+    response['X-Accel-Buffering'] = 'no'
+    if save:
+        file_name = speech_cache.speech_file_name(speech_cache.speech_cache_key(text, voice_id))
+        response['X-Audio-Url'] = speech_cache.speech_url(file_name)
+    return response
+
+@staff_member_required
+def transcription_sessions(request):
+    """Report transcription sessions per state, and this worker's lifecycle counters"""
+    return JsonResponse({
+        'sessions': async_to_sync(get_session_state_counts)(),
+        'lifecycle': get_session_lifecycle_stats(),
+    })
+
+@staff_member_required
+def translation_cache_stats(request):
+    """Report translation cache hit/miss/eviction counters"""
+    return JsonResponse({'cache': translation_cache.stats()})
+
+@login_required
+def room_members(request, room):
+    """List, invite or remove the members of a conversation room the user owns"""
+    try:
+        conversation = ConversationRoom.objects.get(name=validate_room(room), owner=request.user)
+    except (ValueError, ConversationRoom.DoesNotExist):
+        return JsonResponse({'error': 'Room not found'}, status=404)
+    
+    if request.method in ('POST', 'DELETE'):
+        email = json.loads(request.body).get('email', '')
+        try:
+            member = get_user_model().objects.get(email=email)
+        except get_user_model().DoesNotExist:
+            return JsonResponse({'error': 'No user with that email'}, status=404)
+        if request.method == 'POST':
+            conversation.members.add(member)
+        else:
+            conversation.members.remove(member)
+    elif request.method != 'GET':
+        return JsonResponse({'error': 'Invalid request method'}, status=400)
     
-    return JsonResponse({'error': 'Invalid request method'}, status=400)
\ No newline at end of file
+    return JsonResponse({
+        'room': conversation.name,
+        'members': list(conversation.members.values_list('email', flat=True)),
+    })
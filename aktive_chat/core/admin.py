@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import UsageRecord, SavedVoice, TranslationHistory
+from .models import (
+    UsageRecord, SavedVoice, TranslationHistory, SpeechCacheEntry, TranscriptionSession, UsageRollup,
+    ConversationRoom
+)
 
 @admin.register(UsageRecord)
 class UsageRecordAdmin(admin.ModelAdmin):
@@ -17,4 +20,28 @@ class SavedVoiceAdmin(admin.ModelAdmin):
 class TranslationHistoryAdmin(admin.ModelAdmin):
     list_display = ('user', 'source_language', 'target_language', 'created_at', 'favorited')
     list_filter = ('source_language', 'target_language', 'favorited', 'created_at')
-    search_fields = ('user__email', 'original_text', 'translated_text')
\ No newline at end of file
+    search_fields = ('user__email', 'original_text', 'translated_text')
+
+@admin.register(SpeechCacheEntry)
+class SpeechCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ('file_name', 'voice_id', 'model', 'size_bytes', 'hit_count', 'last_used')
+    list_filter = ('model',)
+    search_fields = ('key', 'file_name', 'voice_id')
+
+@admin.register(TranscriptionSession)
+class TranscriptionSessionAdmin(admin.ModelAdmin):
+    list_display = ('session_id', 'user', 'owner', 'status', 'heartbeat_at', 'lease_expires')
+    list_filter = ('status', 'owner')
+    search_fields = ('session_id', 'user__email', 'owner')
+
+@admin.register(UsageRollup)
+class UsageRollupAdmin(admin.ModelAdmin):
+    list_display = ('user', 'service_type', 'period', 'period_start', 'records', 'audio_duration_seconds', 'character_count', 'cost')
+    list_filter = ('service_type', 'period', 'period_start')
+    search_fields = ('user__email',)
+
+@admin.register(ConversationRoom)
+class ConversationRoomAdmin(admin.ModelAdmin):
+    list_display = ('name', 'owner', 'created_at')
+    search_fields = ('name', 'owner__email')
+    filter_horizontal = ('members',)
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:43
+
+import core.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0002_speechcacheentry"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="translationhistory",
+            name="original_audio_file",
+            field=models.FileField(
+                blank=True,
+                null=True,
+                storage=core.models.audio_storage,
+                upload_to="translation_audio/",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="translationhistory",
+            name="translated_audio_file",
+            field=models.FileField(
+                blank=True,
+                null=True,
+                storage=core.models.audio_storage,
+                upload_to="translation_audio/",
+            ),
+        ),
+    ]
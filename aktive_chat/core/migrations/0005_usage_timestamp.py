@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:58
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0004_transcriptionsession"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="usagerecord",
+            name="timestamp",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
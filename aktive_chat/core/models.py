@@ -1,12 +1,18 @@
 from django.db import models
 from django.conf import settings
+from django.core.files.storage import storages
+from django.utils import timezone
+
+def audio_storage():
+    """Storage for audio files (STORAGES['audio'])"""
+    return storages['audio']
 
 class UsageRecord(models.Model):
     """Record of API usage for billing and quotas"""
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='usage_records')
     
-    # Recording timestamp
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Recording timestamp; set when the usage happened, not when the row is written
+    timestamp = models.DateTimeField(default=timezone.now)
     
     # Service used
     SERVICE_TYPES = (
@@ -61,8 +67,89 @@ class TranslationHistory(models.Model):
     favorited = models.BooleanField(default=False)
     
     # Audio files (optional)
-    original_audio_file = models.FileField(upload_to='translation_audio/', null=True, blank=True)
-    translated_audio_file = models.FileField(upload_to='translation_audio/', null=True, blank=True)
+    original_audio_file = models.FileField(upload_to='translation_audio/', storage=audio_storage, null=True, blank=True)
+    translated_audio_file = models.FileField(upload_to='translation_audio/', storage=audio_storage, null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.user.email} - {self.source_language} to {self.target_language} - {self.created_at.strftime('%Y-%m-%d')}"
+
+class SpeechCacheEntry(models.Model):
+    """Synthesized speech stored once per (text, voice, model)"""
+    # SHA-256 of normalized text, voice ID and TTS model
+    key = models.CharField(max_length=64, unique=True)
+    
+    # Synthesis inputs
+    voice_id = models.CharField(max_length=100, blank=True)
+    model = models.CharField(max_length=50)
+    
+    # Audio file name in the audio store
+    file_name = models.CharField(max_length=255)
+    size_bytes = models.IntegerField(default=0)
+    
+    # Usage for eviction
+    hit_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used = models.DateTimeField(default=timezone.now, db_index=True)
+    
+    def __str__(self):
+        return f"{self.file_name} ({self.hit_count} hits)"
+
+class TranscriptionSession(models.Model):
+    """Live transcription session, shared by all workers through the session registry"""
+    session_id = models.CharField(max_length=36, unique=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='transcription_sessions')
+    
+    # Owning worker and the channel name that reaches the session's consumer
+    owner = models.CharField(max_length=100, db_index=True)
+    route = models.CharField(max_length=255, blank=True)
+    
+    status = models.CharField(max_length=20, default='initialized')
+    
+    # The owner renews the lease with heartbeats; expired rows belong to dead workers
+    created_at = models.DateTimeField(auto_now_add=True)
+    heartbeat_at = models.DateTimeField(default=timezone.now)
+    lease_expires = models.DateTimeField(db_index=True)
+    
+    def __str__(self):
+        return f"{self.session_id} ({self.status} on {self.owner})"
+
+class UsageRollup(models.Model):
+    """Running usage totals per user, service and day or calendar month, kept in step with UsageRecord"""
+    PERIODS = (
+        ('day', 'Day'),
+        ('month', 'Month'),
+    )
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='usage_rollups')
+    service_type = models.CharField(max_length=20, choices=UsageRecord.SERVICE_TYPES)
+    period = models.CharField(max_length=10, choices=PERIODS)
+    period_start = models.DateField()
+    
+    # Totals of the UsageRecord rows in the period
+    records = models.IntegerField(default=0)
+    audio_duration_seconds = models.FloatField(default=0)
+    character_count = models.BigIntegerField(default=0)
+    cost = models.DecimalField(max_digits=14, decimal_places=6, default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'service_type', 'period', 'period_start'],
+                name='unique_usage_rollup',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.email} - {self.service_type} - {self.period} of {self.period_start}"
+
+class ConversationRoom(models.Model):
+    """Conversation room; only its owner and invited members may speak or listen in it"""
+    name = models.CharField(max_length=64, unique=True)
+    
+    # The first speaker claims the room and invites everyone else
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='owned_rooms')
+    members = models.ManyToManyField(settings.AUTH_USER_MODEL, blank=True, related_name='conversation_rooms')
+    
+    created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
-        return f"{self.user.email} - {self.source_language} to {self.target_language} - {self.created_at.strftime('%Y-%m-%d')}"
\ No newline at end of file
+        return f"{self.name} ({self.owner.email})"
@@ -1,6 +1,8 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 
+from api.services.usage import monthly_minutes_allowed, usage_totals
+
 def home_view(request):
     """Home page view"""
     if request.user.is_authenticated:
@@ -10,7 +12,15 @@ def home_view(request):
 @login_required
 def dashboard_view(request):
     """Dashboard view for authenticated users"""
-    return render(request, 'core/dashboard.html')
+    usage = usage_totals(request.user.pk)
+    minutes_used = usage.get('speech_to_text', {}).get('audio_duration_seconds', 0) / 60
+    minutes_allowed = monthly_minutes_allowed(request.user.pk)
+    return render(request, 'core/dashboard.html', {
+        'usage': usage,
+        'minutes_used': round(minutes_used, 1),
+        'minutes_allowed': minutes_allowed,
+        'minutes_percent': min(100, round(100 * minutes_used / minutes_allowed)) if minutes_allowed else 100,
+    })
 
 @login_required
 def translator_view(request):
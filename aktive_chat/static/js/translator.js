@@ -1,3 +1,33 @@
+// Audio worklet that converts microphone input to PCM16 frames of a fixed size
+const PCM_CAPTURE_WORKLET = `
+class PcmCaptureProcessor extends AudioWorkletProcessor {
+    constructor(options) {
+        super();
+        this.frame = new Int16Array(options.processorOptions.frameSamples);
+        this.fill = 0;
+    }
+
+    process(inputs) {
+        const channel = inputs[0] && inputs[0][0];
+        if (!channel) {
+            return true;
+        }
+        for (let i = 0; i < channel.length; i++) {
+            const sample = Math.max(-1, Math.min(1, channel[i]));
+            this.frame[this.fill++] = sample < 0 ? sample * 0x8000 : sample * 0x7fff;
+            if (this.fill === this.frame.length) {
+                // Transfer a copy so the frame buffer can be reused
+                const out = this.frame.slice();
+                this.port.postMessage(out.buffer, [out.buffer]);
+                this.fill = 0;
+            }
+        }
+        return true;
+    }
+}
+registerProcessor('pcm-capture', PcmCaptureProcessor);
+`;
+
 // Basic audio recording functionality
 class AudioRecorder {
     constructor() {
@@ -5,6 +35,13 @@ class AudioRecorder {
         this.audioChunks = [];
         this.stream = null;
         this.isRecording = false;
+        
+        // Streaming mode
+        this.socket = null;
+        this.audioContext = null;
+        this.source = null;
+        this.worklet = null;
+        this.paused = false;
     }
     
     async start() {
@@ -57,4 +94,111 @@ class AudioRecorder {
             this.mediaRecorder.stop();
         });
     }
-}
\ No newline at end of file
+    
+    /**
+     * Stream microphone audio to the transcription WebSocket while recording
+     *
+     * Audio is captured as mono PCM16 and sent as small binary frames. The
+     * start_transcription command declares the format, so the server can
+     * forward it without decoding.
+     *
+     * @param {WebSocket} socket - Open connection to ws/transcription/
+     * @param {Object} options - Extra start_transcription fields (languages, voiceId, ...)
+     *     plus sampleRate (default 16000) and frameMs (default 50)
+     * @returns {Promise<boolean>} Whether capture started
+     */
+    async startStreaming(socket, options = {}) {
+        const { sampleRate = 16000, frameMs = 50, ...command } = options;
+        try {
+            this.stream = await navigator.mediaDevices.getUserMedia({
+                audio: { channelCount: 1, echoCancellation: true, noiseSuppression: true }
+            });
+            
+            // Ask the browser to resample to the transcription rate; some
+            // browsers ignore the hint, so the actual rate is declared below
+            this.audioContext = new AudioContext({ sampleRate });
+            const workletUrl = URL.createObjectURL(
+                new Blob([PCM_CAPTURE_WORKLET], { type: 'application/javascript' })
+            );
+            try {
+                await this.audioContext.audioWorklet.addModule(workletUrl);
+            } finally {
+                URL.revokeObjectURL(workletUrl);
+            }
+            
+            const actualRate = this.audioContext.sampleRate;
+            this.socket = socket;
+            this.paused = false;
+            this.socket.send(JSON.stringify({
+                ...command,
+                command: 'start_transcription',
+                audioFormat: { encoding: 'pcm16', sampleRate: actualRate, channels: 1 }
+            }));
+            
+            // Honour server back-pressure
+            this.onSocketMessage = (event) => {
+                if (typeof event.data !== 'string') {
+                    return;
+                }
+                const message = JSON.parse(event.data);
+                if (message.type === 'flow_control') {
+                    this.paused = message.action === 'pause';
+                } else if (message.type === 'session_stopped' && message.reason) {
+                    // Ended by the server (quota used up, reaped); stop capturing
+                    this.isRecording = false;
+                    this.stopStreaming();
+                }
+            };
+            this.socket.addEventListener('message', this.onSocketMessage);
+            
+            this.source = this.audioContext.createMediaStreamSource(this.stream);
+            this.worklet = new AudioWorkletNode(this.audioContext, 'pcm-capture', {
+                processorOptions: { frameSamples: Math.round(actualRate * frameMs / 1000) }
+            });
+            this.worklet.port.onmessage = (event) => {
+                if (!this.paused && this.socket && this.socket.readyState === WebSocket.OPEN) {
+                    this.socket.send(event.data);
+                }
+            };
+            this.source.connect(this.worklet);
+            
+            this.isRecording = true;
+            return true;
+        } catch (error) {
+            console.error('Error starting streaming:', error);
+            await this.stopStreaming();
+            return false;
+        }
+    }
+    
+    /**
+     * Stop streaming capture and end the transcription session
+     */
+    async stopStreaming() {
+        if (this.source) {
+            this.source.disconnect();
+            this.source = null;
+        }
+        if (this.worklet) {
+            this.worklet.port.onmessage = null;
+            this.worklet.disconnect();
+            this.worklet = null;
+        }
+        if (this.audioContext) {
+            await this.audioContext.close();
+            this.audioContext = null;
+        }
+        if (this.stream) {
+            this.stream.getTracks().forEach(track => track.stop());
+            this.stream = null;
+        }
+        if (this.socket) {
+            this.socket.removeEventListener('message', this.onSocketMessage);
+            if (this.isRecording && this.socket.readyState === WebSocket.OPEN) {
+                this.socket.send(JSON.stringify({ command: 'stop_transcription' }));
+            }
+            this.socket = null;
+        }
+        this.isRecording = false;
+    }
+}